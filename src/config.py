@@ -0,0 +1,246 @@
+import os
+import re
+from typing import Callable, FrozenSet, NamedTuple, Optional, Tuple
+
+_ID_SEPARATORS = re.compile(r"[\s,]+")
+
+
+class Config(NamedTuple):
+    """Settings read from the environment once per container."""
+
+    token: Optional[str] = None
+    admin_ids: Tuple[int, ...] = ()
+    group_id: Optional[str] = None
+    allowed_chat_ids: FrozenSet[int] = frozenset()
+    callback_secret: Optional[str] = None
+    legacy_callbacks: bool = False
+    queue_url: Optional[str] = None
+    queue_fifo: Optional[bool] = None
+    telegram_api_url: str = "https://api.telegram.org"
+    telegram_pool_size: int = 10
+    telegram_connect_timeout: float = 3.05
+    telegram_read_timeout: float = 10.0
+    telegram_max_retries: int = 3
+    telegram_backoff_factor: float = 0.5
+    telegram_max_retry_delay: float = 10.0
+    telegram_rate_limiter: str = "local"
+    telegram_global_rate: float = 30.0
+    telegram_global_burst: int = 30
+    telegram_chat_rate: float = 1.0
+    telegram_chat_burst: int = 3
+    telegram_group_rate: float = 20 / 60
+    telegram_group_burst: int = 3
+    telegram_outbox: str = "inline"
+    telegram_outbox_url: Optional[str] = None
+    storage_backend: str = "dynamodb"
+    dynamodb_table: str = "belajarpythonbot2023"
+    dynamodb_attempts_table: str = "belajarpythonbot2023-attempts"
+    dynamodb_updates_table: str = "belajarpythonbot2023-updates"
+    dynamodb_rate_limit_table: str = "belajarpythonbot2023-rate-limits"
+    dynamodb_region: str = "ap-southeast-1"
+    sqlite_path: str = "/tmp/belajarpythonbot.sqlite3"
+    write_behind: bool = False
+    sample_size: int = 0
+    sample_strata: Tuple[str, ...] = ()
+    attempt_ttl: int = 30 * 24 * 60 * 60
+    idempotency_enabled: bool = True
+    # Outlives SQS's default four-day message retention.
+    idempotency_ttl: int = 4 * 24 * 60 * 60
+    idempotency_lease_seconds: int = 60
+    idempotency_cache_size: int = 4096
+    admin_notifications: str = "immediate"
+    admin_digest_interval: int = 300
+    admin_digest_max_events: int = 50
+    group_link_ttl: int = 300
+    group_link_lease_seconds: int = 10
+    worker_async: bool = False
+    worker_concurrency: int = 10
+    log_level: str = "INFO"
+    log_debug_sample_rate: float = 0.0
+    metrics_enabled: bool = True
+    metrics_namespace: str = "BelajarPythonBot"
+
+
+def parse_chat_ids(raw: str) -> FrozenSet[int]:
+    """
+    Parse chat IDs separated by commas and/or whitespace.
+
+    Invalid entries are ignored rather than crashing the bot.
+    """
+    ids = set()
+    for part in _ID_SEPARATORS.split(raw):
+        if not part:
+            continue
+        try:
+            ids.add(int(part))
+        except ValueError:
+            continue
+    return frozenset(ids)
+
+
+def _load_ssm_parameter(name: str) -> str:
+    """Read a (possibly encrypted) String/StringList parameter from SSM."""
+    import boto3
+
+    response = boto3.client("ssm").get_parameter(Name=name, WithDecryption=True)
+    return response["Parameter"]["Value"]
+
+
+# Swappable so tests and local runs can stand in for SSM.
+parameter_loader: Callable[[str], str] = _load_ssm_parameter
+
+
+def _load_allowed_chat_ids() -> FrozenSet[int]:
+    """
+    Collect allowed chat IDs from every configured source.
+
+    - TELEGRAM_ALLOWED_CHAT_IDS: inline list
+    - TELEGRAM_ALLOWED_CHAT_IDS_FILE: path to a file of IDs
+    - TELEGRAM_ALLOWED_CHAT_IDS_PARAMETER: name of an SSM parameter
+    """
+    ids = parse_chat_ids(os.getenv("TELEGRAM_ALLOWED_CHAT_IDS", ""))
+
+    path = os.getenv("TELEGRAM_ALLOWED_CHAT_IDS_FILE")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            ids |= parse_chat_ids(f.read())
+
+    parameter = os.getenv("TELEGRAM_ALLOWED_CHAT_IDS_PARAMETER")
+    if parameter:
+        ids |= parse_chat_ids(parameter_loader(parameter))
+
+    return ids
+
+
+def _get_bool(name: str) -> Optional[bool]:
+    raw = os.getenv(name, "").strip().lower()
+    if not raw:
+        return None
+    return raw in {"1", "true", "yes"}
+
+
+def load_config() -> Config:
+    """Build a Config from the current environment."""
+    defaults = Config()
+    return Config(
+        token=os.getenv("TOKEN"),
+        admin_ids=tuple(sorted(parse_chat_ids(os.getenv("TELEGRAM_ADMIN", "")))),
+        group_id=os.getenv("TELEGRAM_GROUP_ID"),
+        allowed_chat_ids=_load_allowed_chat_ids(),
+        callback_secret=os.getenv("CALLBACK_SECRET"),
+        legacy_callbacks=bool(_get_bool("QUIZ_LEGACY_CALLBACKS")),
+        queue_url=os.getenv("QUIZ_QUEUE_URL"),
+        queue_fifo=_get_bool("QUIZ_QUEUE_FIFO"),
+        telegram_api_url=os.getenv("TELEGRAM_API_URL", defaults.telegram_api_url).rstrip("/"),
+        telegram_pool_size=int(os.getenv("TELEGRAM_POOL_SIZE", defaults.telegram_pool_size)),
+        telegram_connect_timeout=float(
+            os.getenv("TELEGRAM_CONNECT_TIMEOUT", defaults.telegram_connect_timeout)
+        ),
+        telegram_read_timeout=float(
+            os.getenv("TELEGRAM_READ_TIMEOUT", defaults.telegram_read_timeout)
+        ),
+        telegram_max_retries=int(
+            os.getenv("TELEGRAM_MAX_RETRIES", defaults.telegram_max_retries)
+        ),
+        telegram_backoff_factor=float(
+            os.getenv("TELEGRAM_BACKOFF_FACTOR", defaults.telegram_backoff_factor)
+        ),
+        telegram_max_retry_delay=float(
+            os.getenv("TELEGRAM_MAX_RETRY_DELAY", defaults.telegram_max_retry_delay)
+        ),
+        telegram_rate_limiter=os.getenv(
+            "TELEGRAM_RATE_LIMITER", defaults.telegram_rate_limiter
+        ).strip().lower(),
+        telegram_global_rate=float(
+            os.getenv("TELEGRAM_GLOBAL_RATE", defaults.telegram_global_rate)
+        ),
+        telegram_global_burst=int(
+            os.getenv("TELEGRAM_GLOBAL_BURST", defaults.telegram_global_burst)
+        ),
+        telegram_chat_rate=float(os.getenv("TELEGRAM_CHAT_RATE", defaults.telegram_chat_rate)),
+        telegram_chat_burst=int(os.getenv("TELEGRAM_CHAT_BURST", defaults.telegram_chat_burst)),
+        telegram_group_rate=float(
+            os.getenv("TELEGRAM_GROUP_RATE", defaults.telegram_group_rate)
+        ),
+        telegram_group_burst=int(
+            os.getenv("TELEGRAM_GROUP_BURST", defaults.telegram_group_burst)
+        ),
+        telegram_outbox=os.getenv("TELEGRAM_OUTBOX", defaults.telegram_outbox).strip().lower(),
+        telegram_outbox_url=os.getenv("TELEGRAM_OUTBOX_URL"),
+        storage_backend=os.getenv("QUIZ_STORAGE", defaults.storage_backend).strip().lower(),
+        dynamodb_table=os.getenv("DYNAMODB_TABLE", defaults.dynamodb_table),
+        dynamodb_attempts_table=os.getenv(
+            "DYNAMODB_ATTEMPTS_TABLE", defaults.dynamodb_attempts_table
+        ),
+        dynamodb_updates_table=os.getenv(
+            "DYNAMODB_UPDATES_TABLE", defaults.dynamodb_updates_table
+        ),
+        dynamodb_rate_limit_table=os.getenv(
+            "DYNAMODB_RATE_LIMIT_TABLE", defaults.dynamodb_rate_limit_table
+        ),
+        dynamodb_region=os.getenv("DYNAMODB_REGION", defaults.dynamodb_region),
+        sqlite_path=os.getenv("SQLITE_PATH", defaults.sqlite_path),
+        write_behind=bool(_get_bool("QUIZ_WRITE_BEHIND")),
+        sample_size=int(os.getenv("QUIZ_SAMPLE_SIZE", defaults.sample_size)),
+        sample_strata=tuple(
+            name.strip().lower()
+            for name in os.getenv("QUIZ_SAMPLE_STRATA", "").split(",")
+            if name.strip()
+        ),
+        attempt_ttl=int(os.getenv("ATTEMPT_TTL_SECONDS", defaults.attempt_ttl)),
+        idempotency_enabled=_get_bool("QUIZ_IDEMPOTENCY") is not False,
+        idempotency_ttl=int(os.getenv("IDEMPOTENCY_TTL_SECONDS", defaults.idempotency_ttl)),
+        idempotency_lease_seconds=int(
+            os.getenv("IDEMPOTENCY_LEASE_SECONDS", defaults.idempotency_lease_seconds)
+        ),
+        idempotency_cache_size=int(
+            os.getenv("IDEMPOTENCY_CACHE_SIZE", defaults.idempotency_cache_size)
+        ),
+        admin_notifications=os.getenv(
+            "ADMIN_NOTIFICATIONS", defaults.admin_notifications
+        ).strip().lower(),
+        admin_digest_interval=int(
+            os.getenv("ADMIN_DIGEST_INTERVAL_SECONDS", defaults.admin_digest_interval)
+        ),
+        admin_digest_max_events=int(
+            os.getenv("ADMIN_DIGEST_MAX_EVENTS", defaults.admin_digest_max_events)
+        ),
+        group_link_ttl=int(os.getenv("GROUP_LINK_TTL_SECONDS", defaults.group_link_ttl)),
+        group_link_lease_seconds=int(
+            os.getenv("GROUP_LINK_LEASE_SECONDS", defaults.group_link_lease_seconds)
+        ),
+        worker_async=bool(_get_bool("QUIZ_WORKER_ASYNC")),
+        worker_concurrency=int(
+            os.getenv("QUIZ_WORKER_CONCURRENCY", defaults.worker_concurrency)
+        ),
+        log_level=os.getenv("LOG_LEVEL", defaults.log_level),
+        log_debug_sample_rate=float(
+            os.getenv("LOG_DEBUG_SAMPLE_RATE", defaults.log_debug_sample_rate)
+        ),
+        metrics_enabled=_get_bool("METRICS_ENABLED") is not False,
+        metrics_namespace=os.getenv("METRICS_NAMESPACE", defaults.metrics_namespace),
+    )
+
+
+# Loaded lazily and reused while the Lambda container stays warm.
+_config: Optional[Config] = None
+
+
+def get_config() -> Config:
+    """Return the container-wide Config, loading it on first use."""
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
+
+
+def reset_config() -> None:
+    """Forget the loaded Config; the next get_config() re-reads the environment."""
+    global _config
+    _config = None
+
+
+def reload_config() -> Config:
+    """Re-read the environment, e.g. after rotating a parameter."""
+    reset_config()
+    return get_config()
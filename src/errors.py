@@ -13,4 +13,12 @@ class EnvironmentException(Exception):
         self.message = message
 
     def __str__(self):
-        return f"{self.name}: {self.message}"
\ No newline at end of file
+        return f"{self.name}: {self.message}"
+
+class UpdateInProgressException(Exception):
+    def __init__(self, message):
+        self.name = "UpdateInProgressException"
+        self.message = message
+
+    def __str__(self):
+        return f"{self.name}: {self.message}"
@@ -0,0 +1,34 @@
+import os
+from services.admin_notifications import AdminNotifier
+from services.storage import create_storage
+from telegram_service import TelegramService
+from errors import EnvironmentException
+from logger import get_logger, start_event
+from metrics import instrument_handler
+
+logger = get_logger(__name__)
+
+
+@instrument_handler("admin_digest")
+def lambda_handler(event, context):
+    """Scheduled Lambda handler - sends admin events left over from quiet spells.
+
+    Busy periods flush their digests from the quiz worker; this catches the
+    events that never reached the count or age threshold.
+    """
+    start_event()
+    _validate_environment()
+
+    notifier = AdminNotifier.from_config(create_storage(), TelegramService())
+    if not notifier.digest:
+        return {"events": 0}
+    events = notifier.flush()
+    logger.info("admin_digest_flushed", events=events)
+    return {"events": events}
+
+
+def _validate_environment():
+    """Validate required environment variables."""
+    for var in ["TOKEN", "TELEGRAM_ADMIN"]:
+        if var not in os.environ:
+            raise EnvironmentException(f"{var} environment variable is not set")
@@ -1,25 +1,75 @@
-import os
 import json
-import boto3
-from services.quiz_service import QuizService
+import hashlib
+from typing import Any, Dict, Optional
 from errors import EnvironmentException, UnauthorizedException
+from config import get_config
+from telegram_update import may_need_handling
+from logger import get_logger, start_event
+from metrics import instrument_handler, instrument_boto3_client, timed
+from utils import START_PROMPT_TEXT, classify_update, get_update_owner_id
 
+logger = get_logger(__name__)
 
+# Reused across invocations while the Lambda container stays warm.
+_sqs_client = None
+
+
+def get_sqs_client():
+    """Return the container-wide SQS client, creating it on first use."""
+    global _sqs_client
+    if _sqs_client is None:
+        with timed("sqs_client_init"):
+            # Deferred: inline replies and ignored updates never need boto3.
+            import boto3
+
+            _sqs_client = boto3.client("sqs")
+        instrument_boto3_client(_sqs_client, "sqs")
+    return _sqs_client
+
+
+def reset_sqs_client() -> None:
+    """Drop the cached SQS client so the next invocation builds a new one."""
+    global _sqs_client
+    _sqs_client = None
+
+
+@instrument_handler("api_handler")
 def lambda_handler(event, context):
     """Main API Gateway Lambda handler."""
+    start_event()
     try:
 
         # Validate request token
         _validate_request_token(event)
 
-        # Queue the message for processing
-        sqs = boto3.client("sqs")
-        queue_url = os.environ["QUIZ_QUEUE_URL"]
+        queue_url = _get_queue_url()
         body = event.get("body", "")
+        data = _load_update(body)
+        kind, payload = classify_update(data)
 
-        print("Queueing message to SQS:", body)
+        # Noise never reaches the queue.
+        if kind == "ignore" or (
+            kind == "text" and not isinstance(payload.get("chat_id"), int)
+        ):
+            logger.debug("update_ignored", update_id=data.get("update_id"))
+            return {
+                "statusCode": 200,
+                "body": json.dumps({"message": "success!"}),
+            }
 
-        sqs.send_message(QueueUrl=queue_url, MessageBody=body)
+        # Stateless replies go back in the webhook response itself.
+        if kind == "text":
+            logger.debug("update_answered_inline", update_id=data.get("update_id"))
+            return _webhook_reply(
+                "sendMessage", chat_id=payload["chat_id"], text=START_PROMPT_TEXT
+            )
+
+        # Queue the message for processing
+        sqs = get_sqs_client()
+
+        logger.info("update_queued", kind=kind, update_id=data.get("update_id"))
+
+        sqs.send_message(QueueUrl=queue_url, MessageBody=body, **_get_fifo_params(body, data))
 
         return {
             "statusCode": 200,
@@ -33,17 +83,80 @@ def lambda_handler(event, context):
         }
 
     except Exception as e:
-        import traceback
-
-        print(e)
-        print(context)
-        print(traceback.format_exc())
+        logger.error(
+            "api_handler_failed",
+            exc_info=True,
+            error=str(e),
+            request_id=getattr(context, "aws_request_id", None),
+        )
         return {
             "statusCode": 500,
             "body": json.dumps({"error": {"message": "An exception occurred"}}),
         }
 
 
+def _load_update(body: Optional[str]) -> Dict[str, Any]:
+    """Decode a webhook body, treating anything but a JSON object as empty."""
+    # Irrelevant update types are recognised without decoding them.
+    if not body or not may_need_handling(body):
+        return {}
+    try:
+        data = json.loads(body or "")
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _webhook_reply(method: str, **params: Any) -> Dict[str, Any]:
+    """Answer the update by returning a Telegram method call as the webhook response."""
+    return {
+        "statusCode": 200,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps({"method": method, **params}),
+    }
+
+
+def _get_queue_url() -> str:
+    queue_url = get_config().queue_url
+    if not queue_url:
+        raise EnvironmentException("QUIZ_QUEUE_URL environment variable is not set")
+    return queue_url
+
+
+def _is_fifo_queue() -> bool:
+    """Whether the quiz queue is a FIFO queue."""
+    config = get_config()
+    if config.queue_fifo is not None:
+        return config.queue_fifo
+    return _get_queue_url().endswith(".fifo")
+
+
+def _get_fifo_params(body: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build MessageGroupId/MessageDeduplicationId for FIFO queues.
+
+    Updates are grouped per Telegram user so they are processed in order,
+    while different users can be processed in parallel. Telegram's update_id
+    deduplicates webhook retries.
+    """
+    if not _is_fifo_queue():
+        return {}
+
+    try:
+        owner_id = get_update_owner_id(data)
+    except (KeyError, TypeError, AttributeError):
+        owner_id = None
+    update_id = data.get("update_id")
+    if update_id is not None:
+        dedup_id = str(update_id)
+    else:
+        dedup_id = hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    return {
+        "MessageGroupId": f"user-{owner_id}" if owner_id is not None else f"update-{dedup_id}",
+        "MessageDeduplicationId": dedup_id,
+    }
+
+
 def _validate_request_token(event):
     """Validate request token in query parameters."""
     query_params = event.get("queryStringParameters", {})
@@ -51,5 +164,9 @@ def _validate_request_token(event):
     if "token" not in query_params:
         raise UnauthorizedException("No token provided")
 
-    if query_params["token"] != os.environ["TOKEN"]:
+    token = get_config().token
+    if token is None:
+        raise EnvironmentException("TOKEN environment variable is not set")
+
+    if query_params["token"] != token:
         raise UnauthorizedException("Invalid token provided")
@@ -1,40 +1,152 @@
 import json
 import os
+from typing import Any, Dict, List, Optional, Tuple
 from services.quiz_service import QuizService
-from errors import EnvironmentException, UnauthorizedException
+from errors import EnvironmentException
+from utils import get_update_owner_id
+from telegram_update import may_need_handling
+from logger import get_logger, start_event
+from metrics import instrument_handler, timed
+from config import get_config
 
+logger = get_logger(__name__)
 
+# Reused across invocations while the Lambda container stays warm.
+_quiz_service: Optional[QuizService] = None
+
+
+def get_quiz_service() -> QuizService:
+    """Return the container-wide QuizService, creating it on first use."""
+    global _quiz_service
+    if _quiz_service is None:
+        with timed("quiz_service_init"):
+            _quiz_service = QuizService()
+    return _quiz_service
+
+
+def reset_quiz_service() -> None:
+    """Drop the cached QuizService so the next invocation builds a new one."""
+    global _quiz_service
+    _quiz_service = None
+
+
+@instrument_handler("quiz_worker")
 def lambda_handler(event, context):
-    """Quiz worker Lambda handler - processes messages from SQS."""
-    quiz_service = QuizService()
+    """Quiz worker Lambda handler - processes messages from SQS.
 
+    Records from different users are processed concurrently, records from the
+    same user strictly in order. Failed records are returned as
+    batchItemFailures so SQS only retries those.
+    """
     # Validate environment variables
     _validate_environment()
 
-    print("Received event:", json.dumps(event))
+    quiz_service = get_quiz_service()
+
+    records = event["Records"]
+    logger.info("batch_received", records=len(records))
 
     try:
+        failed_ids = _process_records(quiz_service, records)
+    except Exception as e:
+        logger.error(
+            "batch_failed",
+            exc_info=True,
+            error=str(e),
+            request_id=getattr(context, "aws_request_id", None),
+        )
+        failed_ids = [record["messageId"] for record in records]
 
-        for record in event["Records"]:
-            body = json.loads(record["body"])
-            quiz_service.handle_telegram_update(body)
+    return {
+        "batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed_ids]
+    }
 
-    except UnauthorizedException as e:
-        return {
-            "statusCode": 401,
-            "body": json.dumps({"error": {"message": str(e)}}),
-        }
 
-    except Exception as e:
-        import traceback
-
-        print(e)
-        print(context)
-        print(traceback.format_exc())
-        return {
-            "statusCode": 500,
-            "body": json.dumps({"error": {"message": "An exception occurred"}}),
-        }
+def _process_records(quiz_service: QuizService, records: List[Dict[str, Any]]) -> List[str]:
+    """Process a batch and return the message IDs that failed."""
+    groups: Dict[str, List[Tuple[Dict[str, Any], Any]]] = {}
+    for record in records:
+        try:
+            data = _decode_body(record)
+        except ValueError as e:
+            # Surfaces as a failure of this record in _process_group.
+            data = e
+        groups.setdefault(_get_ordering_key(record, data), []).append((record, data))
+
+    if len(groups) == 1:
+        return _process_group(quiz_service, next(iter(groups.values())))
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    max_workers = min(len(groups), get_config().worker_concurrency)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda group: _process_group(quiz_service, group), groups.values()
+        )
+        failed_ids = [message_id for group_failed in results for message_id in group_failed]
+
+    # Keep failures in batch order to make retries easy to follow in logs.
+    failed = set(failed_ids)
+    return [record["messageId"] for record in records if record["messageId"] in failed]
+
+
+def _process_group(
+    quiz_service: QuizService, records: List[Tuple[Dict[str, Any], Any]]
+) -> List[str]:
+    """Process one user's records in order, stopping at the first failure.
+
+    Records after a failure are reported as failed without being processed so
+    a retry replays that user's updates in their original order.
+    """
+    for position, (record, data) in enumerate(records):
+        start_event()
+        try:
+            if isinstance(data, Exception):
+                raise data
+            if data is None:
+                continue
+            with timed("process_update"):
+                if _use_async_io():
+                    import asyncio
+
+                    asyncio.run(quiz_service.handle_telegram_update_async(data))
+                else:
+                    quiz_service.handle_telegram_update(data)
+        except Exception as e:
+            logger.error(
+                "record_failed", exc_info=True, message_id=record["messageId"], error=str(e)
+            )
+            return [r["messageId"] for r, _ in records[position:]]
+    return []
+
+
+def _decode_body(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Decode a record body, or None when the raw body needs no handling."""
+    body = record["body"]
+    if not may_need_handling(body):
+        return None
+    data = json.loads(body)
+    return data if isinstance(data, dict) else None
+
+
+def _get_ordering_key(record: Dict[str, Any], data: Any) -> str:
+    """Key records by Telegram user so one user's updates stay in order."""
+    # FIFO queues already carry the group chosen by api_handler.
+    group_id = record.get("attributes", {}).get("MessageGroupId")
+    if group_id:
+        return f"group:{group_id}"
+
+    owner_id = get_update_owner_id(data) if isinstance(data, dict) else None
+
+    if owner_id is not None:
+        return f"group:{owner_id}"
+    # Unknown updates get their own group.
+    return f"message:{record['messageId']}"
+
+
+def _use_async_io() -> bool:
+    """Whether updates should go through the concurrent asyncio path."""
+    return get_config().worker_async
 
 
 def _validate_environment():
@@ -0,0 +1,160 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import requests
+from telegram_service import RETRY_STATUS_CODES, TelegramService
+from telegram_outbox import Outbox, SQSOutbox, decode_intents
+from errors import EnvironmentException
+from logger import get_logger, start_event
+from metrics import instrument_handler, timed
+from config import get_config
+
+logger = get_logger(__name__)
+
+# Reused across invocations while the Lambda container stays warm.
+_telegram_service: Optional[TelegramService] = None
+_outbox: Optional[Outbox] = None
+
+
+def get_telegram_service() -> TelegramService:
+    """Return the container-wide TelegramService, creating it on first use."""
+    global _telegram_service
+    if _telegram_service is None:
+        with timed("telegram_service_init"):
+            _telegram_service = TelegramService()
+    return _telegram_service
+
+
+def get_outbox() -> Outbox:
+    """Return the container-wide outbox used to requeue unsent intents."""
+    global _outbox
+    if _outbox is None:
+        _outbox = SQSOutbox.from_config(get_config())
+    return _outbox
+
+
+def reset_telegram_sender() -> None:
+    """Drop the cached clients so the next invocation builds new ones."""
+    global _telegram_service, _outbox
+    _telegram_service = None
+    _outbox = None
+
+
+@instrument_handler("telegram_sender")
+def lambda_handler(event, context):
+    """Telegram sender Lambda handler - sends queued messages from the outbox.
+
+    Messages for different chats are sent concurrently over the pooled
+    session, messages for one chat strictly in order. Failed records are
+    returned as batchItemFailures so SQS only retries those.
+    """
+    _validate_environment()
+
+    records = event["Records"]
+    logger.info("outbox_batch_received", records=len(records))
+    failed_ids = _send_records(get_telegram_service(), records)
+    return {
+        "batchItemFailures": [{"itemIdentifier": message_id} for message_id in failed_ids]
+    }
+
+
+def _send_records(service: TelegramService, records: List[Dict[str, Any]]) -> List[str]:
+    """Send a batch and return the message IDs that failed."""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault(_get_chat_key(record), []).append(record)
+
+    max_workers = max(1, min(len(groups), get_config().telegram_pool_size))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(lambda group: _send_group(service, group), groups.values())
+        failed = {message_id for group_failed in results for message_id in group_failed}
+    return [record["messageId"] for record in records if record["messageId"] in failed]
+
+
+def _send_group(service: TelegramService, records: List[Dict[str, Any]]) -> List[str]:
+    """Send one chat's records in order, stopping at the first failure."""
+    for position, record in enumerate(records):
+        start_event()
+        try:
+            sent = _send_record(service, record)
+        except Exception as e:
+            logger.error(
+                "outbox_record_failed", exc_info=True, message_id=record["messageId"], error=str(e)
+            )
+            sent = False
+        if not sent:
+            return [r["messageId"] for r in records[position:]]
+    return []
+
+
+def _send_record(service: TelegramService, record: Dict[str, Any]) -> bool:
+    """Send a record's intents in order; False if the whole record should be retried.
+
+    Once some intents went out, the rest are queued again rather than
+    retrying the record, so nothing is sent twice. If even that fails, the
+    rest are logged and dropped.
+    """
+    try:
+        intents = decode_intents(record["body"])
+    except ValueError as e:
+        # Retrying cannot fix the body, so it is dropped.
+        logger.error("outbox_record_dropped", message_id=record["messageId"], error=str(e))
+        return True
+    for position, intent in enumerate(intents):
+        if not _is_valid_intent(intent):
+            logger.error("outbox_intent_dropped", message_id=record["messageId"], intent=intent)
+            continue
+        try:
+            response = service.call(intent["method"], intent["payload"])
+            retry = response.status_code in RETRY_STATUS_CODES
+        except requests.RequestException as e:
+            logger.warning("telegram_send_failed", method=intent["method"], error=str(e))
+            retry = True
+        if retry:
+            if position == 0:
+                return False
+            try:
+                get_outbox().put(intents[position:])
+            except Exception as e:
+                # Retrying the record would resend the intents already delivered.
+                logger.error(
+                    "outbox_requeue_failed",
+                    exc_info=True,
+                    message_id=record["messageId"],
+                    intents=len(intents) - position,
+                    error=str(e),
+                )
+                return True
+            logger.warning("outbox_requeued", intents=len(intents) - position)
+            return True
+        if not response.ok:
+            # Blocked bots and "message is not modified" will not succeed on retry.
+            logger.warning(
+                "telegram_send_rejected", method=intent["method"], status=response.status_code
+            )
+    return True
+
+
+def _is_valid_intent(intent: Any) -> bool:
+    return (
+        isinstance(intent, dict)
+        and isinstance(intent.get("method"), str)
+        and isinstance(intent.get("payload"), dict)
+    )
+
+
+def _get_chat_key(record: Dict[str, Any]) -> str:
+    """Key records by the chat of their first intent so one chat stays in order."""
+    try:
+        chat_id = decode_intents(record["body"])[0]["payload"]["chat_id"]
+    except (ValueError, LookupError, TypeError):
+        chat_id = None
+    if chat_id is None:
+        return f"message:{record['messageId']}"
+    return f"chat:{chat_id}"
+
+
+def _validate_environment():
+    """Validate required environment variables."""
+    if "TOKEN" not in os.environ:
+        raise EnvironmentException("TOKEN environment variable is not set")
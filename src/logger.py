@@ -0,0 +1,111 @@
+"""Structured JSON logging for the Lambda handlers.
+
+Each record is one JSON line on stdout, which CloudWatch Logs indexes as
+fields. Field values may be zero-argument callables; they are only called when
+the record is actually emitted, so expensive payloads cost nothing when the
+level is disabled.
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict
+from config import get_config
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+# Telegram bot tokens appear in API URLs as /bot<id>:<secret>/.
+_BOT_TOKEN_PATTERN = re.compile(r"bot\d+:[A-Za-z0-9_-]+")
+# Message text is masked too: greetings and admin notices quote users' names.
+REDACTED_FIELDS = frozenset({"first_name", "last_name", "username", "token", "text"})
+REDACTED = "***"
+
+_state = threading.local()
+
+
+def start_event() -> None:
+    """
+    Decide whether DEBUG records are emitted for the event being processed.
+
+    Called once per invocation or per processed update. A fraction
+    LOG_DEBUG_SAMPLE_RATE of events log at DEBUG regardless of LOG_LEVEL.
+    """
+    rate = get_config().log_debug_sample_rate
+    _state.sampled = rate > 0 and random.random() < rate
+
+
+def _is_sampled() -> bool:
+    return getattr(_state, "sampled", False)
+
+
+def redact(value: Any) -> Any:
+    """Mask bot tokens in strings, and personal fields and message text in nested data."""
+    if isinstance(value, str):
+        return _BOT_TOKEN_PATTERN.sub("bot" + REDACTED, value)
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if k in REDACTED_FIELDS and v is not None else redact(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+class StructuredLogger:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def is_enabled(self, level: str) -> bool:
+        if level == "DEBUG" and _is_sampled():
+            return True
+        threshold = LEVELS.get(get_config().log_level.upper(), LEVELS["INFO"])
+        return LEVELS[level] >= threshold
+
+    def debug(self, message: str, **fields: Any) -> None:
+        self._emit("DEBUG", message, fields)
+
+    def info(self, message: str, **fields: Any) -> None:
+        self._emit("INFO", message, fields)
+
+    def warning(self, message: str, **fields: Any) -> None:
+        self._emit("WARNING", message, fields)
+
+    def error(self, message: str, exc_info: bool = False, **fields: Any) -> None:
+        if exc_info:
+            fields["traceback"] = traceback.format_exc()
+        self._emit("ERROR", message, fields)
+
+    def _emit(self, level: str, message: str, fields: Dict[str, Any]) -> None:
+        if not self.is_enabled(level):
+            return
+
+        record: Dict[str, Any] = {
+            "timestamp": round(time.time(), 3),
+            "level": level,
+            "logger": self.name,
+            "message": message,
+        }
+        for key, value in fields.items():
+            record[key] = _evaluate(value)
+
+        sys.stdout.write(json.dumps(redact(record), default=str) + "\n")
+
+
+def _evaluate(value: Any) -> Any:
+    """Resolve a lazy field; a failing one is logged instead of raising."""
+    if not callable(value):
+        return value
+    try:
+        return value()
+    except Exception as e:
+        return f"<unavailable: {e!r}>"
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(name)
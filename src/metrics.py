@@ -0,0 +1,201 @@
+"""Per-invocation latency metrics in CloudWatch Embedded Metric Format (EMF).
+
+Spans are timed with ``timed`` (a context manager) or ``timed_function`` (a
+decorator) and collected for the current invocation. ``instrument_handler``
+wraps a Lambda handler: it tags the invocation as cold or warm, and at the
+end writes an EMF line with the durations of each span name. CloudWatch turns
+that line into metrics with no API calls from the function.
+"""
+import functools
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from config import get_config
+
+# Spans listed individually in the EMF record, on top of the metrics.
+MAX_SPANS = 100
+
+# EMF takes at most 100 values per metric; more go into further records.
+MAX_METRIC_VALUES = 100
+
+# Module import is the start of our init phase.
+_init_started = time.perf_counter()
+_cold_start = True
+
+
+class _Recorder:
+    __slots__ = ("function", "cold_start", "started", "durations", "spans", "lock")
+
+    def __init__(self, function: str, cold_start: bool) -> None:
+        self.function = function
+        self.cold_start = cold_start
+        self.started = time.perf_counter()
+        self.durations: Dict[str, List[float]] = {}
+        self.spans: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+
+    def record(self, name: str, started: float, duration_ms: float) -> None:
+        with self.lock:
+            self.durations.setdefault(name, []).append(duration_ms)
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append(
+                    {
+                        "name": name,
+                        "start_ms": round((started - self.started) * 1000, 3),
+                        "duration_ms": round(duration_ms, 3),
+                    }
+                )
+
+
+_recorder: Optional[_Recorder] = None
+
+
+def record_duration(name: str, started: float, duration_ms: float) -> None:
+    """Add a span to the current invocation; ignored outside an invocation."""
+    recorder = _recorder
+    if recorder is not None:
+        recorder.record(name, started, duration_ms)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Time the enclosed block as a span called name."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_duration(name, started, (time.perf_counter() - started) * 1000)
+
+
+def timed_function(name: str) -> Callable:
+    """Decorator form of timed()."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_boto3_client(client: Any, prefix: str) -> None:
+    """Time every API call made through a boto3 client, retries included."""
+
+    def before_call(context: Dict[str, Any], **kwargs: Any) -> None:
+        context["metrics_started"] = time.perf_counter()
+
+    def after_call(context: Dict[str, Any], model: Any, **kwargs: Any) -> None:
+        started = context.get("metrics_started")
+        if started is not None:
+            record_duration(
+                f"{prefix}.{model.name}", started, (time.perf_counter() - started) * 1000
+            )
+
+    events = client.meta.events
+    events.register("before-call.*.*", before_call)
+    events.register("after-call.*.*", after_call)
+
+
+def start_invocation(function: str) -> None:
+    """Begin collecting spans for one Lambda invocation."""
+    global _recorder, _cold_start
+    cold_start = _cold_start
+    _cold_start = False
+    _recorder = _Recorder(function, cold_start)
+    if cold_start:
+        record_duration(
+            "init", _init_started, (_recorder.started - _init_started) * 1000
+        )
+
+
+def flush_metrics() -> Optional[Dict[str, Any]]:
+    """Write the current invocation's EMF records to stdout and stop collecting.
+
+    Returns the first record, which also carries the spans and a summary of
+    each metric.
+    """
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is None:
+        return None
+
+    config = get_config()
+    chunks = {
+        name: [
+            durations[i:i + MAX_METRIC_VALUES]
+            for i in range(0, len(durations), MAX_METRIC_VALUES)
+        ]
+        for name, durations in recorder.durations.items()
+    }
+    records = [
+        _emf_record(
+            recorder,
+            config.metrics_namespace,
+            {name: parts[part] for name, parts in chunks.items() if part < len(parts)},
+        )
+        for part in range(max((len(parts) for parts in chunks.values()), default=1))
+    ]
+    # Not listed under Metrics, so CloudWatch leaves these as plain log fields.
+    records[0]["spans"] = recorder.spans
+    records[0]["summary"] = {
+        name: _summary(durations) for name, durations in recorder.durations.items()
+    }
+
+    if config.metrics_enabled:
+        sys.stdout.write("".join(json.dumps(record) + "\n" for record in records))
+    return records[0]
+
+
+def _emf_record(
+    recorder: _Recorder, namespace: str, values: Dict[str, List[float]]
+) -> Dict[str, Any]:
+    record: Dict[str, Any] = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": namespace,
+                    "Dimensions": [["Function", "ColdStart"]],
+                    "Metrics": [{"Name": name, "Unit": "Milliseconds"} for name in values],
+                }
+            ],
+        },
+        "Function": recorder.function,
+        "ColdStart": "true" if recorder.cold_start else "false",
+    }
+    for name, durations in values.items():
+        record[name] = [round(duration, 3) for duration in durations]
+    return record
+
+
+def _summary(durations: List[float]) -> Dict[str, Any]:
+    return {
+        "Min": min(durations),
+        "Max": max(durations),
+        "Count": len(durations),
+        "Sum": sum(durations),
+    }
+
+
+def instrument_handler(function: str) -> Callable:
+    """Decorate a Lambda handler to time it and flush its metrics when it returns."""
+
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            start_invocation(function)
+            try:
+                with timed("handler"):
+                    return handler(event, context)
+            finally:
+                flush_metrics()
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,223 @@
+"""Token buckets that pace outbound Telegram requests.
+
+Telegram allows about 30 messages a second per bot, one a second per private
+chat and 20 a minute per group. A RateLimiter hands out send slots against
+a global bucket and one bucket per chat; TelegramService waits for its slot
+instead of sending early and being answered with 429.
+
+TELEGRAM_RATE_LIMITER selects the shared state:
+
+- ``local`` (default): buckets live in the container. Each warm container
+  paces itself, so the global rate should leave room for concurrent ones.
+- ``dynamodb``: slots are counted per time window in
+  DYNAMODB_RATE_LIMIT_TABLE, shared by every container.
+- ``none``: no pacing.
+"""
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Tuple
+from config import Config, get_config
+from errors import EnvironmentException
+
+# Chat buckets idle for this long are forgotten.
+_IDLE_CHAT_SECONDS = 60.0
+
+
+class Limit:
+    """A bucket refilling at rate tokens a second and holding up to burst."""
+
+    __slots__ = ("rate", "burst")
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+
+    def __repr__(self) -> str:
+        return f"Limit(rate={self.rate!r}, burst={self.burst!r})"
+
+
+class RateLimiter(ABC):
+    """Hands out send slots for the bot as a whole and for each chat."""
+
+    def __init__(self, global_limit: Limit, chat_limit: Limit, group_limit: Limit) -> None:
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.group_limit = group_limit
+
+    @abstractmethod
+    def reserve(self, chat_id: Optional[int]) -> float:
+        """Reserve the next slot for chat_id; return the seconds to wait for it."""
+
+    def backoff(self, chat_id: Optional[int], seconds: float) -> None:
+        """Hold back a chat that Telegram answered with retry_after."""
+
+    def _chat_limit(self, chat_id: int) -> Limit:
+        # Group and channel IDs are negative.
+        return self.group_limit if chat_id < 0 else self.chat_limit
+
+
+class NoRateLimiter(RateLimiter):
+    """Sends immediately."""
+
+    def __init__(self) -> None:
+        super().__init__(Limit(math.inf), Limit(math.inf), Limit(math.inf))
+
+    def reserve(self, chat_id: Optional[int]) -> float:
+        return 0.0
+
+
+class LocalRateLimiter(RateLimiter):
+    """In-container buckets, kept as the time each one next has room (GCRA)."""
+
+    def __init__(
+        self,
+        global_limit: Limit,
+        chat_limit: Limit,
+        group_limit: Limit,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__(global_limit, chat_limit, group_limit)
+        self.clock = clock
+        self._global_at = 0.0
+        self._chat_at: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, chat_id: Optional[int]) -> float:
+        with self._lock:
+            now = self.clock()
+            delay, self._global_at = _take(self._global_at, now, self.global_limit)
+            if isinstance(chat_id, int):
+                if len(self._chat_at) > 1024:
+                    self._forget_idle_chats(now)
+                chat_delay, self._chat_at[chat_id] = _take(
+                    self._chat_at.get(chat_id, 0.0), now, self._chat_limit(chat_id)
+                )
+                delay = max(delay, chat_delay)
+            return delay
+
+    def backoff(self, chat_id: Optional[int], seconds: float) -> None:
+        with self._lock:
+            until = self.clock() + seconds
+            if isinstance(chat_id, int):
+                limit = self._chat_limit(chat_id)
+                # The bucket is empty until `until`.
+                self._chat_at[chat_id] = max(
+                    self._chat_at.get(chat_id, 0.0),
+                    until + (limit.burst - 1) / limit.rate,
+                )
+            else:
+                limit = self.global_limit
+                self._global_at = max(self._global_at, until + (limit.burst - 1) / limit.rate)
+
+    def _forget_idle_chats(self, now: float) -> None:
+        idle = now - _IDLE_CHAT_SECONDS
+        for chat_id in [c for c, at in self._chat_at.items() if at < idle]:
+            del self._chat_at[chat_id]
+
+
+def _take(at: float, now: float, limit: Limit) -> Tuple[float, float]:
+    """Take one token; return (seconds to wait, the bucket's new next-room time).
+
+    ``at`` is when the bucket will be full again; a request fits as long as
+    that is at most burst - 1 intervals away.
+    """
+    if math.isinf(limit.rate):
+        return 0.0, at
+    interval = 1.0 / limit.rate
+    start = max(at, now)
+    allowed_at = start - (limit.burst - 1) * interval
+    return max(0.0, allowed_at - now), start + interval
+
+
+class DynamoDBRateLimiter(RateLimiter):
+    """Buckets shared by every container, counted per time window.
+
+    A window lasts burst / rate seconds (at least one) and holds that many
+    slots. Each reservation ADDs 1 to the counter of the current window and
+    moves on to the next window while the counter is over capacity. Counters
+    expire through DynamoDB TTL.
+    """
+
+    def __init__(
+        self,
+        table: Any,
+        global_limit: Limit,
+        chat_limit: Limit,
+        group_limit: Limit,
+        max_delay: float = 10.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        super().__init__(global_limit, chat_limit, group_limit)
+        self.table = table
+        self.max_delay = max_delay
+        self.clock = clock
+
+    @classmethod
+    def from_config(cls, config: Config, **limits: Limit) -> "DynamoDBRateLimiter":
+        import boto3
+        from metrics import instrument_boto3_client
+        from services.storage import ClientTable
+
+        dynamodb = boto3.resource("dynamodb", region_name=config.dynamodb_region)
+        instrument_boto3_client(dynamodb.meta.client, "dynamodb")
+        # Telegram calls reserve slots from several threads at once.
+        return cls(
+            ClientTable(dynamodb.meta.client, config.dynamodb_rate_limit_table),
+            max_delay=config.telegram_max_retry_delay,
+            **limits,
+        )
+
+    def reserve(self, chat_id: Optional[int]) -> float:
+        now = self.clock()
+        delay = self._reserve("global", self.global_limit, now)
+        if isinstance(chat_id, int):
+            limit = self._chat_limit(chat_id)
+            # The chat's slot is searched for from the global one onwards.
+            delay += self._reserve(f"chat:{chat_id}", limit, now + delay)
+        return delay
+
+    def _reserve(self, key: str, limit: Limit, now: float) -> float:
+        if math.isinf(limit.rate):
+            return 0.0
+        window = max(1.0, limit.burst / limit.rate)
+        capacity = max(1, round(limit.rate * window))
+        index = int(now // window)
+        while True:
+            start = index * window
+            delay = max(0.0, start - now)
+            if delay > self.max_delay:
+                # Sending late beats not sending; Telegram's 429 handling takes over.
+                return self.max_delay
+            response = self.table.update_item(
+                Key={"LimitKey": f"{key}:{index}"},
+                UpdateExpression="ADD #count :one SET #expires_at = :expires_at",
+                ExpressionAttributeNames={"#count": "count", "#expires_at": "expires_at"},
+                ExpressionAttributeValues={
+                    ":one": 1,
+                    ":expires_at": int(start + window) + 60,
+                },
+                ReturnValues="UPDATED_NEW",
+            )
+            if int(response["Attributes"]["count"]) <= capacity:
+                return delay
+            index += 1
+
+
+def create_rate_limiter(config: Optional[Config] = None) -> RateLimiter:
+    """Build the limiter named by TELEGRAM_RATE_LIMITER: local, dynamodb or none."""
+    config = config or get_config()
+    backend = config.telegram_rate_limiter
+    if backend == "none":
+        return NoRateLimiter()
+    limits = {
+        "global_limit": Limit(config.telegram_global_rate, config.telegram_global_burst),
+        "chat_limit": Limit(config.telegram_chat_rate, config.telegram_chat_burst),
+        "group_limit": Limit(config.telegram_group_rate, config.telegram_group_burst),
+    }
+    if backend == "local":
+        return LocalRateLimiter(**limits)
+    if backend == "dynamodb":
+        return DynamoDBRateLimiter.from_config(config, **limits)
+    raise EnvironmentException(f"Unknown TELEGRAM_RATE_LIMITER: {backend}")
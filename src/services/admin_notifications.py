@@ -0,0 +1,118 @@
+"""Admin notifications, sent one by one or gathered into digests.
+
+ADMIN_NOTIFICATIONS selects the mode:
+
+- ``immediate`` (default): every /start is sent to each admin as it happens.
+- ``digest``: /start and quiz completion events are buffered in storage. Each
+  admin gets them as one message once ADMIN_DIGEST_MAX_EVENTS are pending or
+  the oldest is ADMIN_DIGEST_INTERVAL_SECONDS old. The scheduled admin_digest
+  handler sends whatever a quiet spell leaves in the buffer.
+"""
+import time
+from typing import Callable, List, Optional
+from config import Config, get_config
+from errors import EnvironmentException
+from logger import get_logger
+from services.storage import QuizStorage
+from telegram_service import AsyncTelegramService, TelegramService
+
+logger = get_logger(__name__)
+
+NOTIFICATION_MODES = ("immediate", "digest")
+
+# Telegram rejects messages longer than 4096 characters.
+_MAX_DIGEST_LENGTH = 4000
+
+
+class AdminNotifier:
+    """Tells the admins who started and finished the quiz."""
+
+    def __init__(
+        self,
+        storage: QuizStorage,
+        telegram_service: TelegramService,
+        async_telegram_service: Optional[AsyncTelegramService] = None,
+        digest: bool = False,
+        max_events: int = 50,
+        interval: int = 300,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.storage = storage
+        self.telegram_service = telegram_service
+        self.async_telegram_service = async_telegram_service or AsyncTelegramService(
+            telegram_service
+        )
+        self.digest = digest
+        self.max_events = max_events
+        self.interval = interval
+        self.clock = clock
+
+    @classmethod
+    def from_config(
+        cls,
+        storage: QuizStorage,
+        telegram_service: TelegramService,
+        async_telegram_service: Optional[AsyncTelegramService] = None,
+        config: Optional[Config] = None,
+    ) -> "AdminNotifier":
+        config = config or get_config()
+        if config.admin_notifications not in NOTIFICATION_MODES:
+            raise EnvironmentException(
+                f"Unknown ADMIN_NOTIFICATIONS: {config.admin_notifications}"
+            )
+        return cls(
+            storage,
+            telegram_service,
+            async_telegram_service,
+            digest=config.admin_notifications == "digest",
+            max_events=config.admin_digest_max_events,
+            interval=config.admin_digest_interval,
+        )
+
+    def notify(self, text: str, digest_only: bool = False) -> None:
+        """Send text to the admins, or add it to the next digest.
+
+        Events marked digest_only are too frequent for a message of their own
+        and are dropped in immediate mode.
+        """
+        if not self.digest:
+            if not digest_only:
+                self.telegram_service.notify_admins(text)
+            return
+        now = round(self.clock())
+        pending, since = self.storage.add_admin_event(text, now)
+        if pending >= self.max_events or now - since >= self.interval:
+            self.flush()
+
+    async def notify_async(self, text: str, digest_only: bool = False) -> None:
+        """Async variant of notify; admins are messaged concurrently."""
+        import asyncio
+
+        if not self.digest:
+            if not digest_only:
+                await self.async_telegram_service.notify_admins(text)
+            return
+        await asyncio.to_thread(self.notify, text, digest_only)
+
+    def flush(self) -> int:
+        """Send the pending events as one digest per admin; return how many."""
+        events = self.storage.take_admin_events()
+        if events:
+            logger.info("admin_digest_sent", events=len(events))
+            self.telegram_service.notify_admins(format_digest(events))
+        return len(events)
+
+
+def format_digest(events: List[str]) -> str:
+    """One message listing the events, cut short to fit Telegram's limit."""
+    lines = [f"Quiz activity: {len(events)} event{'s' if len(events) != 1 else ''}"]
+    length = len(lines[0])
+    for shown, event in enumerate(events):
+        line = f"- {event}"
+        # Leave room for the "more" line.
+        if length + len(line) + 1 > _MAX_DIGEST_LENGTH - 32:
+            lines.append(f"... and {len(events) - shown} more")
+            break
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
@@ -0,0 +1,101 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Iterator, Optional
+from config import Config, get_config
+from logger import get_logger
+from services.storage import QuizStorage
+
+logger = get_logger(__name__)
+
+
+class UpdateDeduplicator:
+    """Lets each Telegram update through once, keyed on its update_id.
+
+    A claim is written to storage before the update is handled and marked done
+    afterwards, so SQS redeliveries are dropped before any side effect. Updates
+    this container has finished are also kept in a small LRU and dropped
+    without a storage call.
+
+    A claim whose handler raises is released so the retry runs. While another
+    worker holds the claim, UpdateInProgressException propagates and the
+    record fails, so SQS keeps the message. A claim left by a worker that died
+    mid-update lapses after the lease and the redelivery processes it. Failing to release or complete a claim is logged and
+    does not fail the update: the claim then lapses like a crashed worker's.
+    """
+
+    def __init__(
+        self,
+        storage: QuizStorage,
+        cache_size: int = 4096,
+        lease_seconds: int = 60,
+        ttl: int = 4 * 24 * 60 * 60,
+    ) -> None:
+        self.storage = storage
+        self.cache_size = cache_size
+        self.lease_seconds = lease_seconds
+        self.ttl = ttl
+        self._done: "OrderedDict[int, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(
+        cls, storage: QuizStorage, config: Optional[Config] = None
+    ) -> "UpdateDeduplicator":
+        config = config or get_config()
+        return cls(
+            storage,
+            cache_size=config.idempotency_cache_size,
+            lease_seconds=config.idempotency_lease_seconds,
+            ttl=config.idempotency_ttl,
+        )
+
+    @contextmanager
+    def claim(self, update_id: Any) -> Iterator[bool]:
+        """Yield whether the update should be handled; False once it is done.
+
+        Updates without an integer update_id are always handled.
+        """
+        if not isinstance(update_id, int) or isinstance(update_id, bool):
+            yield True
+            return
+        if self._seen(update_id):
+            yield False
+            return
+
+        now = round(datetime.now().timestamp())
+        if not self.storage.claim_update(
+            update_id, now, now + self.lease_seconds, now + self.ttl
+        ):
+            yield False
+            return
+
+        try:
+            yield True
+        except BaseException:
+            try:
+                self.storage.release_update(update_id)
+            except Exception as e:
+                # The handler's error is the one worth raising.
+                logger.warning("update_release_failed", update_id=update_id, error=str(e))
+            raise
+        try:
+            self.storage.complete_update(update_id, round(datetime.now().timestamp()) + self.ttl)
+        except Exception as e:
+            # Failing the handled update would make SQS redeliver it and repeat its effects.
+            logger.warning("update_complete_failed", update_id=update_id, error=str(e))
+        self._remember(update_id)
+
+    def _seen(self, update_id: int) -> bool:
+        with self._lock:
+            if update_id not in self._done:
+                return False
+            self._done.move_to_end(update_id)
+            return True
+
+    def _remember(self, update_id: int) -> None:
+        with self._lock:
+            self._done[update_id] = None
+            while len(self._done) > self.cache_size:
+                self._done.popitem(last=False)
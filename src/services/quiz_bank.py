@@ -0,0 +1,144 @@
+import json
+import zlib
+from types import MappingProxyType
+from typing import Any, Iterator, List, Mapping, Optional, Tuple
+from utils import build_compact_reply_markup, get_callback_secret
+
+
+class Question:
+    """A compiled, read-only quiz question."""
+
+    __slots__ = (
+        "index",
+        "text",
+        "choices",
+        "answer",
+        "answer_index",
+        "choice_indexes",
+        "topic",
+        "difficulty",
+        "reply_markup",
+        "reply_markup_json",
+    )
+
+    def __init__(
+        self,
+        index: int,
+        text: str,
+        choices: Tuple[str, ...],
+        answer: str,
+        quiz_version: int = 0,
+        secret: Optional[bytes] = None,
+        topic: Optional[str] = None,
+        difficulty: Optional[str] = None,
+    ) -> None:
+        choice_indexes = {choice: i for i, choice in enumerate(choices)}
+        reply_markup = build_compact_reply_markup(list(choices), index, quiz_version, secret)
+
+        _set = object.__setattr__
+        _set(self, "index", index)
+        _set(self, "text", text)
+        _set(self, "choices", choices)
+        _set(self, "answer", answer)
+        _set(self, "answer_index", choice_indexes.get(answer))
+        _set(self, "choice_indexes", MappingProxyType(choice_indexes))
+        _set(self, "topic", topic)
+        _set(self, "difficulty", difficulty)
+        _set(self, "reply_markup", reply_markup)
+        # Telegram accepts reply_markup as a JSON string, so it is serialised once here.
+        _set(self, "reply_markup_json", json.dumps(reply_markup, separators=(",", ":")))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __repr__(self) -> str:
+        return f"Question(index={self.index!r}, text={self.text!r})"
+
+    def is_correct(self, answer: str) -> bool:
+        """Check if answer matches the correct answer for this question."""
+        return answer == self.answer
+
+    def is_correct_choice(self, choice_index: int) -> bool:
+        """Check if the choice at choice_index is the correct answer."""
+        return self.answer_index is not None and choice_index == self.answer_index
+
+
+class QuizBank:
+    """An immutable sequence of compiled questions.
+
+    version identifies the bank's content so callbacks from keyboards sent
+    before the bank changed can be recognised as stale.
+    """
+
+    __slots__ = ("questions", "version")
+
+    def __init__(self, questions: Tuple[Question, ...], version: int = 0) -> None:
+        object.__setattr__(self, "questions", questions)
+        object.__setattr__(self, "version", version)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def __getitem__(self, index: int) -> Question:
+        return self.questions[index]
+
+    def __iter__(self) -> Iterator[Question]:
+        return iter(self.questions)
+
+    def get(self, index: int) -> Optional[Question]:
+        """Get a question by index, or None when out of range."""
+        if 0 <= index < len(self.questions):
+            return self.questions[index]
+        return None
+
+
+def get_quiz_version(quiz_data: List[Mapping[str, Any]]) -> int:
+    """16-bit fingerprint of the quiz content."""
+    canonical = json.dumps(quiz_data, sort_keys=True, separators=(",", ":"))
+    return zlib.crc32(canonical.encode("utf-8")) & 0xFFFF
+
+
+def compile_quiz_bank(
+    quiz_data: List[Mapping[str, Any]], secret: Optional[bytes] = None
+) -> QuizBank:
+    """Compile raw quiz dictionaries into a QuizBank."""
+    version = get_quiz_version(quiz_data)
+    return QuizBank(
+        tuple(
+            Question(
+                index=index,
+                text=item["question"],
+                choices=tuple(item["choices"]),
+                answer=item["answer"],
+                quiz_version=version,
+                secret=secret,
+                topic=item.get("topic"),
+                difficulty=item.get("difficulty"),
+            )
+            for index, item in enumerate(quiz_data)
+        ),
+        version=version,
+    )
+
+
+# Compiled once per container.
+_quiz_bank: Optional[QuizBank] = None
+
+
+def get_quiz_bank() -> QuizBank:
+    """Return the compiled quiz bank for services/quiz_dict.py."""
+    global _quiz_bank
+    if _quiz_bank is None:
+        from services.quiz_dict import quiz_dict
+
+        _quiz_bank = compile_quiz_bank(quiz_dict, get_callback_secret())
+    return _quiz_bank
+
+
+def reset_quiz_bank() -> None:
+    """Drop the compiled quiz bank so it is rebuilt on next use."""
+    global _quiz_bank
+    _quiz_bank = None
@@ -0,0 +1,168 @@
+import zlib
+from bisect import bisect_right
+from typing import List, Optional, Sequence, Tuple
+from config import Config, get_config
+from errors import EnvironmentException
+from services.quiz_bank import Question, QuizBank
+
+# Question attributes a sample can be stratified by (QUIZ_SAMPLE_STRATA).
+STRATA_ATTRIBUTES = ("topic", "difficulty")
+
+_MASK64 = (1 << 64) - 1
+_FEISTEL_ROUNDS = 4
+
+# Keeps the keys of the different permutations of one attempt apart.
+_QUESTIONS_TWEAK = 1
+_STRATUM_TWEAK = 2
+_CHOICES_TWEAK = 3
+
+
+def _splitmix64(value: int) -> int:
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+def _derive_key(seed: int, *parts: int) -> int:
+    key = seed
+    for part in parts:
+        key = _splitmix64(key ^ part)
+    return key
+
+
+def attempt_seed(user_id: int, attempt_id: int) -> int:
+    """64-bit seed for one user's attempt; the same inputs give the same quiz."""
+    return _derive_key(_splitmix64(user_id & _MASK64), attempt_id)
+
+
+class Permutation:
+    """A keyed permutation of range(size) evaluated one position at a time.
+
+    A small Feistel network permutes the smallest even-bit domain that covers
+    size, and cycle-walking maps it back into range(size). The domain is under
+    four times size, so a lookup takes a few rounds on average and nothing
+    proportional to size is stored.
+    """
+
+    __slots__ = ("size", "_half_bits", "_half_mask", "_round_keys")
+
+    def __init__(self, size: int, key: int) -> None:
+        bits = max(2, (size - 1).bit_length())
+        bits += bits % 2
+        self.size = size
+        self._half_bits = bits // 2
+        self._half_mask = (1 << self._half_bits) - 1
+        self._round_keys = tuple(_derive_key(key, r) for r in range(_FEISTEL_ROUNDS))
+
+    def __call__(self, position: int) -> int:
+        if not 0 <= position < self.size:
+            raise IndexError(position)
+        value = position
+        while True:
+            value = self._encrypt(value)
+            if value < self.size:
+                return value
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self._half_bits, value & self._half_mask
+        for round_key in self._round_keys:
+            left, right = right, left ^ (_splitmix64(right ^ round_key) & self._half_mask)
+        return (left << self._half_bits) | right
+
+
+class QuestionSampler:
+    """Chooses the questions of each attempt from a QuizBank.
+
+    With size 0 every attempt asks the whole bank in order. Otherwise an
+    attempt asks size questions sampled without replacement, in a random
+    order, with shuffled choices. When strata are given, each group of
+    questions sharing those attributes gets a share of the sample in
+    proportion to its size.
+
+    The grouping and quotas are computed once per bank; the question at a
+    position is derived from the attempt's seed on demand, so an attempt's
+    ordering never needs to be stored.
+    """
+
+    def __init__(self, bank: QuizBank, size: int = 0, strata: Sequence[str] = ()) -> None:
+        unknown = [name for name in strata if name not in STRATA_ATTRIBUTES]
+        if unknown:
+            raise EnvironmentException(f"Unknown QUIZ_SAMPLE_STRATA attribute: {unknown[0]}")
+
+        self.bank = bank
+        self.sampled = size > 0
+        self.length = min(size, len(bank)) if self.sampled else len(bank)
+
+        groups = _group_questions(bank, strata) if self.sampled else []
+        quotas = _allocate(self.length, [len(group) for group in groups])
+        self._groups: Tuple[Tuple[int, ...], ...] = tuple(
+            group for group, quota in zip(groups, quotas) if quota
+        )
+        self._group_ids = tuple(i for i, quota in enumerate(quotas) if quota)
+        # Position boundaries between groups; bisected to find a slot's group.
+        ends: List[int] = []
+        for quota in quotas:
+            if quota:
+                ends.append((ends[-1] if ends else 0) + quota)
+        self._group_ends = tuple(ends)
+
+        # Keyboards carry this as their quiz version, so changing the sample
+        # settings makes keyboards of attempts in progress stale.
+        if self.sampled:
+            fingerprint = f"{bank.version}:{self.length}:{','.join(strata)}"
+            self.version = zlib.crc32(fingerprint.encode("utf-8")) & 0xFFFF
+        else:
+            self.version = bank.version
+
+    @classmethod
+    def from_config(cls, bank: QuizBank, config: Optional[Config] = None) -> "QuestionSampler":
+        """Sampler for QUIZ_SAMPLE_SIZE and QUIZ_SAMPLE_STRATA."""
+        config = config or get_config()
+        return cls(bank, config.sample_size, config.sample_strata)
+
+    def question(self, seed: int, position: int) -> Optional[Question]:
+        """The question asked at position in the attempt seeded with seed."""
+        if not 0 <= position < self.length:
+            return None
+        if not self.sampled:
+            return self.bank[position]
+
+        slot = Permutation(self.length, _derive_key(seed, _QUESTIONS_TWEAK))(position)
+        group = bisect_right(self._group_ends, slot)
+        rank = slot - (self._group_ends[group - 1] if group else 0)
+        members = self._groups[group]
+        key = _derive_key(seed, _STRATUM_TWEAK, self._group_ids[group])
+        return self.bank[members[Permutation(len(members), key)(rank)]]
+
+    def choice_order(self, seed: int, question: Question) -> Optional[List[int]]:
+        """Choice indexes in display order, or None to keep the bank's order."""
+        if not self.sampled:
+            return None
+        permutation = Permutation(
+            len(question.choices), _derive_key(seed, _CHOICES_TWEAK, question.index)
+        )
+        return [permutation(i) for i in range(len(question.choices))]
+
+
+def _group_questions(bank: QuizBank, strata: Sequence[str]) -> List[Tuple[int, ...]]:
+    """Question indexes grouped by their strata values, in order of first appearance."""
+    groups = {}
+    for question in bank:
+        key = tuple(getattr(question, name) for name in strata)
+        groups.setdefault(key, []).append(question.index)
+    return [tuple(members) for members in groups.values()]
+
+
+def _allocate(total: int, sizes: Sequence[int]) -> List[int]:
+    """Split total across groups in proportion to sizes (largest remainder)."""
+    population = sum(sizes)
+    if not population:
+        return [0] * len(sizes)
+    quotas = [total * size // population for size in sizes]
+    by_remainder = sorted(
+        range(len(sizes)), key=lambda i: (-(total * sizes[i] % population), i)
+    )
+    for i in by_remainder[: total - sum(quotas)]:
+        quotas[i] += 1
+    return quotas
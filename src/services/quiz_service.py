@@ -1,44 +1,112 @@
-import os
-import boto3
+import threading
+from contextlib import nullcontext
 from datetime import datetime
-from typing import Dict, Any, List, Optional
-from boto3.dynamodb.conditions import Key
+from typing import ContextManager, Dict, Any, NamedTuple, Optional, Tuple
 from utils import (
-    parse_telegram_update,
+    SESSION_MASK_BITS,
+    START_PROMPT_TEXT,
+    build_session_reply_markup_json,
+    classify_update,
+    decode_session_callback_data,
+    SessionCallbackData,
     parse_callback_data,
+    decode_callback_data,
+    get_callback_secret,
+    is_legacy_callback_data,
     get_full_name,
-    is_correct_answer,
-    build_reply_markup,
-    is_allowed_chat,
 )
-from telegram_service import TelegramService
+from services.admin_notifications import AdminNotifier
+from services.idempotency import UpdateDeduplicator
+from services.quiz_bank import Question, QuizBank, get_quiz_bank
+from services.quiz_sampling import QuestionSampler, attempt_seed
+from services.storage import QuizStorage, create_storage
+from telegram_outbox import create_telegram_service
+from telegram_service import AsyncTelegramService
+from config import get_config
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Group invite link cached for the lifetime of a warm container.
+_group_link_cache: Dict[str, Any] = {}
+_group_link_lock = threading.Lock()
+
+
+def reset_group_link_cache() -> None:
+    """Forget the in-container group link."""
+    _group_link_cache.clear()
+
+
+class Answer(NamedTuple):
+    question_index: int
+    is_correct: bool
+    # The attempt the answer belongs to, with correct_mask already including
+    # this answer. None for keyboards sent before attempts existed.
+    session: Optional[SessionCallbackData] = None
+
+    @property
+    def position(self) -> int:
+        """Where the question was asked: its place in the attempt or the bank."""
+        return self.session.position if self.session else self.question_index
 
 
 class QuizService:
-    def __init__(self) -> None:
-        dynamodb = boto3.resource("dynamodb", region_name="ap-southeast-1")  
-        self.table = dynamodb.Table("belajarpythonbot2023")  # type: ignore
-        self.dynamodb = dynamodb
-        self.telegram_service = TelegramService()
-        self.quiz_data = self._load_quiz_data()
+    def __init__(self, storage: Optional[QuizStorage] = None) -> None:
+        self.storage = storage or create_storage()
+        self.deduplicator = self._load_deduplicator()
+        self.telegram_service = create_telegram_service()
+        self.async_telegram_service = AsyncTelegramService(self.telegram_service)
+        self.admin_notifier = AdminNotifier.from_config(
+            self.storage, self.telegram_service, self.async_telegram_service
+        )
+        self.quiz_bank = self._load_quiz_data()
+        self.callback_secret = get_callback_secret()
+        self.legacy_callbacks = get_config().legacy_callbacks
+        self.sampler = self._load_sampler()
+        self.write_behind = self._use_write_behind()
 
     def handle_telegram_update(self, data: Dict[str, Any]) -> None:
-        """Handle incoming Telegram update."""
-        message, callback_query = parse_telegram_update(data)
-
-        if message and not is_allowed_chat(message.get("chat_id"), message.get("chat_type")):
+        """Handle incoming Telegram update, once per update_id."""
+        kind, payload = classify_update(data)
+        if kind == "ignore":
             return
-        if callback_query and not is_allowed_chat(
-            callback_query.get("chat_id"), callback_query.get("chat_type")
-        ):
+
+        with self._claim_update(data) as fresh:
+            if not fresh:
+                logger.info("update_duplicate", update_id=data.get("update_id"))
+                return
+            # With an outbox, the update's messages are queued once it is handled.
+            with self.telegram_service.batch():
+                if kind == "start":
+                    self._handle_start_command(payload)
+                elif kind == "callback":
+                    self._handle_callback_query(payload)
+                elif kind == "text":
+                    self._handle_text_message(payload)
+
+    async def handle_telegram_update_async(self, data: Dict[str, Any]) -> None:
+        """Handle incoming Telegram update, overlapping independent I/O."""
+        kind, payload = classify_update(data)
+        if kind == "ignore":
             return
 
-        if message and message["text"] == "/start":
-            self._handle_start_command(message)
-        elif callback_query:
-            self._handle_callback_query(callback_query)
-        elif message:
-            self._handle_text_message(message)
+        with self._claim_update(data) as fresh:
+            if not fresh:
+                logger.info("update_duplicate", update_id=data.get("update_id"))
+                return
+            with self.telegram_service.batch():
+                if kind == "start":
+                    await self._handle_start_command_async(payload)
+                elif kind == "callback":
+                    await self._handle_callback_query_async(payload)
+                elif kind == "text":
+                    await self._handle_text_message_async(payload)
+
+    def _claim_update(self, data: Dict[str, Any]) -> ContextManager[bool]:
+        """Claim the update for this worker; yields False for duplicates."""
+        if self.deduplicator is None:
+            return nullcontext(True)
+        return self.deduplicator.claim(data.get("update_id"))
 
     def _handle_start_command(self, message: Dict[str, Any]) -> None:
         """Handle /start command."""
@@ -47,6 +115,7 @@ class QuizService:
         ):
             return
 
+        logger.info("quiz_started", user_id=message["user_id"])
         user = self._add_or_get_user(
             message["user_id"], message["first_name"], message["username"]
         )
@@ -58,14 +127,10 @@ class QuizService:
         )
 
         # Send first question
-        self._send_question(message["chat_id"], 0)
+        self._send_question(message["chat_id"], 0, **self._new_attempt(message))
 
         # Notify admin
-        full_name = get_full_name(message["first_name"], message.get("last_name"))
-        username = message.get("username", "")
-        self.telegram_service.notify_admins(
-            f"{full_name} - {username} started the quiz"
-        )
+        self.admin_notifier.notify(f"{self._describe_user(message)} started the quiz")
 
     def _handle_callback_query(self, callback_query: Dict[str, Any]) -> None:
         """Handle callback query from inline buttons."""
@@ -74,17 +139,18 @@ class QuizService:
         ):
             return
 
-        question_index, answer = parse_callback_data(callback_query["data"])
-
-        if question_index < 0:
+        # Check answer
+        answer = self._resolve_answer(callback_query)
+        if answer is None:
             return
+        user_id = callback_query["user_id"]
 
-        # Check answer
-        current_question = self.quiz_data[question_index]
-        is_correct = is_correct_answer(current_question, answer)
+        total_questions = self._get_total_questions(answer.session)
+        next_position = answer.position + 1
+        is_last = next_position >= total_questions
 
         # Save result
-        self._save_quiz_result(callback_query["user_id"], question_index, is_correct)
+        correct_count = self._save_answer(user_id, answer, is_last)
 
         # Remove inline button by editing the message
         if callback_query.get("message_id") and callback_query.get("message_text"):
@@ -95,15 +161,78 @@ class QuizService:
             )
 
         # Move to next question
-        next_question_index = question_index + 1
-
-        if next_question_index < len(self.quiz_data):
-            self._send_question(callback_query["chat_id"], next_question_index)
+        if not is_last:
+            self._send_question(
+                callback_query["chat_id"],
+                next_position,
+                user_id=user_id,
+                session=answer.session,
+            )
         else:
-            self._send_quiz_results(
-                callback_query["chat_id"], callback_query["user_id"]
+            correct_count = self._send_quiz_results(
+                callback_query["chat_id"], user_id, correct_count, total_questions
+            )
+            self.admin_notifier.notify(
+                self._describe_completion(callback_query, correct_count, total_questions),
+                digest_only=True,
             )
 
+    def _resolve_answer(self, callback_query: Dict[str, Any]) -> Optional[Answer]:
+        """Resolve a button press from either an attempt or a plain keyboard."""
+        session = decode_session_callback_data(
+            callback_query["data"], callback_query["user_id"], self.callback_secret
+        )
+        if session is None:
+            answered = self._parse_answer(callback_query["data"])
+            return Answer(*answered) if answered is not None else None
+
+        question = None
+        if session.quiz_version == self.sampler.version:
+            question = self._get_question(session.position, callback_query["user_id"], session)
+        if question is None or session.choice_index >= len(question.choices):
+            logger.debug("callback_rejected", reason="stale", callback_data=callback_query["data"])
+            return None
+
+        is_correct = question.is_correct_choice(session.choice_index)
+        if session.write_behind:
+            bit = 1 << session.position
+            session = session._replace(
+                correct_mask=(session.correct_mask & ~bit) | (bit if is_correct else 0)
+            )
+        return Answer(question.index, is_correct, session)
+
+    def _parse_answer(self, callback_data: str) -> Optional[Tuple[int, bool]]:
+        """Resolve callback_data to the answered question index and correctness.
+
+        Forged, malformed and stale callbacks resolve to None, before any
+        DynamoDB access.
+        """
+        # Keyboards sent before compact callback_data still carry choice text.
+        # They are unsigned, so they are only accepted while opted in.
+        if is_legacy_callback_data(callback_data):
+            if not self.legacy_callbacks:
+                logger.debug("callback_rejected", reason="legacy", callback_data=callback_data)
+                return None
+            question_index, answer = parse_callback_data(callback_data)
+            question = self.quiz_bank.get(question_index)
+            if question is None:
+                return None
+            return question.index, question.is_correct(answer)
+
+        payload = decode_callback_data(callback_data, self.callback_secret)
+        if payload is None or payload.quiz_version != self.quiz_bank.version:
+            logger.debug(
+                "callback_rejected",
+                reason="invalid" if payload is None else "stale",
+                callback_data=callback_data,
+            )
+            return None
+
+        question = self.quiz_bank.get(payload.question_index)
+        if question is None or payload.choice_index >= len(question.choices):
+            return None
+        return question.index, question.is_correct_choice(payload.choice_index)
+
     def _handle_text_message(self, message: Dict[str, Any]) -> None:
         """Handle regular text messages."""
         if not isinstance(message.get("chat_id"), int):
@@ -111,25 +240,233 @@ class QuizService:
 
         # Keep the bot quiet unless the user starts the quiz.
         self.telegram_service.send_message(
-            chat_id=message["chat_id"], text="Send /start to begin the quiz."
+            chat_id=message["chat_id"], text=START_PROMPT_TEXT
         )
 
-    def _send_question(self, chat_id: int, question_index: int) -> None:
-        """Send a quiz question to the user."""
-        if question_index >= len(self.quiz_data):
+    async def _handle_start_command_async(self, message: Dict[str, Any]) -> None:
+        """Handle /start command; admin notifications overlap the welcome flow."""
+        import asyncio
+
+        if not isinstance(message.get("user_id"), int) or not isinstance(
+            message.get("chat_id"), int
+        ):
             return
 
-        question = self.quiz_data[question_index]
-        reply_markup = build_reply_markup(question["choices"], question_index)
+        logger.info("quiz_started", user_id=message["user_id"])
+        await asyncio.gather(
+            self._welcome_user_async(message),
+            self.admin_notifier.notify_async(
+                f"{self._describe_user(message)} started the quiz"
+            ),
+        )
+
+    async def _welcome_user_async(self, message: Dict[str, Any]) -> None:
+        """Register the user, greet them and send the first question in order."""
+        import asyncio
+
+        user = await asyncio.to_thread(
+            self._add_or_get_user,
+            message["user_id"],
+            message["first_name"],
+            message["username"],
+        )
+
+        await self.async_telegram_service.send_message(
+            chat_id=message["chat_id"],
+            text=f"Hello {get_full_name(user['first_name'], user.get('last_name'))}, please answer the following questions",
+        )
+        await self._send_question_async(
+            message["chat_id"], 0, **self._new_attempt(message)
+        )
+
+    async def _handle_callback_query_async(self, callback_query: Dict[str, Any]) -> None:
+        """Handle callback query; save, edit and next question run concurrently."""
+        import asyncio
+
+        if not isinstance(callback_query.get("user_id"), int) or not isinstance(
+            callback_query.get("chat_id"), int
+        ):
+            return
+
+        answer = self._resolve_answer(callback_query)
+        if answer is None:
+            return
+        user_id = callback_query["user_id"]
+
+        total_questions = self._get_total_questions(answer.session)
+        next_position = answer.position + 1
+        is_last = next_position >= total_questions
+
+        pending = [asyncio.to_thread(self._save_answer, user_id, answer, is_last)]
+        if callback_query.get("message_id") and callback_query.get("message_text"):
+            pending.append(
+                self.async_telegram_service.edit_message(
+                    chat_id=callback_query["chat_id"],
+                    message_id=callback_query["message_id"],
+                    text=callback_query["message_text"],
+                )
+            )
+
+        if not is_last:
+            pending.append(
+                self._send_question_async(
+                    callback_query["chat_id"],
+                    next_position,
+                    user_id=user_id,
+                    session=answer.session,
+                )
+            )
+            await asyncio.gather(*pending)
+        else:
+            # The score depends on the answers just saved.
+            correct_count, *_ = await asyncio.gather(*pending)
+            correct_count = await self._send_quiz_results_async(
+                callback_query["chat_id"], user_id, correct_count, total_questions
+            )
+            await self.admin_notifier.notify_async(
+                self._describe_completion(callback_query, correct_count, total_questions),
+                digest_only=True,
+            )
+
+    async def _handle_text_message_async(self, message: Dict[str, Any]) -> None:
+        """Handle regular text messages."""
+        if not isinstance(message.get("chat_id"), int):
+            return
+
+        await self.async_telegram_service.send_message(
+            chat_id=message["chat_id"], text=START_PROMPT_TEXT
+        )
+
+    async def _send_question_async(
+        self,
+        chat_id: int,
+        position: int,
+        user_id: Optional[int] = None,
+        session: Optional[SessionCallbackData] = None,
+    ) -> None:
+        """Send the question at position in the user's attempt, or in the bank."""
+        question = self._get_question(position, user_id, session)
+        if question is None:
+            return
+
+        await self.async_telegram_service.send_message(
+            chat_id=chat_id,
+            text=question.text,
+            reply_markup=self._get_reply_markup(question, position, user_id, session),
+        )
+
+    async def _send_quiz_results_async(
+        self,
+        chat_id: int,
+        user_id: int,
+        correct_count: Optional[int] = None,
+        total_questions: Optional[int] = None,
+    ) -> int:
+        """Send quiz results; the group link is fetched while the score is sent."""
+        import asyncio
+
+        if correct_count is None:
+            correct_count = await asyncio.to_thread(
+                self._get_correct_answer_count, user_id
+            )
+        if total_questions is None:
+            total_questions = len(self.quiz_bank)
+        logger.info(
+            "quiz_completed",
+            user_id=user_id,
+            correct_count=correct_count,
+            total_questions=total_questions,
+        )
+
+        score_sent = self.async_telegram_service.send_message(
+            chat_id=chat_id,
+            text=f"You have answered {correct_count} questions correctly",
+        )
+
+        if correct_count == total_questions:
+            _, group_link = await asyncio.gather(
+                score_sent, asyncio.to_thread(self._get_group_link)
+            )
+            await self.async_telegram_service.send_message(
+                chat_id=chat_id,
+                text=f"Congratulations, you have answered all questions correctly\nJoin the group with this link {group_link}",
+            )
+        else:
+            await score_sent
+            await self.async_telegram_service.send_message(
+                chat_id=chat_id, text="Sorry, please try again. Click here /start"
+            )
+        return correct_count
+
+    def _send_question(
+        self,
+        chat_id: int,
+        position: int,
+        user_id: Optional[int] = None,
+        session: Optional[SessionCallbackData] = None,
+    ) -> None:
+        """Send the question at position in the user's attempt, or in the bank."""
+        question = self._get_question(position, user_id, session)
+        if question is None:
+            return
 
         self.telegram_service.send_message(
-            chat_id=chat_id, text=question["question"], reply_markup=reply_markup
+            chat_id=chat_id,
+            text=question.text,
+            reply_markup=self._get_reply_markup(question, position, user_id, session),
+        )
+
+    def _get_question(
+        self, position: int, user_id: Optional[int], session: Optional[SessionCallbackData]
+    ) -> Optional[Question]:
+        """The question at position in the user's attempt, or in the bank."""
+        if session is None or user_id is None:
+            return self.quiz_bank.get(position)
+        return self.sampler.question(attempt_seed(user_id, session.attempt_id), position)
+
+    def _get_total_questions(self, session: Optional[SessionCallbackData]) -> int:
+        """Number of questions in the attempt, or in the bank."""
+        return self.sampler.length if session else len(self.quiz_bank)
+
+    def _get_reply_markup(
+        self,
+        question: Question,
+        position: int,
+        user_id: Optional[int],
+        session: Optional[SessionCallbackData],
+    ) -> str:
+        """Shared keyboard, or one bound to this user's attempt.
+
+        Attempt keyboards cost one HMAC per send; their layout is cached.
+        """
+        if session is None or user_id is None:
+            return question.reply_markup_json
+        return build_session_reply_markup_json(
+            question.choices,
+            session._replace(position=position),
+            user_id,
+            self.callback_secret,
+            order=self.sampler.choice_order(attempt_seed(user_id, session.attempt_id), question),
         )
 
-    def _send_quiz_results(self, chat_id: int, user_id: int) -> None:
-        """Send quiz results to the user."""
-        correct_count = self._get_correct_answer_count(user_id)
-        total_questions = len(self.quiz_data)
+    def _send_quiz_results(
+        self,
+        chat_id: int,
+        user_id: int,
+        correct_count: Optional[int] = None,
+        total_questions: Optional[int] = None,
+    ) -> int:
+        """Send quiz results to the user and return the score."""
+        if correct_count is None:
+            correct_count = self._get_correct_answer_count(user_id)
+        if total_questions is None:
+            total_questions = len(self.quiz_bank)
+        logger.info(
+            "quiz_completed",
+            user_id=user_id,
+            correct_count=correct_count,
+            total_questions=total_questions,
+        )
 
         self.telegram_service.send_message(
             chat_id=chat_id,
@@ -146,82 +483,161 @@ class QuizService:
             self.telegram_service.send_message(
                 chat_id=chat_id, text="Sorry, please try again. Click here /start"
             )
+        return correct_count
+
+    @staticmethod
+    def _describe_user(update: Dict[str, Any]) -> str:
+        """How admins see a user: full name and username."""
+        full_name = get_full_name(update.get("first_name") or "", update.get("last_name"))
+        username = update.get("username")
+        return f"{full_name} - {username}" if username else full_name
+
+    def _describe_completion(
+        self, callback_query: Dict[str, Any], correct_count: int, total_questions: int
+    ) -> str:
+        return (
+            f"{self._describe_user(callback_query)} finished the quiz with "
+            f"{correct_count}/{total_questions} correct"
+        )
+
+    def _load_quiz_data(self) -> QuizBank:
+        """Load the compiled quiz bank built from the quiz_dict module."""
+        return get_quiz_bank()
 
-    def _load_quiz_data(self) -> List[Dict[str, Any]]:
-        """Load quiz data from quiz_dict module."""
-        from services.quiz_dict import quiz_dict
+    def _load_deduplicator(self) -> Optional[UpdateDeduplicator]:
+        """Drops redelivered updates unless QUIZ_IDEMPOTENCY is false."""
+        if not get_config().idempotency_enabled:
+            return None
+        return UpdateDeduplicator.from_config(self.storage)
 
-        return quiz_dict
+    def _load_sampler(self) -> QuestionSampler:
+        """Question sampler for attempts (QUIZ_SAMPLE_SIZE, QUIZ_SAMPLE_STRATA).
+
+        Sampling needs per-user keyboards, so without a signing key every
+        quiz asks the whole bank in order.
+        """
+        sampler = QuestionSampler.from_config(self.quiz_bank)
+        if sampler.sampled and self.callback_secret is None:
+            logger.warning("sampling_unavailable", signed=False)
+        return sampler
 
     def _add_or_get_user(
         self, user_id: int, first_name: str, username: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Add user to database or get existing user."""
-        try:
-            user_db = self.table.get_item(Key={"UserID": user_id})["Item"]
-            return user_db
-        except KeyError:
-            self.table.put_item(
-                Item={
-                    "UserID": user_id,
-                    "first_name": first_name,
-                    "username": username,
-                    "question": {},
-                }
-            )
-            return self.table.get_item(Key={"UserID": user_id})["Item"]
+        """Get existing user, or add them."""
+        return self.storage.add_or_get_user(user_id, first_name, username)
 
     def _save_quiz_result(
         self, user_id: int, question_index: int, is_correct: bool
-    ) -> None:
-        """Save quiz result to database."""
-        result = "correct" if is_correct else "wrong"
-        try:
-            self.table.update_item(
-                Key={"UserID": user_id},
-                UpdateExpression="SET question.#question = :res",
-                ExpressionAttributeNames={"#question": f"Q{question_index}"},
-                ExpressionAttributeValues={":res": result},
-            )
-        except KeyError:
-            pass  # User not found
+    ) -> int:
+        """Save quiz result and return the user's updated correct answer count."""
+        return self.storage.save_answer(user_id, question_index, is_correct)
+
+    def _save_answer(self, user_id: int, answer: Answer, is_last: bool) -> Optional[int]:
+        """Save an answer where its keyboard says, returning the score so far.
+
+        Write-behind attempts are only written after their last answer; until
+        then this returns None.
+        """
+        session = answer.session
+        if session is None:
+            return self._save_quiz_result(user_id, answer.question_index, answer.is_correct)
+
+        expires_at = round(datetime.now().timestamp()) + get_config().attempt_ttl
+        if not session.write_behind:
+            return self.storage.save_attempt_answer(
+                user_id, session.attempt_id, answer.question_index, answer.is_correct, expires_at
+            )
+        if not is_last:
+            return None
+        seed = attempt_seed(user_id, session.attempt_id)
+        answers = {
+            self.sampler.question(seed, position).index: bool(session.correct_mask >> position & 1)
+            for position in range(self.sampler.length)
+        }
+        return self.storage.save_attempt(user_id, session.attempt_id, answers, expires_at)
+
+    def _new_attempt(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Arguments for the first question of a new attempt.
+
+        The attempt ID is the /start message's Unix time, so a redelivered
+        /start resumes the same attempt and the ID doubles as started_at.
+        Without a signing key there are no attempts and answers go to the
+        user item.
+        """
+        if self.callback_secret is None:
+            return {}
+        attempt_id = message.get("date") or round(datetime.now().timestamp())
+        session = SessionCallbackData(
+            attempt_id=attempt_id,
+            position=0,
+            choice_index=0,
+            quiz_version=self.sampler.version,
+            write_behind=self.write_behind,
+        )
+        return {"user_id": message["user_id"], "session": session}
+
+    def _use_write_behind(self) -> bool:
+        """Whether new quizzes carry their answers in callback_data (QUIZ_WRITE_BEHIND).
+
+        Needs a signing key, since the running score is client-held, and
+        attempts that fit the bitmask.
+        """
+        if not get_config().write_behind:
+            return False
+        if self.callback_secret is None or self.sampler.length > SESSION_MASK_BITS:
+            logger.warning(
+                "write_behind_unavailable",
+                signed=self.callback_secret is not None,
+                questions=self.sampler.length,
+            )
+            return False
+        return True
 
     def _get_correct_answer_count(self, user_id: int) -> int:
         """Get count of correct answers for a user."""
-        try:
-            user_db = self.table.get_item(Key={"UserID": user_id})["Item"]
-            counter = 0
-            questions = user_db["question"]
-            for result in questions.values():
-                if result == "correct":
-                    counter += 1
-            return counter
-        except KeyError:
-            return 0
+        return self.storage.get_correct_count(user_id)
 
     def _get_group_link(self) -> str:
-        """Get or generate group invite link."""
-        try:
-            link_db = self.table.get_item(Key={"UserID": -9999})["Item"]
-
-            # Check if link is still valid (5 minutes)
-            if link_db["expiry"] + 300 > round(datetime.now().timestamp()):
-                return link_db["group_link"]
-            else:
+        """Get or generate group invite link.
+
+        Checked in order: this container's cache, storage, then Telegram.
+        When the link has expired, a lease in storage lets a single worker
+        regenerate it while the others keep serving the old one.
+        """
+        now = round(datetime.now().timestamp())
+        ttl = _get_group_link_ttl()
+
+        # One regeneration per container even when batch threads race here.
+        with _group_link_lock:
+            cached = _group_link_cache.get("group_link")
+            if cached and _group_link_cache["expires_at"] > now:
+                return cached
+
+            stored = self.storage.get_group_link()
+            if stored and stored.created_at + ttl > now:
+                _cache_group_link(stored.url, stored.created_at + ttl)
+                return stored.url
+
+            lease_until = now + get_config().group_link_lease_seconds
+            if self.storage.acquire_group_link_lease(now, lease_until):
                 new_link = self.telegram_service.get_new_group_link()
-                self._save_group_link(new_link)
+                self.storage.save_group_link(new_link, round(datetime.now().timestamp()))
+                _cache_group_link(new_link, now + ttl)
                 return new_link
-        except:
-            new_link = self.telegram_service.get_new_group_link()
-            self._save_group_link(new_link)
-            return new_link
-
-    def _save_group_link(self, group_link: str) -> None:
-        """Save group link to database."""
-        self.table.put_item(
-            Item={
-                "UserID": -9999,
-                "expiry": round(datetime.now().timestamp()),
-                "group_link": group_link,
-            }
-        )
+
+            # Another worker is regenerating; the old link is still usable.
+            if stored:
+                return stored.url
+
+            return self.telegram_service.get_new_group_link()
+
+
+def _get_group_link_ttl() -> int:
+    """Seconds a generated group link stays in use (GROUP_LINK_TTL_SECONDS)."""
+    return get_config().group_link_ttl
+
+
+def _cache_group_link(group_link: str, expires_at: int) -> None:
+    _group_link_cache["group_link"] = group_link
+    _group_link_cache["expires_at"] = expires_at
@@ -0,0 +1,938 @@
+"""Persistence for quiz users, attempts, scores, the group invite link,
+claims on processed Telegram updates and buffered admin events.
+
+QuizService only talks to a QuizStorage. DynamoDB is used in production; the
+in-memory and SQLite backends run without network for local development and
+load tests. QUIZ_STORAGE selects the backend.
+"""
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from config import Config, get_config
+from errors import EnvironmentException, UpdateInProgressException
+from metrics import instrument_boto3_client
+
+if TYPE_CHECKING:
+    import sqlite3
+
+# Sentinel item holding the cached group invite link.
+GROUP_LINK_USER_ID = -9999
+# Sentinel item buffering admin events for the next digest.
+ADMIN_EVENTS_USER_ID = -9998
+
+
+class GroupLink(NamedTuple):
+    url: str
+    # When the link was generated, in epoch seconds.
+    created_at: int
+
+
+class Attempt(NamedTuple):
+    """One pass through the quiz, started by /start."""
+
+    attempt_id: int
+    started_at: int
+    answers: Dict[int, bool]
+    score: int
+    # Epoch seconds after which the attempt may be deleted.
+    expires_at: int
+
+
+class QuizStorage(ABC):
+    """Operations QuizService needs from a storage backend.
+
+    Implementations must be safe to call from the worker's batch threads.
+    """
+
+    @abstractmethod
+    def add_or_get_user(
+        self, user_id: int, first_name: str, username: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Return the user, creating them first if they are new."""
+
+    @abstractmethod
+    def save_answer(self, user_id: int, question_index: int, is_correct: bool) -> int:
+        """Record an answer and return the user's updated correct answer count."""
+
+    @abstractmethod
+    def save_attempt_answer(
+        self,
+        user_id: int,
+        attempt_id: int,
+        question_index: int,
+        is_correct: bool,
+        expires_at: int,
+    ) -> int:
+        """Record an answer within an attempt and return the attempt's score."""
+
+    @abstractmethod
+    def save_attempt(
+        self, user_id: int, attempt_id: int, answers: Dict[int, bool], expires_at: int
+    ) -> int:
+        """Write a whole attempt at once and return its score."""
+
+    @abstractmethod
+    def get_attempt(self, user_id: int, attempt_id: int) -> Optional[Attempt]:
+        """Return an attempt that has not expired."""
+
+    @abstractmethod
+    def get_correct_count(self, user_id: int) -> int:
+        """Return the user's correct answer count, 0 for unknown users."""
+
+    @abstractmethod
+    def get_group_link(self) -> Optional[GroupLink]:
+        """Return the stored group invite link, if any."""
+
+    @abstractmethod
+    def acquire_group_link_lease(self, now: int, lease_until: int) -> bool:
+        """Claim the right to regenerate the group link until ``lease_until``."""
+
+    @abstractmethod
+    def save_group_link(self, url: str, created_at: int) -> None:
+        """Store a new group invite link and release the lease."""
+
+    @abstractmethod
+    def claim_update(self, update_id: int, now: int, lease_until: int, expires_at: int) -> bool:
+        """Claim an update until lease_until; False if it is already done.
+
+        Raises UpdateInProgressException while another worker holds the claim,
+        so the update is retried rather than dropped.
+        """
+
+    @abstractmethod
+    def complete_update(self, update_id: int, expires_at: int) -> None:
+        """Mark a claimed update as processed until expires_at."""
+
+    @abstractmethod
+    def release_update(self, update_id: int) -> None:
+        """Drop a claim so a retry can process the update."""
+
+    @abstractmethod
+    def add_admin_event(self, text: str, created_at: int) -> Tuple[int, int]:
+        """Buffer an admin event; return how many are pending and when the oldest was added."""
+
+    @abstractmethod
+    def take_admin_events(self) -> List[str]:
+        """Remove and return the pending admin events, oldest first."""
+
+
+class ClientTable:
+    """The Table actions this bot uses, made through the thread-safe client.
+
+    boto3 resources, Table included, must not be shared between threads, but
+    clients may be. A DynamoDB resource's client still takes and returns plain
+    Python values.
+    """
+
+    def __init__(self, client: Any, name: str) -> None:
+        self.client = client
+        self.name = name
+
+    def get_item(self, **kwargs: Any) -> Dict[str, Any]:
+        return self.client.get_item(TableName=self.name, **kwargs)
+
+    def put_item(self, **kwargs: Any) -> Dict[str, Any]:
+        return self.client.put_item(TableName=self.name, **kwargs)
+
+    def update_item(self, **kwargs: Any) -> Dict[str, Any]:
+        return self.client.update_item(TableName=self.name, **kwargs)
+
+    def delete_item(self, **kwargs: Any) -> Dict[str, Any]:
+        return self.client.delete_item(TableName=self.name, **kwargs)
+
+
+class DynamoDBStorage(QuizStorage):
+    """One item per user keyed by UserID, plus one item per attempt.
+
+    Attempt items are keyed by UserID and AttemptID, hold one Q<index>
+    attribute per answer, and expire through DynamoDB TTL on expires_at.
+    Update claims are keyed by UpdateID and expire the same way.
+    """
+
+    def __init__(self, table: Any, attempts_table: Any = None, updates_table: Any = None) -> None:
+        self.table = table
+        self.attempts_table = attempts_table
+        self.updates_table = updates_table
+
+    @classmethod
+    def from_config(cls, config: Config) -> "DynamoDBStorage":
+        import boto3
+
+        dynamodb = boto3.resource("dynamodb", region_name=config.dynamodb_region)
+        client = dynamodb.meta.client
+        instrument_boto3_client(client, "dynamodb")
+        # Shared by the worker's batch threads, so calls go through the client.
+        return cls(
+            ClientTable(client, config.dynamodb_table),
+            ClientTable(client, config.dynamodb_attempts_table),
+            ClientTable(client, config.dynamodb_updates_table),
+        )
+
+    def add_or_get_user(
+        self, user_id: int, first_name: str, username: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get existing user, or add them with a single atomic upsert."""
+        user_db = self.table.get_item(Key={"UserID": user_id}).get("Item")
+        if user_db:
+            return user_db
+
+        # if_not_exists keeps whatever a concurrent /start already wrote.
+        response = self.table.update_item(
+            Key={"UserID": user_id},
+            UpdateExpression=(
+                "SET #first_name = if_not_exists(#first_name, :first_name), "
+                "#username = if_not_exists(#username, :username), "
+                "#question = if_not_exists(#question, :question), "
+                "#correct_count = if_not_exists(#correct_count, :zero)"
+            ),
+            ExpressionAttributeNames={
+                "#first_name": "first_name",
+                "#username": "username",
+                "#question": "question",
+                "#correct_count": "correct_count",
+            },
+            ExpressionAttributeValues={
+                ":first_name": first_name,
+                ":username": username,
+                ":question": {},
+                ":zero": 0,
+            },
+            ReturnValues="ALL_NEW",
+        )
+        return response["Attributes"]
+
+    def save_answer(self, user_id: int, question_index: int, is_correct: bool) -> int:
+        """Save the answer with conditional writes.
+
+        correct_count only moves when a question flips between correct and
+        wrong, so re-answering a question keeps the count exact.
+        """
+        result = "correct" if is_correct else "wrong"
+        # (condition, correct_count delta) tried in order until one applies.
+        if is_correct:
+            attempts = [
+                ("attribute_not_exists(#question.#q) OR #question.#q <> :correct", 1)
+            ]
+        else:
+            attempts = [
+                ("attribute_not_exists(#question.#q) OR #question.#q <> :correct", 0),
+                ("#question.#q = :correct", -1),
+            ]
+        attempts.append((None, 0))
+
+        for condition, delta in attempts:
+            update_expression = "SET #question.#q = :res"
+            names = {"#question": "question", "#q": f"Q{question_index}"}
+            values: Dict[str, Any] = {":res": result}
+            kwargs: Dict[str, Any] = {}
+            if delta:
+                update_expression += " ADD #correct_count :delta"
+                names["#correct_count"] = "correct_count"
+                values[":delta"] = delta
+                # Users created before the counter existed are backfilled below.
+                condition = f"({condition}) AND attribute_exists(#correct_count)"
+            if condition:
+                values[":correct"] = "correct"
+                kwargs["ConditionExpression"] = condition
+            try:
+                response = self.table.update_item(
+                    Key={"UserID": user_id},
+                    UpdateExpression=update_expression,
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values,
+                    ReturnValues="ALL_NEW",
+                    **kwargs,
+                )
+                break
+            except ClientError as e:
+                if not _is_conditional_check_failed(e):
+                    raise
+
+        user_db = response["Attributes"]
+        if "correct_count" in user_db:
+            return int(user_db["correct_count"])
+
+        correct_count = _count_correct_answers(user_db)
+        self.table.update_item(
+            Key={"UserID": user_id},
+            UpdateExpression="SET #correct_count = if_not_exists(#correct_count, :count)",
+            ExpressionAttributeNames={"#correct_count": "correct_count"},
+            ExpressionAttributeValues={":count": correct_count},
+        )
+        return correct_count
+
+    def save_attempt_answer(
+        self,
+        user_id: int,
+        attempt_id: int,
+        question_index: int,
+        is_correct: bool,
+        expires_at: int,
+    ) -> int:
+        """Save the answer with conditional writes; the first one creates the item.
+
+        As with save_answer, the score only moves when a question flips
+        between correct and wrong. ADD treats a missing score as 0.
+        """
+        # (condition, score delta) tried in order until one applies.
+        if is_correct:
+            attempts = [("attribute_not_exists(#q) OR #q <> :correct", 1)]
+        else:
+            attempts = [
+                ("attribute_not_exists(#q) OR #q <> :correct", 0),
+                ("#q = :correct", -1),
+            ]
+        attempts.append((None, 0))
+
+        for condition, delta in attempts:
+            kwargs: Dict[str, Any] = {}
+            values: Dict[str, Any] = {
+                ":res": "correct" if is_correct else "wrong",
+                ":delta": delta,
+                ":started_at": attempt_id,
+                ":expires_at": expires_at,
+            }
+            if condition:
+                values[":correct"] = "correct"
+                kwargs["ConditionExpression"] = condition
+            try:
+                response = self.attempts_table.update_item(
+                    Key={"UserID": user_id, "AttemptID": attempt_id},
+                    UpdateExpression=(
+                        "SET #q = :res, "
+                        "#started_at = if_not_exists(#started_at, :started_at), "
+                        "#expires_at = :expires_at "
+                        "ADD #score :delta"
+                    ),
+                    ExpressionAttributeNames={
+                        "#q": f"Q{question_index}",
+                        "#started_at": "started_at",
+                        "#expires_at": "expires_at",
+                        "#score": "score",
+                    },
+                    ExpressionAttributeValues=values,
+                    ReturnValues="UPDATED_NEW",
+                    **kwargs,
+                )
+                return int(response["Attributes"]["score"])
+            except ClientError as e:
+                if not _is_conditional_check_failed(e):
+                    raise
+        raise AssertionError("unconditional update cannot fail its condition")
+
+    def save_attempt(
+        self, user_id: int, attempt_id: int, answers: Dict[int, bool], expires_at: int
+    ) -> int:
+        """Write the attempt in one put; replaying it leaves the same item."""
+        score = sum(answers.values())
+        self.attempts_table.put_item(
+            Item={
+                "UserID": user_id,
+                "AttemptID": attempt_id,
+                "started_at": attempt_id,
+                "expires_at": expires_at,
+                "score": score,
+                **_to_question_map(answers),
+            }
+        )
+        return score
+
+    def get_attempt(self, user_id: int, attempt_id: int) -> Optional[Attempt]:
+        item = self.attempts_table.get_item(
+            Key={"UserID": user_id, "AttemptID": attempt_id}
+        ).get("Item")
+        # TTL deletion lags expiry, so expired items are filtered here too.
+        if not item or int(item["expires_at"]) <= time.time():
+            return None
+        return Attempt(
+            attempt_id=attempt_id,
+            started_at=int(item["started_at"]),
+            answers=_from_question_map(item),
+            score=int(item.get("score", 0)),
+            expires_at=int(item["expires_at"]),
+        )
+
+    def get_correct_count(self, user_id: int) -> int:
+        user_db = self.table.get_item(Key={"UserID": user_id}).get("Item")
+        if not user_db:
+            return 0
+        if "correct_count" in user_db:
+            return int(user_db["correct_count"])
+        return _count_correct_answers(user_db)
+
+    def get_group_link(self) -> Optional[GroupLink]:
+        try:
+            link_db = self.table.get_item(Key={"UserID": GROUP_LINK_USER_ID}).get("Item")
+        except ClientError:
+            return None
+        if not link_db or not link_db.get("group_link"):
+            return None
+        return GroupLink(link_db["group_link"], int(link_db["expiry"]))
+
+    def acquire_group_link_lease(self, now: int, lease_until: int) -> bool:
+        try:
+            self.table.update_item(
+                Key={"UserID": GROUP_LINK_USER_ID},
+                UpdateExpression="SET #lease_until = :lease_until",
+                ConditionExpression="attribute_not_exists(#lease_until) OR #lease_until < :now",
+                ExpressionAttributeNames={"#lease_until": "lease_until"},
+                ExpressionAttributeValues={":lease_until": lease_until, ":now": now},
+            )
+            return True
+        except ClientError as e:
+            if _is_conditional_check_failed(e):
+                return False
+            # Without DynamoDB there is nobody to coordinate with.
+            return True
+
+    def save_group_link(self, url: str, created_at: int) -> None:
+        """Replacing the item also drops the lease."""
+        self.table.put_item(
+            Item={"UserID": GROUP_LINK_USER_ID, "expiry": created_at, "group_link": url}
+        )
+
+    def claim_update(self, update_id: int, now: int, lease_until: int, expires_at: int) -> bool:
+        """Conditional put; expired claims and leases of crashed workers are taken over."""
+        try:
+            self.updates_table.put_item(
+                Item={
+                    "UpdateID": update_id,
+                    "status": "pending",
+                    "lease_until": lease_until,
+                    "expires_at": expires_at,
+                },
+                ConditionExpression=(
+                    "attribute_not_exists(UpdateID) OR #expires_at < :now "
+                    "OR (#status = :pending AND #lease_until < :now)"
+                ),
+                ExpressionAttributeNames={
+                    "#status": "status",
+                    "#lease_until": "lease_until",
+                    "#expires_at": "expires_at",
+                },
+                ExpressionAttributeValues={":now": now, ":pending": "pending"},
+            )
+            return True
+        except ClientError as e:
+            if not _is_conditional_check_failed(e):
+                # As with the group link lease, an unreachable table must not stop the bot.
+                return True
+        claim = self.updates_table.get_item(
+            Key={"UpdateID": update_id}, ConsistentRead=True
+        ).get("Item")
+        if claim is not None and claim.get("status") == "done":
+            return False
+        raise UpdateInProgressException(f"Update {update_id} is claimed by another worker")
+
+    def complete_update(self, update_id: int, expires_at: int) -> None:
+        self.updates_table.update_item(
+            Key={"UpdateID": update_id},
+            UpdateExpression="SET #status = :done, #expires_at = :expires_at REMOVE #lease_until",
+            ExpressionAttributeNames={
+                "#status": "status",
+                "#expires_at": "expires_at",
+                "#lease_until": "lease_until",
+            },
+            ExpressionAttributeValues={":done": "done", ":expires_at": expires_at},
+        )
+
+    def release_update(self, update_id: int) -> None:
+        self.updates_table.delete_item(Key={"UpdateID": update_id})
+
+    def add_admin_event(self, text: str, created_at: int) -> Tuple[int, int]:
+        response = self.table.update_item(
+            Key={"UserID": ADMIN_EVENTS_USER_ID},
+            UpdateExpression=(
+                "SET #events = list_append(if_not_exists(#events, :empty), :event), "
+                "#since = if_not_exists(#since, :created_at) ADD #count :one"
+            ),
+            ExpressionAttributeNames={
+                "#events": "events",
+                "#since": "since",
+                "#count": "event_count",
+            },
+            ExpressionAttributeValues={
+                ":empty": [],
+                ":event": [text],
+                ":created_at": created_at,
+                ":one": 1,
+            },
+            ReturnValues="UPDATED_NEW",
+        )
+        attributes = response["Attributes"]
+        return int(attributes["event_count"]), int(attributes["since"])
+
+    def take_admin_events(self) -> List[str]:
+        """One update empties the buffer and returns what it held."""
+        response = self.table.update_item(
+            Key={"UserID": ADMIN_EVENTS_USER_ID},
+            UpdateExpression="REMOVE #events, #since, #count",
+            ExpressionAttributeNames={
+                "#events": "events",
+                "#since": "since",
+                "#count": "event_count",
+            },
+            ReturnValues="ALL_OLD",
+        )
+        return list(response.get("Attributes", {}).get("events", []))
+
+
+class InMemoryStorage(QuizStorage):
+    """Process-local storage; state lasts as long as the instance."""
+
+    def __init__(self) -> None:
+        self.users: Dict[int, Dict[str, Any]] = {}
+        self.attempts: Dict[Tuple[int, int], Attempt] = {}
+        self.group_link: Optional[GroupLink] = None
+        self.lease_until = 0
+        # update_id -> (done, lease_until, expires_at)
+        self.updates: Dict[int, Tuple[bool, int, int]] = {}
+        # (text, created_at) of buffered admin events
+        self.admin_events: List[Tuple[str, int]] = []
+        self._lock = threading.Lock()
+
+    def add_or_get_user(
+        self, user_id: int, first_name: str, username: Optional[str] = None
+    ) -> Dict[str, Any]:
+        with self._lock:
+            user = self.users.setdefault(
+                user_id,
+                {
+                    "UserID": user_id,
+                    "first_name": first_name,
+                    "username": username,
+                    "question": {},
+                    "correct_count": 0,
+                },
+            )
+            return _copy_user(user)
+
+    def save_answer(self, user_id: int, question_index: int, is_correct: bool) -> int:
+        with self._lock:
+            user = self.users.setdefault(
+                user_id, {"UserID": user_id, "question": {}, "correct_count": 0}
+            )
+            key = f"Q{question_index}"
+            was_correct = user["question"].get(key) == "correct"
+            user["question"][key] = "correct" if is_correct else "wrong"
+            user["correct_count"] += int(is_correct) - int(was_correct)
+            return user["correct_count"]
+
+    def save_attempt_answer(
+        self,
+        user_id: int,
+        attempt_id: int,
+        question_index: int,
+        is_correct: bool,
+        expires_at: int,
+    ) -> int:
+        with self._lock:
+            attempt = self.attempts.get((user_id, attempt_id))
+            answers = dict(attempt.answers) if attempt else {}
+            answers[question_index] = is_correct
+            return self._put_attempt(user_id, attempt_id, answers, expires_at)
+
+    def save_attempt(
+        self, user_id: int, attempt_id: int, answers: Dict[int, bool], expires_at: int
+    ) -> int:
+        with self._lock:
+            return self._put_attempt(user_id, attempt_id, dict(answers), expires_at)
+
+    def get_attempt(self, user_id: int, attempt_id: int) -> Optional[Attempt]:
+        attempt = self.attempts.get((user_id, attempt_id))
+        if attempt is None or attempt.expires_at <= time.time():
+            return None
+        return attempt
+
+    def _put_attempt(
+        self, user_id: int, attempt_id: int, answers: Dict[int, bool], expires_at: int
+    ) -> int:
+        now = time.time()
+        # Expired attempts are dropped as new ones are written.
+        for key in [k for k, a in self.attempts.items() if a.expires_at <= now]:
+            del self.attempts[key]
+        score = sum(answers.values())
+        self.attempts[(user_id, attempt_id)] = Attempt(
+            attempt_id, attempt_id, answers, score, expires_at
+        )
+        return score
+
+    def get_correct_count(self, user_id: int) -> int:
+        with self._lock:
+            user = self.users.get(user_id)
+            return user["correct_count"] if user else 0
+
+    def get_group_link(self) -> Optional[GroupLink]:
+        return self.group_link
+
+    def acquire_group_link_lease(self, now: int, lease_until: int) -> bool:
+        with self._lock:
+            if self.lease_until >= now:
+                return False
+            self.lease_until = lease_until
+            return True
+
+    def save_group_link(self, url: str, created_at: int) -> None:
+        with self._lock:
+            self.group_link = GroupLink(url, created_at)
+            self.lease_until = 0
+
+    def claim_update(self, update_id: int, now: int, lease_until: int, expires_at: int) -> bool:
+        with self._lock:
+            claim = self.updates.get(update_id)
+            if claim is not None:
+                done, current_lease, current_expiry = claim
+                if current_expiry >= now and done:
+                    return False
+                if current_expiry >= now and current_lease >= now:
+                    raise UpdateInProgressException(
+                        f"Update {update_id} is claimed by another worker"
+                    )
+            # Expired claims are dropped as new ones are written.
+            for key in [k for k, c in self.updates.items() if c[2] < now]:
+                del self.updates[key]
+            self.updates[update_id] = (False, lease_until, expires_at)
+            return True
+
+    def complete_update(self, update_id: int, expires_at: int) -> None:
+        with self._lock:
+            self.updates[update_id] = (True, 0, expires_at)
+
+    def release_update(self, update_id: int) -> None:
+        with self._lock:
+            self.updates.pop(update_id, None)
+
+    def add_admin_event(self, text: str, created_at: int) -> Tuple[int, int]:
+        with self._lock:
+            self.admin_events.append((text, created_at))
+            return len(self.admin_events), self.admin_events[0][1]
+
+    def take_admin_events(self) -> List[str]:
+        with self._lock:
+            events, self.admin_events = self.admin_events, []
+        return [text for text, _ in events]
+
+
+class SQLiteStorage(QuizStorage):
+    """Storage in a local SQLite file, shared by every thread of the process."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            first_name TEXT,
+            username TEXT,
+            correct_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS answers (
+            user_id INTEGER NOT NULL,
+            question_index INTEGER NOT NULL,
+            result TEXT NOT NULL,
+            PRIMARY KEY (user_id, question_index)
+        );
+        CREATE TABLE IF NOT EXISTS attempts (
+            user_id INTEGER NOT NULL,
+            attempt_id INTEGER NOT NULL,
+            started_at INTEGER NOT NULL,
+            expires_at INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            answers TEXT NOT NULL,
+            PRIMARY KEY (user_id, attempt_id)
+        );
+        CREATE INDEX IF NOT EXISTS attempts_expires_at ON attempts (expires_at);
+        CREATE TABLE IF NOT EXISTS updates (
+            update_id INTEGER PRIMARY KEY,
+            done INTEGER NOT NULL DEFAULT 0,
+            lease_until INTEGER NOT NULL,
+            expires_at INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS updates_expires_at ON updates (expires_at);
+        CREATE TABLE IF NOT EXISTS group_link (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            url TEXT,
+            created_at INTEGER,
+            lease_until INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS admin_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        # Imported here so the DynamoDB workers do not load sqlite3.
+        import sqlite3
+
+        self.path = path
+        self._lock = threading.Lock()
+        # One connection guarded by a lock; SQLite serialises writers anyway.
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def add_or_get_user(
+        self, user_id: int, first_name: str, username: Optional[str] = None
+    ) -> Dict[str, Any]:
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR IGNORE INTO users (user_id, first_name, username) VALUES (?, ?, ?)",
+                (user_id, first_name, username),
+            )
+            return self._load_user(db, user_id)
+
+    def save_answer(self, user_id: int, question_index: int, is_correct: bool) -> int:
+        result = "correct" if is_correct else "wrong"
+        with self._transaction() as db:
+            db.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+            previous = db.execute(
+                "SELECT result FROM answers WHERE user_id = ? AND question_index = ?",
+                (user_id, question_index),
+            ).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO answers (user_id, question_index, result) VALUES (?, ?, ?)",
+                (user_id, question_index, result),
+            )
+            delta = int(is_correct) - int(previous is not None and previous["result"] == "correct")
+            if delta:
+                db.execute(
+                    "UPDATE users SET correct_count = correct_count + ? WHERE user_id = ?",
+                    (delta, user_id),
+                )
+            return db.execute(
+                "SELECT correct_count FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()["correct_count"]
+
+    def save_attempt_answer(
+        self,
+        user_id: int,
+        attempt_id: int,
+        question_index: int,
+        is_correct: bool,
+        expires_at: int,
+    ) -> int:
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT answers FROM attempts WHERE user_id = ? AND attempt_id = ?",
+                (user_id, attempt_id),
+            ).fetchone()
+            answers = _from_question_map(json.loads(row["answers"])) if row else {}
+            answers[question_index] = is_correct
+            return self._put_attempt(db, user_id, attempt_id, answers, expires_at)
+
+    def save_attempt(
+        self, user_id: int, attempt_id: int, answers: Dict[int, bool], expires_at: int
+    ) -> int:
+        with self._transaction() as db:
+            return self._put_attempt(db, user_id, attempt_id, answers, expires_at)
+
+    def get_attempt(self, user_id: int, attempt_id: int) -> Optional[Attempt]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM attempts WHERE user_id = ? AND attempt_id = ? AND expires_at > ?",
+                (user_id, attempt_id, int(time.time())),
+            ).fetchone()
+        if row is None:
+            return None
+        return Attempt(
+            attempt_id=attempt_id,
+            started_at=row["started_at"],
+            answers=_from_question_map(json.loads(row["answers"])),
+            score=row["score"],
+            expires_at=row["expires_at"],
+        )
+
+    @staticmethod
+    def _put_attempt(
+        db: "sqlite3.Connection",
+        user_id: int,
+        attempt_id: int,
+        answers: Dict[int, bool],
+        expires_at: int,
+    ) -> int:
+        # Expired attempts are dropped as new ones are written.
+        db.execute("DELETE FROM attempts WHERE expires_at <= ?", (int(time.time()),))
+        score = sum(answers.values())
+        db.execute(
+            "INSERT OR REPLACE INTO attempts "
+            "(user_id, attempt_id, started_at, expires_at, score, answers) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                user_id,
+                attempt_id,
+                attempt_id,
+                expires_at,
+                score,
+                json.dumps(_to_question_map(answers), separators=(",", ":")),
+            ),
+        )
+        return score
+
+    def get_correct_count(self, user_id: int) -> int:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT correct_count FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row["correct_count"] if row else 0
+
+    def get_group_link(self) -> Optional[GroupLink]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT url, created_at FROM group_link WHERE id = 1 AND url IS NOT NULL"
+            ).fetchone()
+        return GroupLink(row["url"], row["created_at"]) if row else None
+
+    def acquire_group_link_lease(self, now: int, lease_until: int) -> bool:
+        with self._transaction() as db:
+            db.execute("INSERT OR IGNORE INTO group_link (id) VALUES (1)")
+            cursor = db.execute(
+                "UPDATE group_link SET lease_until = ? WHERE id = 1 AND lease_until < ?",
+                (lease_until, now),
+            )
+            return cursor.rowcount == 1
+
+    def save_group_link(self, url: str, created_at: int) -> None:
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO group_link (id, url, created_at, lease_until) "
+                "VALUES (1, ?, ?, 0)",
+                (url, created_at),
+            )
+
+    def claim_update(self, update_id: int, now: int, lease_until: int, expires_at: int) -> bool:
+        with self._transaction() as db:
+            # Expired claims are dropped as new ones are written.
+            db.execute("DELETE FROM updates WHERE expires_at < ?", (now,))
+            db.execute(
+                "DELETE FROM updates WHERE update_id = ? AND done = 0 AND lease_until < ?",
+                (update_id, now),
+            )
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO updates (update_id, lease_until, expires_at) "
+                "VALUES (?, ?, ?)",
+                (update_id, lease_until, expires_at),
+            )
+            if cursor.rowcount == 1:
+                return True
+            (done,) = db.execute(
+                "SELECT done FROM updates WHERE update_id = ?", (update_id,)
+            ).fetchone()
+        if done:
+            return False
+        raise UpdateInProgressException(f"Update {update_id} is claimed by another worker")
+
+    def complete_update(self, update_id: int, expires_at: int) -> None:
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE updates SET done = 1, lease_until = 0, expires_at = ? WHERE update_id = ?",
+                (expires_at, update_id),
+            )
+
+    def release_update(self, update_id: int) -> None:
+        with self._transaction() as db:
+            db.execute("DELETE FROM updates WHERE update_id = ?", (update_id,))
+
+    def add_admin_event(self, text: str, created_at: int) -> Tuple[int, int]:
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO admin_events (text, created_at) VALUES (?, ?)", (text, created_at)
+            )
+            row = db.execute("SELECT COUNT(*), MIN(created_at) FROM admin_events").fetchone()
+        return row[0], row[1]
+
+    def take_admin_events(self) -> List[str]:
+        with self._transaction() as db:
+            rows = db.execute("SELECT text FROM admin_events ORDER BY id").fetchall()
+            db.execute("DELETE FROM admin_events")
+        return [row["text"] for row in rows]
+
+    def _transaction(self) -> "_SQLiteTransaction":
+        return _SQLiteTransaction(self._connection, self._lock)
+
+    @staticmethod
+    def _load_user(db: "sqlite3.Connection", user_id: int) -> Dict[str, Any]:
+        user = db.execute(
+            "SELECT first_name, username, correct_count FROM users WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()
+        answers = db.execute(
+            "SELECT question_index, result FROM answers WHERE user_id = ?", (user_id,)
+        ).fetchall()
+        return {
+            "UserID": user_id,
+            "first_name": user["first_name"],
+            "username": user["username"],
+            "question": {f"Q{row['question_index']}": row["result"] for row in answers},
+            "correct_count": user["correct_count"],
+        }
+
+
+class _SQLiteTransaction:
+    """Hold the connection lock for one IMMEDIATE transaction."""
+
+    def __init__(self, connection: "sqlite3.Connection", lock: threading.Lock) -> None:
+        self._connection = connection
+        self._lock = lock
+
+    def __enter__(self) -> "sqlite3.Connection":
+        self._lock.acquire()
+        try:
+            self._connection.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self._lock.release()
+            raise
+        return self._connection
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        try:
+            self._connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._lock.release()
+
+
+def create_storage(config: Optional[Config] = None) -> QuizStorage:
+    """Build the backend named by QUIZ_STORAGE: dynamodb, memory or sqlite."""
+    config = config or get_config()
+    backend = config.storage_backend
+    if backend == "dynamodb":
+        return DynamoDBStorage.from_config(config)
+    if backend == "memory":
+        return InMemoryStorage()
+    if backend == "sqlite":
+        return SQLiteStorage(config.sqlite_path)
+    raise EnvironmentException(f"Unknown QUIZ_STORAGE backend: {backend}")
+
+
+def _is_conditional_check_failed(error: ClientError) -> bool:
+    return error.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+
+def _count_correct_answers(user_db: Dict[str, Any]) -> int:
+    """Count correct answers stored in a user's question map."""
+    return sum(1 for result in user_db.get("question", {}).values() if result == "correct")
+
+
+def _to_question_map(answers: Dict[int, bool]) -> Dict[str, str]:
+    return {f"Q{index}": "correct" if is_correct else "wrong" for index, is_correct in answers.items()}
+
+
+def _from_question_map(item: Dict[str, Any]) -> Dict[int, bool]:
+    """Read Q<index> answers back from an attempt item."""
+    return {
+        int(name[1:]): result == "correct"
+        for name, result in item.items()
+        if name[:1] == "Q" and name[1:].isdigit()
+    }
+
+
+def _copy_user(user: Dict[str, Any]) -> Dict[str, Any]:
+    return {**user, "question": dict(user.get("question", {}))}
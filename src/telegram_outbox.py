@@ -0,0 +1,140 @@
+"""Outbound Telegram messages queued for a separate sender worker.
+
+TELEGRAM_OUTBOX selects how the quiz worker talks to Telegram:
+
+- ``inline`` (default): messages are sent while the update is handled.
+- ``sqs``: the messages an update produces are put on TELEGRAM_OUTBOX_URL as
+  one SQS message, after the update was handled without error. The
+  telegram_sender worker sends them in order, paced by the rate limiter.
+
+Each queued message is a JSON object ``{"intents": [...]}`` whose intents are
+``{"method": <Bot API method>, "payload": <JSON payload>}``.
+"""
+import json
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from config import Config, get_config
+from errors import EnvironmentException
+from telegram_service import TelegramService
+
+# Methods whose result QuizService never reads, so they can be sent later.
+QUEUED_METHODS = frozenset({"sendMessage", "editMessageText"})
+
+# Intents of the batch open in the current thread or task.
+_pending: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar(
+    "telegram_outbox_pending", default=None
+)
+
+
+class Outbox(ABC):
+    """Where queued intents wait for the sender worker."""
+
+    @abstractmethod
+    def put(self, intents: List[Dict[str, Any]]) -> None:
+        """Queue intents to be sent together, in order."""
+
+
+class InMemoryOutbox(Outbox):
+    """Keeps queued messages in a list, for tests and local runs."""
+
+    def __init__(self) -> None:
+        self.messages: List[List[Dict[str, Any]]] = []
+
+    def put(self, intents: List[Dict[str, Any]]) -> None:
+        self.messages.append(list(intents))
+
+
+class SQSOutbox(Outbox):
+    """One SQS message per batch of intents."""
+
+    def __init__(self, queue_url: str, client: Any) -> None:
+        self.queue_url = queue_url
+        self.client = client
+
+    @classmethod
+    def from_config(cls, config: Config) -> "SQSOutbox":
+        import boto3
+        from metrics import instrument_boto3_client
+
+        if not config.telegram_outbox_url:
+            raise EnvironmentException("TELEGRAM_OUTBOX_URL environment variable is not set")
+        client = boto3.client("sqs")
+        instrument_boto3_client(client, "sqs")
+        return cls(config.telegram_outbox_url, client)
+
+    def put(self, intents: List[Dict[str, Any]]) -> None:
+        self.client.send_message(
+            QueueUrl=self.queue_url,
+            MessageBody=json.dumps({"intents": intents}, separators=(",", ":")),
+        )
+
+
+class QueuedTelegramService(TelegramService):
+    """TelegramService that puts messages on the outbox instead of sending them.
+
+    Inside batch(), intents are collected and put on the outbox as one message
+    when the block exits cleanly; if it raises they are dropped, so a retried
+    update does not leave half of its messages behind. Outside a batch each
+    intent is queued on its own. Other methods, such as exporting the group
+    invite link, still call Telegram directly.
+    """
+
+    def __init__(self, outbox: Outbox, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.outbox = outbox
+
+    def call(self, method: str, payload: Dict[str, Any]) -> Any:
+        if method not in QUEUED_METHODS:
+            return super().call(method, payload)
+        intent = {"method": method, "payload": payload}
+        pending = _pending.get()
+        if pending is None:
+            self.outbox.put([intent])
+        else:
+            pending.append(intent)
+        return None
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        if _pending.get() is not None:
+            # Nested batches join the outer one.
+            yield
+            return
+        intents: List[Dict[str, Any]] = []
+        token = _pending.set(intents)
+        try:
+            yield
+        finally:
+            _pending.reset(token)
+        if intents:
+            self.outbox.put(intents)
+
+
+def decode_intents(body: str) -> List[Dict[str, Any]]:
+    """Read the intents of a queued message."""
+    data = json.loads(body)
+    intents = data.get("intents") if isinstance(data, dict) else None
+    if not isinstance(intents, list):
+        raise ValueError("Outbox message has no intents")
+    return intents
+
+
+def create_outbox(config: Optional[Config] = None) -> Optional[Outbox]:
+    """Build the outbox named by TELEGRAM_OUTBOX; None sends inline."""
+    config = config or get_config()
+    backend = config.telegram_outbox
+    if backend == "inline":
+        return None
+    if backend == "sqs":
+        return SQSOutbox.from_config(config)
+    raise EnvironmentException(f"Unknown TELEGRAM_OUTBOX: {backend}")
+
+
+def create_telegram_service(config: Optional[Config] = None) -> TelegramService:
+    """TelegramService for the quiz worker, queued when an outbox is configured."""
+    outbox = create_outbox(config)
+    if outbox is None:
+        return TelegramService()
+    return QueuedTelegramService(outbox)
@@ -1,14 +1,52 @@
-import os
+import time
+from contextlib import nullcontext
 import requests
-from typing import List, Optional, Dict, Any, Union
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import ContextManager, List, Optional, Dict, Any, Union
+from config import get_config
+from logger import get_logger
+from metrics import timed
+from rate_limiter import RateLimiter, create_rate_limiter
+
+logger = get_logger(__name__)
+
+# Telegram answers these with a JSON error body that is safe to retry.
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
 
 
 class TelegramService:
-    def __init__(self):
-        self.token = os.getenv("TOKEN")
-        self.admin_ids = [id.strip() for id in os.getenv("TELEGRAM_ADMIN", "").split(",")]
+    def __init__(
+        self,
+        pool_size: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff_factor: Optional[float] = None,
+        max_retry_delay: Optional[float] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        config = get_config()
+        self.token = config.token
+        self.api_url = config.telegram_api_url
+        self.group_id = config.group_id
+        self.admin_ids = list(config.admin_ids)
+        self.pool_size = pool_size or config.telegram_pool_size
+        self.timeout = (
+            connect_timeout or config.telegram_connect_timeout,
+            read_timeout or config.telegram_read_timeout,
+        )
+        self.max_retries = (
+            max_retries if max_retries is not None else config.telegram_max_retries
+        )
+        self.backoff_factor = (
+            backoff_factor if backoff_factor is not None else config.telegram_backoff_factor
+        )
+        self.max_retry_delay = max_retry_delay or config.telegram_max_retry_delay
+        self.rate_limiter = rate_limiter or create_rate_limiter(config)
+        self.session = self._build_session()
     
-    def send_message(self, chat_id: int, text: str, reply_markup: Optional[Dict] = None) -> requests.Response:
+    def send_message(self, chat_id: int, text: str, reply_markup: Optional[Union[Dict, str]] = None) -> requests.Response:
         """Send a message to Telegram chat."""
         payload = {
             "chat_id": chat_id,
@@ -17,12 +55,9 @@ class TelegramService:
         if reply_markup:
             payload["reply_markup"] = reply_markup
         
-        self._log("send_message", payload=payload)
-        response = requests.post(self._get_url("sendMessage"), json=payload)
-        self._log("send_message", response_json=response.json())
-        return response
+        return self.call("sendMessage", payload)
     
-    def edit_message(self, chat_id: int, message_id: int, text: str, reply_markup: Optional[Dict] = None) -> requests.Response:
+    def edit_message(self, chat_id: int, message_id: int, text: str, reply_markup: Optional[Union[Dict, str]] = None) -> requests.Response:
         """Edit an existing message."""
         payload = {
             "chat_id": chat_id,
@@ -32,30 +67,177 @@ class TelegramService:
         if reply_markup:
             payload["reply_markup"] = reply_markup
         
-        self._log("edit_message", payload=payload)
-        response = requests.post(self._get_url("editMessageText"), json=payload)
-        self._log("edit_message", response_json=response.json())
+        return self.call("editMessageText", payload)
+
+    def call(self, method: str, payload: Dict[str, Any]) -> requests.Response:
+        """Call a Bot API method with a JSON payload."""
+        self._log(method, payload=payload)
+        response = self._post(method, json=payload)
+        self._log(method, response_json=response.json)
         return response
+
+    def batch(self) -> ContextManager[None]:
+        """Group the messages sent inside the block.
+
+        Sent as they are made here; QueuedTelegramService queues them together.
+        """
+        return nullcontext()
     
     def notify_admins(self, text: str) -> None:
         """Send notification to all admin users."""
         for admin_id in self.admin_ids:
             if admin_id:  # Skip empty admin IDs
-                self.send_message(chat_id=int(admin_id), text=text)
+                self.send_message(chat_id=admin_id, text=text)
     
     def get_new_group_link(self) -> str:
         """Generate new group invite link."""
-        response = requests.post(
-            self._get_url("exportChatInviteLink"),
-            data={"chat_id": os.getenv("TELEGRAM_GROUP_ID")}
+        response = self._post(
+            "exportChatInviteLink",
+            data={"chat_id": self.group_id}
         )
         return response.json()["result"]
     
+    def close(self) -> None:
+        """Close pooled connections."""
+        self.session.close()
+    
+    def _build_session(self) -> requests.Session:
+        """Build a keep-alive session with a connection pool for api.telegram.org."""
+        session = requests.Session()
+        # Only connection failures are retried here: the request never reached
+        # Telegram, so resending cannot duplicate a message. Status-based
+        # retries are handled in _post where retry_after can be honoured.
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=0,
+            status=0,
+            backoff_factor=self.backoff_factor,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry
+        )
+        session.mount("https://", adapter)
+        # Plain HTTP is only used against local stand-ins of the Bot API.
+        session.mount("http://", adapter)
+        return session
+    
+    def _post(self, method: str, **kwargs) -> requests.Response:
+        """POST to a Telegram API method, retrying on 429/5xx with backoff.
+
+        The request first waits for its slot in the rate limiter, so bursts
+        are spread out rather than refused.
+        """
+        chat_id = (kwargs.get("json") or kwargs.get("data") or {}).get("chat_id")
+        self._wait_for_slot(method, chat_id)
+
+        attempt = 0
+        while True:
+            with timed(f"telegram.{method}"):
+                response = self.session.post(
+                    self._get_url(method), timeout=self.timeout, **kwargs
+                )
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                return response
+
+            delay = self._get_retry_delay(response, attempt)
+            if delay > self.max_retry_delay:
+                # Waiting longer would only push the worker into its timeout.
+                return response
+
+            logger.warning(
+                "telegram_retry", method=method, status=response.status_code, delay=delay
+            )
+            if response.status_code == 429:
+                self.rate_limiter.backoff(chat_id, delay)
+            time.sleep(delay)
+            attempt += 1
+    
+    def _wait_for_slot(self, method: str, chat_id: Any) -> None:
+        """Sleep until the rate limiter has room for a request to chat_id."""
+        delay = self.rate_limiter.reserve(chat_id if isinstance(chat_id, int) else None)
+        # Sending late beats running into the worker timeout.
+        delay = min(delay, self.max_retry_delay)
+        if delay > 0:
+            logger.debug("telegram_throttled", method=method, chat_id=chat_id, delay=delay)
+            with timed("telegram.throttled"):
+                time.sleep(delay)
+
+    def _get_retry_delay(self, response: requests.Response, attempt: int) -> float:
+        """Get seconds to wait before retrying, preferring Telegram's retry_after."""
+        try:
+            retry_after = response.json().get("parameters", {}).get("retry_after")
+        except ValueError:
+            retry_after = None
+        if retry_after is None:
+            retry_after = response.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except (TypeError, ValueError):
+                pass
+        return self.backoff_factor * (2 ** attempt)
+    
     def _get_url(self, method: str) -> str:
         """Get Telegram API URL for a method."""
-        return f"https://api.telegram.org/bot{self.token}/{method}"
+        return f"{self.api_url}/bot{self.token}/{method}"
     
     def _log(self, annotation: str, **kwargs) -> None:
-        """Log API calls and responses."""
-        for k, v in kwargs.items():
-            print(f"{annotation}: {k} ==> {v}")
\ No newline at end of file
+        """Log API calls and responses at DEBUG; callables are evaluated lazily."""
+        logger.debug(annotation, **kwargs)
+
+
+
+class AsyncTelegramService:
+    """asyncio variant of TelegramService with the same method surface.
+
+    Calls run in worker threads on top of the pooled synchronous client, so
+    several Telegram requests can be in flight at once without an extra HTTP
+    dependency. asyncio is imported inside the coroutines, so the synchronous
+    worker never loads it.
+    """
+
+    def __init__(self, telegram_service: Optional[TelegramService] = None):
+        self.telegram_service = telegram_service or TelegramService()
+
+    @property
+    def admin_ids(self) -> List[int]:
+        return self.telegram_service.admin_ids
+
+    async def send_message(self, chat_id: int, text: str, reply_markup: Optional[Union[Dict, str]] = None) -> requests.Response:
+        """Send a message to Telegram chat."""
+        import asyncio
+
+        return await asyncio.to_thread(
+            self.telegram_service.send_message, chat_id=chat_id, text=text, reply_markup=reply_markup
+        )
+
+    async def edit_message(self, chat_id: int, message_id: int, text: str, reply_markup: Optional[Union[Dict, str]] = None) -> requests.Response:
+        """Edit an existing message."""
+        import asyncio
+
+        return await asyncio.to_thread(
+            self.telegram_service.edit_message,
+            chat_id=chat_id,
+            message_id=message_id,
+            text=text,
+            reply_markup=reply_markup,
+        )
+
+    async def notify_admins(self, text: str) -> None:
+        """Send notification to all admin users concurrently."""
+        import asyncio
+
+        await asyncio.gather(
+            *(
+                self.send_message(chat_id=admin_id, text=text)
+                for admin_id in self.admin_ids
+                if admin_id  # Skip empty admin IDs
+            )
+        )
+
+    async def get_new_group_link(self) -> str:
+        """Generate new group invite link."""
+        import asyncio
+
+        return await asyncio.to_thread(self.telegram_service.get_new_group_link)
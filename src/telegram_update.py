@@ -0,0 +1,157 @@
+"""Lightweight read-only views over raw Telegram update dictionaries.
+
+Fields are read from the decoded JSON on access, so routing an update never
+copies it into a new dictionary.
+"""
+from typing import Any, Dict, Optional
+
+_EMPTY: Dict[str, Any] = {}
+
+# Update types the bot handles. Any other update (member changes, polls,
+# edited messages, ...) can be dropped from the raw JSON without decoding it.
+_HANDLED_KEYS = ('"message"', '"callback_query"')
+
+
+def may_need_handling(body: str) -> bool:
+    """
+    Cheap pre-filter on a raw update body.
+
+    False means the update certainly carries neither a message nor a callback
+    query and can be ignored without json.loads. True means it has to be
+    decoded and classified.
+    """
+    return any(key in body for key in _HANDLED_KEYS)
+
+
+def _chat_type(chat: Dict[str, Any], chat_id: Any) -> Optional[str]:
+    chat_type = chat.get("type")
+    if chat_type is None and isinstance(chat_id, int):
+        # Telegram chat IDs are typically >0 for private chats and <0 for groups/channels.
+        chat_type = "private" if chat_id > 0 else "group"
+    return chat_type
+
+
+class _UpdateView:
+    """Mapping-style access to a subset of fields, computed lazily."""
+
+    __slots__ = ("_raw",)
+    _fields: tuple = ()
+
+    def __init__(self, raw: Dict[str, Any]) -> None:
+        self._raw = raw
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self._fields:
+            return default
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in self._fields}
+
+    @property
+    def _from(self) -> Dict[str, Any]:
+        return self._raw.get("from") or _EMPTY
+
+    @property
+    def user_id(self) -> Optional[int]:
+        return self._from.get("id")
+
+    @property
+    def first_name(self) -> Optional[str]:
+        return self._from.get("first_name")
+
+    @property
+    def last_name(self) -> Optional[str]:
+        return self._from.get("last_name")
+
+    @property
+    def username(self) -> Optional[str]:
+        return self._from.get("username")
+
+
+class MessageView(_UpdateView):
+    """A Telegram message, exposing the fields parse_telegram_update returns."""
+
+    __slots__ = ()
+    _fields = (
+        "text",
+        "chat_id",
+        "chat_type",
+        "user_id",
+        "first_name",
+        "last_name",
+        "username",
+        "date",
+    )
+
+    @property
+    def text(self) -> str:
+        return self._raw.get("text", "")
+
+    @property
+    def date(self) -> Optional[int]:
+        return self._raw.get("date")
+
+    @property
+    def chat_id(self) -> Optional[int]:
+        return (self._raw.get("chat") or _EMPTY).get("id")
+
+    @property
+    def chat_type(self) -> Optional[str]:
+        return _chat_type(self._raw.get("chat") or _EMPTY, self.chat_id)
+
+
+class CallbackQueryView(_UpdateView):
+    """A Telegram callback query, exposing the fields parse_telegram_update returns."""
+
+    __slots__ = ()
+    _fields = (
+        "data",
+        "chat_id",
+        "chat_type",
+        "user_id",
+        "first_name",
+        "last_name",
+        "username",
+        "message_id",
+        "message_text",
+        "chat_instance",
+        "is_bot",
+    )
+
+    @property
+    def _message(self) -> Dict[str, Any]:
+        return self._raw.get("message") or _EMPTY
+
+    @property
+    def data(self) -> str:
+        return self._raw.get("data", "")
+
+    @property
+    def chat_id(self) -> Optional[int]:
+        return (self._message.get("chat") or _EMPTY).get("id") or self.user_id
+
+    @property
+    def chat_type(self) -> Optional[str]:
+        return _chat_type(self._message.get("chat") or _EMPTY, self.chat_id)
+
+    @property
+    def message_id(self) -> Optional[int]:
+        return self._message.get("message_id")
+
+    @property
+    def message_text(self) -> Optional[str]:
+        return self._message.get("text")
+
+    @property
+    def chat_instance(self) -> Optional[str]:
+        return self._raw.get("chat_instance")
+
+    @property
+    def is_bot(self) -> Optional[bool]:
+        return self._from.get("is_bot")
@@ -1,82 +1,108 @@
-import os
-from typing import Dict, Any, Optional, Tuple, Set
+import base64
+import binascii
+import functools
+import hashlib
+import hmac
+import json
+import struct
+from typing import Dict, Any, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+from config import get_config
+from telegram_update import CallbackQueryView, MessageView
+from metrics import timed_function
+
+# Reply to any text that is not a quiz command.
+START_PROMPT_TEXT = "Send /start to begin the quiz."
+
+# Compact callback_data layout: format version, question index, choice index,
+# quiz bank version, followed by an optional truncated HMAC-SHA256.
+CALLBACK_DATA_VERSION = 1
+_CALLBACK_STRUCT = struct.Struct(">BHBH")
+_CALLBACK_MAC_SIZE = 6
+
+# Quiz attempt callback_data: format version, flags, attempt ID, position of
+# the question within the attempt, choice index, quiz version and, for
+# write-behind attempts, a bitmask of the positions answered correctly so far. It is always signed, and
+# the signature also covers the Telegram user ID so a keyboard only works for
+# its recipient. Version 3 signs a keyboard once: the signature leaves out the
+# choice index, since swapping it only presses another button of the same
+# keyboard. Version 2 keyboards, signed per button, are still accepted.
+CALLBACK_SESSION_VERSION = 3
+_SESSION_V2 = 2
+SESSION_MASK_BITS = 64
+_SESSION_WRITE_BEHIND = 0x01
+_SESSION_STRUCT = struct.Struct(">BBIHBHQ")
+# Byte offset of the choice index in _SESSION_STRUCT.
+_SESSION_CHOICE_OFFSET = 8
+_SESSION_MAC_SIZE = 8
+_USER_ID_STRUCT = struct.Struct(">q")
 
 
 def parse_telegram_update(data: Dict[str, Any]) -> Tuple[Optional[Dict], Optional[Dict]]:
     """Parse Telegram update into message and callback_query dictionaries."""
+    message, callback_query = get_update_views(data)
+    return (
+        message.to_dict() if message else None,
+        callback_query.to_dict() if callback_query else None,
+    )
+
+
+def get_update_views(
+    data: Dict[str, Any]
+) -> Tuple[Optional[MessageView], Optional[CallbackQueryView]]:
+    """Wrap an update's message or callback query without copying it."""
     message = data.get("message")
-    callback_query = data.get("callback_query")
-    
     if message:
-        chat = message.get("chat", {}) or {}
-        chat_id = chat.get("id")
-        chat_type = chat.get("type")
-        if chat_type is None and isinstance(chat_id, int):
-            # Telegram chat IDs are typically >0 for private chats and <0 for groups/channels.
-            chat_type = "private" if chat_id > 0 else "group"
-
-        from_user = message.get("from") or {}
-        # Extract message fields
-        parsed_message = {
-            "text": message.get("text", ""),
-            "chat_id": chat_id,
-            "chat_type": chat_type,
-            "user_id": from_user.get("id"),
-            "first_name": from_user.get("first_name"),
-            "last_name": from_user.get("last_name"),
-            "username": from_user.get("username"),
-        }
-        return parsed_message, None
-    
+        return MessageView(message), None
+
+    callback_query = data.get("callback_query")
     if callback_query:
-        cq_message = callback_query.get("message", {}) or {}
-        cq_chat = cq_message.get("chat", {}) or {}
-        cq_chat_id = cq_chat.get("id") or callback_query.get("from", {}).get("id")
-        cq_chat_type = cq_chat.get("type")
-        if cq_chat_type is None and isinstance(cq_chat_id, int):
-            cq_chat_type = "private" if cq_chat_id > 0 else "group"
-
-        # Extract callback query fields
-        parsed_callback = {
-            "data": callback_query["data"],
-            "chat_id": cq_chat_id,
-            "chat_type": cq_chat_type,
-            "user_id": callback_query["from"]["id"],
-            "first_name": callback_query["from"]["first_name"],
-            "last_name": callback_query["from"].get("last_name"),
-            "username": callback_query["from"].get("username"),
-            "message_id": cq_message.get("message_id"),
-            "message_text": cq_message.get("text"),
-            "chat_instance": callback_query.get("chat_instance"),
-            "is_bot": callback_query["from"].get("is_bot")
-        }
-        return None, parsed_callback
-    
+        return None, CallbackQueryView(callback_query)
+
     return None, None
 
 
-def get_allowed_chat_ids() -> Set[int]:
+@timed_function("classify_update")
+def classify_update(data: Dict[str, Any]) -> Tuple[str, Optional[Any]]:
     """
-    Parse TELEGRAM_ALLOWED_CHAT_IDS env var into a set of chat IDs.
+    Classify an update as "start", "callback", "text" or "ignore".
+
+    Returns the kind together with a MessageView or CallbackQueryView.
+    Updates from disallowed chats and unsupported update types are "ignore".
+    """
+    if not isinstance(data, dict):
+        return "ignore", None
+
+    message, callback_query = get_update_views(data)
+    update = message or callback_query
+    if update is None or not is_allowed_chat(update.chat_id, update.chat_type):
+        return "ignore", None
+
+    if callback_query:
+        return "callback", callback_query
+    if message.text == "/start":
+        return "start", message
+    return "text", message
+
+
+def get_update_owner_id(data: Dict[str, Any]) -> Optional[int]:
+    """Get the user (or chat) ID whose updates must be processed in order."""
+    message, callback_query = get_update_views(data)
+    update = message or callback_query
+    if not update:
+        return None
+    owner_id = update.user_id or update.chat_id
+    return owner_id if isinstance(owner_id, int) else None
+
 
-    Format: comma-separated integers (supports negative IDs).
-    Example: "-1001234567890,123456"
+def get_allowed_chat_ids() -> FrozenSet[int]:
     """
-    raw = os.getenv("TELEGRAM_ALLOWED_CHAT_IDS", "").strip()
-    if not raw:
-        return set()
+    Allowed chat IDs from the container's Config.
 
-    allowed: Set[int] = set()
-    for part in raw.split(","):
-        part = part.strip()
-        if not part:
-            continue
-        try:
-            allowed.add(int(part))
-        except ValueError:
-            # Ignore invalid entries rather than crashing the bot.
-            continue
-    return allowed
+    Sources: TELEGRAM_ALLOWED_CHAT_IDS (comma-separated integers, supports
+    negative IDs, e.g. "-1001234567890,123456"), TELEGRAM_ALLOWED_CHAT_IDS_FILE
+    and TELEGRAM_ALLOWED_CHAT_IDS_PARAMETER. See config.py.
+    """
+    return get_config().allowed_chat_ids
 
 
 def is_allowed_chat(chat_id: Optional[int], chat_type: Optional[str]) -> bool:
@@ -102,18 +128,183 @@ def parse_callback_data(callback_data: str) -> Tuple[int, str]:
         return -1, ""
 
 
+class CallbackData(NamedTuple):
+    question_index: int
+    choice_index: int
+    quiz_version: int
+
+
+def get_callback_secret() -> Optional[bytes]:
+    """
+    Key for signing callback_data.
+
+    Uses CALLBACK_SECRET when set, otherwise derives a key from the bot TOKEN.
+    Returns None (unsigned callbacks) when neither is set.
+    """
+    config = get_config()
+    secret = config.callback_secret or config.token
+    if not secret:
+        return None
+    return hmac.new(secret.encode("utf-8"), b"callback_data", hashlib.sha256).digest()
+
+
+def encode_callback_data(
+    question_index: int,
+    choice_index: int,
+    quiz_version: int,
+    secret: Optional[bytes] = None,
+) -> str:
+    """Encode a button press as compact base64url callback_data (8 or 16 chars)."""
+    packed = _CALLBACK_STRUCT.pack(
+        CALLBACK_DATA_VERSION, question_index, choice_index, quiz_version
+    )
+    if secret:
+        packed += hmac.new(secret, packed, hashlib.sha256).digest()[:_CALLBACK_MAC_SIZE]
+    return base64.urlsafe_b64encode(packed).decode("ascii")
+
+
+def decode_callback_data(
+    callback_data: str, secret: Optional[bytes] = None
+) -> Optional[CallbackData]:
+    """
+    Decode compact callback_data.
+
+    Returns None for anything that is not a well-formed payload of the current
+    format, including payloads whose signature does not match.
+    """
+    size = _CALLBACK_STRUCT.size + (_CALLBACK_MAC_SIZE if secret else 0)
+    # base64 of a multiple of 3 bytes has no padding, so the length is exact.
+    if len(callback_data) != size * 4 // 3:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(callback_data)
+    except (binascii.Error, ValueError):
+        return None
+
+    packed = raw[: _CALLBACK_STRUCT.size]
+    if secret:
+        expected = hmac.new(secret, packed, hashlib.sha256).digest()[:_CALLBACK_MAC_SIZE]
+        if not hmac.compare_digest(expected, raw[_CALLBACK_STRUCT.size :]):
+            return None
+
+    version, question_index, choice_index, quiz_version = _CALLBACK_STRUCT.unpack(packed)
+    if version != CALLBACK_DATA_VERSION:
+        return None
+    return CallbackData(question_index, choice_index, quiz_version)
+
+
+class SessionCallbackData(NamedTuple):
+    attempt_id: int
+    position: int
+    choice_index: int
+    quiz_version: int
+    correct_mask: int = 0
+    write_behind: bool = False
+
+
+def encode_session_callback_data(
+    payload: SessionCallbackData, user_id: int, secret: bytes
+) -> str:
+    """Encode a button press within a quiz attempt (36 chars)."""
+    return encode_session_choices(payload, [payload.choice_index], user_id, secret)[0]
+
+
+def encode_session_choices(
+    session: SessionCallbackData, choice_indexes: Sequence[int], user_id: int, secret: bytes
+) -> List[str]:
+    """Encode the buttons of one keyboard, computing its signature once."""
+    packed = bytearray(
+        _SESSION_STRUCT.pack(
+            CALLBACK_SESSION_VERSION,
+            _SESSION_WRITE_BEHIND if session.write_behind else 0,
+            session.attempt_id,
+            session.position,
+            0,
+            session.quiz_version,
+            session.correct_mask,
+        )
+    )
+    mac = _session_mac(bytes(packed), user_id, secret)
+    encoded = []
+    for choice_index in choice_indexes:
+        packed[_SESSION_CHOICE_OFFSET] = choice_index
+        encoded.append(base64.urlsafe_b64encode(bytes(packed) + mac).decode("ascii"))
+    return encoded
+
+
+def decode_session_callback_data(
+    callback_data: str, user_id: int, secret: Optional[bytes]
+) -> Optional[SessionCallbackData]:
+    """
+    Decode quiz attempt callback_data pressed by user_id.
+
+    Returns None unless the payload is well-formed and was signed for this user.
+    """
+    size = _SESSION_STRUCT.size + _SESSION_MAC_SIZE
+    if not secret or len(callback_data) != size * 4 // 3:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(callback_data)
+    except (binascii.Error, ValueError):
+        return None
+
+    packed = raw[: _SESSION_STRUCT.size]
+    signed = packed
+    if packed[0] == CALLBACK_SESSION_VERSION:
+        signed = packed[:_SESSION_CHOICE_OFFSET] + b"\x00" + packed[_SESSION_CHOICE_OFFSET + 1 :]
+    if not hmac.compare_digest(_session_mac(signed, user_id, secret), raw[_SESSION_STRUCT.size :]):
+        return None
+
+    (
+        version,
+        flags,
+        attempt_id,
+        position,
+        choice_index,
+        quiz_version,
+        correct_mask,
+    ) = _SESSION_STRUCT.unpack(packed)
+    if version not in (CALLBACK_SESSION_VERSION, _SESSION_V2):
+        return None
+    return SessionCallbackData(
+        attempt_id,
+        position,
+        choice_index,
+        quiz_version,
+        correct_mask,
+        bool(flags & _SESSION_WRITE_BEHIND),
+    )
+
+
+def _session_mac(packed: bytes, user_id: int, secret: bytes) -> bytes:
+    message = packed + _USER_ID_STRUCT.pack(user_id)
+    return hmac.new(secret, message, hashlib.sha256).digest()[:_SESSION_MAC_SIZE]
+
+
+def is_legacy_callback_data(callback_data: str) -> bool:
+    """Whether callback_data uses the old "<question_index>#<choice>" format."""
+    return "#" in callback_data
+
+
 def get_full_name(first_name: str, last_name: Optional[str] = None) -> str:
     """Get full name from first and last name."""
     return f"{first_name} {last_name}" if last_name else first_name
 
 
 def is_correct_answer(question: Dict[str, Any], answer: str) -> bool:
-    """Check if answer matches the correct answer for a question."""
+    """Check if answer matches the correct answer for a question.
+
+    Legacy helper for raw quiz_dict entries; QuizService uses Question.is_correct.
+    """
     return answer == question["answer"]
 
 
 def build_reply_markup(choices: list, question_index: int) -> Dict[str, Any]:
-    """Build reply markup for quiz question."""
+    """Build reply markup for quiz question in the old "<index>#<choice>" format.
+
+    Legacy helper; QuizService sends precompiled compact keyboards and only
+    still parses this format for keyboards already in chats.
+    """
     buttons = []
     for choice in choices:
         buttons.append({
@@ -124,6 +315,83 @@ def build_reply_markup(choices: list, question_index: int) -> Dict[str, Any]:
     return {"inline_keyboard": format_reply_markup(buttons)}
 
 
+def build_compact_reply_markup(
+    choices: list,
+    question_index: int,
+    quiz_version: int,
+    secret: Optional[bytes] = None,
+) -> Dict[str, Any]:
+    """Build reply markup whose callback_data carries choice indexes, not text."""
+    buttons = []
+    for choice_index, choice in enumerate(choices):
+        buttons.append({
+            "text": choice,
+            "callback_data": encode_callback_data(
+                question_index, choice_index, quiz_version, secret
+            ),
+        })
+
+    return {"inline_keyboard": format_reply_markup(buttons)}
+
+
+def build_session_reply_markup(
+    choices: list,
+    session: SessionCallbackData,
+    user_id: int,
+    secret: bytes,
+    order: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    """Build one user's reply markup for session.position in their attempt.
+
+    order lists choice indexes in display order; buttons keep their choice
+    index in callback_data whatever their place on the keyboard.
+    """
+    return json.loads(
+        build_session_reply_markup_json(tuple(choices), session, user_id, secret, order)
+    )
+
+
+def build_session_reply_markup_json(
+    choices: Tuple[str, ...],
+    session: SessionCallbackData,
+    user_id: int,
+    secret: bytes,
+    order: Optional[Sequence[int]] = None,
+) -> str:
+    """build_session_reply_markup, serialised for Telegram.
+
+    The layout of each keyboard is serialised once and cached; a send only
+    fills in the callback_data of its buttons.
+    """
+    order = tuple(order) if order is not None else tuple(range(len(choices)))
+    pieces = _session_keyboard_template(choices, order)
+    callback_data = encode_session_choices(session, order, user_id, secret)
+    parts = [pieces[0]]
+    for data, piece in zip(callback_data, pieces[1:]):
+        parts.append(f'"{data}"')
+        parts.append(piece)
+    return "".join(parts)
+
+
+# Stands in for callback_data in cached layouts; no real choice is this text.
+_CALLBACK_PLACEHOLDER = "\x00"
+
+
+@functools.lru_cache(maxsize=4096)
+def _session_keyboard_template(
+    choices: Tuple[str, ...], order: Tuple[int, ...]
+) -> Tuple[str, ...]:
+    """Serialised keyboard for choices in order, split where callback_data goes."""
+    buttons = [
+        {"text": choices[choice_index], "callback_data": _CALLBACK_PLACEHOLDER}
+        for choice_index in order
+    ]
+    markup = json.dumps(
+        {"inline_keyboard": format_reply_markup(buttons)}, separators=(",", ":")
+    )
+    return tuple(markup.split(json.dumps(_CALLBACK_PLACEHOLDER)))
+
+
 def format_reply_markup(reply_markup: list) -> list:
     """Format reply markup for better readability on Telegram."""
     result = []
@@ -0,0 +1,322 @@
+"""In-memory stand-in for a boto3 DynamoDB Table with injectable latency.
+
+Supports the subset of the Table API that QuizService uses: get_item,
+put_item, delete_item and update_item with SET/ADD/REMOVE update
+expressions, if_not_exists, list_append, condition expressions and
+ReturnValues.
+"""
+import copy
+import re
+import threading
+import time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+_TOKEN = re.compile(r"\s*(<>|<=|>=|[=<>(),.+\-]|[#:]?[A-Za-z_][A-Za-z0-9_]*)")
+_MISSING = object()
+
+
+def _tokenize(expression: str) -> List[str]:
+    tokens, position = [], 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if not match:
+            raise ValueError(f"Cannot parse expression at: {expression[position:]!r}")
+        tokens.append(match.group(1))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, expression: str, names: Dict[str, str], values: Dict[str, Any]) -> None:
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        self.names = names
+        self.values = values
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, expected: Optional[str] = None) -> str:
+        token = self.peek()
+        if token is None or (expected is not None and token.upper() != expected):
+            raise ValueError(f"Expected {expected!r}, got {token!r}")
+        self.position += 1
+        return token
+
+    def path(self) -> Tuple[str, ...]:
+        parts = [self._name(self.take())]
+        while self.peek() == ".":
+            self.take(".")
+            parts.append(self._name(self.take()))
+        return tuple(parts)
+
+    def _name(self, token: str) -> str:
+        return self.names[token] if token.startswith("#") else token
+
+    # Operands are returned as callables evaluated against an item.
+    def operand(self):
+        token = self.peek()
+        if token.startswith(":"):
+            self.take()
+            value = self.values[token]
+            return lambda item: value
+        if token == "if_not_exists":
+            self.take()
+            self.take("(")
+            path = self.path()
+            self.take(",")
+            default = self.operand()
+            self.take(")")
+
+            def if_not_exists(item):
+                current = _get(item, path)
+                return default(item) if current is _MISSING else current
+
+            return if_not_exists
+        if token == "list_append":
+            self.take()
+            self.take("(")
+            left = self.operand()
+            self.take(",")
+            right = self.operand()
+            self.take(")")
+            return lambda item: list(left(item)) + list(right(item))
+        path = self.path()
+        return lambda item: _get(item, path)
+
+    def value(self):
+        left = self.operand()
+        if self.peek() in ("+", "-"):
+            sign = 1 if self.take() == "+" else -1
+            right = self.operand()
+            return lambda item: left(item) + sign * right(item)
+        return left
+
+    def condition(self):
+        left = self._and()
+        while self.peek() and self.peek().upper() == "OR":
+            self.take()
+            right = self._and()
+            left = (lambda l, r: lambda item: l(item) or r(item))(left, right)
+        return left
+
+    def _and(self):
+        left = self._not()
+        while self.peek() and self.peek().upper() == "AND":
+            self.take()
+            right = self._not()
+            left = (lambda l, r: lambda item: l(item) and r(item))(left, right)
+        return left
+
+    def _not(self):
+        if self.peek() and self.peek().upper() == "NOT":
+            self.take()
+            inner = self._not()
+            return lambda item: not inner(item)
+        return self._primary()
+
+    def _primary(self):
+        token = self.peek()
+        if token == "(":
+            self.take()
+            inner = self.condition()
+            self.take(")")
+            return inner
+        if token in ("attribute_exists", "attribute_not_exists"):
+            self.take()
+            self.take("(")
+            path = self.path()
+            self.take(")")
+            exists = token == "attribute_exists"
+            return lambda item: (_get(item, path) is not _MISSING) == exists
+
+        left = self.operand()
+        comparator = self.take()
+        right = self.operand()
+        compare = {
+            "=": lambda a, b: a == b,
+            "<>": lambda a, b: a != b,
+            "<": lambda a, b: a < b,
+            "<=": lambda a, b: a <= b,
+            ">": lambda a, b: a > b,
+            ">=": lambda a, b: a >= b,
+        }[comparator]
+
+        def evaluate(item):
+            a, b = left(item), right(item)
+            if a is _MISSING or b is _MISSING:
+                # DynamoDB comparisons with a missing attribute are false, except <>.
+                return comparator == "<>"
+            return compare(a, b)
+
+        return evaluate
+
+
+def _get(item: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    current: Any = item
+    for part in path:
+        if not isinstance(current, dict) or part not in current:
+            return _MISSING
+        current = current[part]
+    return current
+
+
+def _set(item: Dict[str, Any], path: Tuple[str, ...], value: Any) -> None:
+    parent = item
+    for part in path[:-1]:
+        if not isinstance(parent.get(part), dict):
+            raise _validation_error("The document path provided in the update expression is invalid for update")
+        parent = parent[part]
+    parent[path[-1]] = value
+
+
+def _remove(item: Dict[str, Any], path: Tuple[str, ...]) -> None:
+    parent = _get(item, path[:-1]) if len(path) > 1 else item
+    if isinstance(parent, dict):
+        parent.pop(path[-1], None)
+
+
+def _to_dynamo(value: Any) -> Any:
+    """Mimic boto3's deserialisation: numbers come back as Decimal."""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamo(v) for v in value]
+    return value
+
+
+def _validation_error(message: str) -> ClientError:
+    return ClientError({"Error": {"Code": "ValidationException", "Message": message}}, "UpdateItem")
+
+
+def _conditional_check_failed(operation: str) -> ClientError:
+    return ClientError(
+        {"Error": {"Code": "ConditionalCheckFailedException", "Message": "The conditional request failed"}},
+        operation,
+    )
+
+
+class FakeTable:
+    """Thread-safe in-memory table keyed by a hash key and optional range key."""
+
+    def __init__(
+        self, key_name: str = "UserID", latency: float = 0.0, range_key_name: Optional[str] = None
+    ) -> None:
+        self.key_name = key_name
+        self.range_key_name = range_key_name
+        self.latency = latency
+        self.items: Dict[Any, Dict[str, Any]] = {}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _begin(self, operation: str) -> None:
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _key(self, key: Dict[str, Any]) -> Any:
+        if self.range_key_name:
+            return key[self.key_name], key[self.range_key_name]
+        return key[self.key_name]
+
+    def _check(self, operation: str, item: Dict[str, Any], kwargs: Dict[str, Any]) -> None:
+        condition = kwargs.get("ConditionExpression")
+        if condition is None:
+            return
+        parser = _Parser(
+            condition,
+            kwargs.get("ExpressionAttributeNames", {}),
+            kwargs.get("ExpressionAttributeValues", {}),
+        )
+        if not parser.condition()(item):
+            raise _conditional_check_failed(operation)
+
+    def get_item(self, Key: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        self._begin("get_item")
+        with self._lock:
+            item = self.items.get(self._key(Key))
+            return {"Item": copy.deepcopy(item)} if item is not None else {}
+
+    def put_item(self, Item: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        self._begin("put_item")
+        with self._lock:
+            key = self._key(Item)
+            self._check("PutItem", self.items.get(key, {}), kwargs)
+            self.items[key] = _to_dynamo(copy.deepcopy(Item))
+            return {}
+
+    def delete_item(self, Key: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        self._begin("delete_item")
+        with self._lock:
+            key = self._key(Key)
+            self._check("DeleteItem", self.items.get(key, {}), kwargs)
+            self.items.pop(key, None)
+            return {}
+
+    def update_item(self, Key: Dict[str, Any], UpdateExpression: str, **kwargs: Any) -> Dict[str, Any]:
+        self._begin("update_item")
+        with self._lock:
+            key = self._key(Key)
+            existing = self.items.get(key)
+            item = copy.deepcopy(existing) if existing is not None else dict(Key)
+            self._check("UpdateItem", existing or {}, kwargs)
+            updated = self._apply(item, UpdateExpression, kwargs)
+            self.items[key] = _to_dynamo(item)
+
+            return_values = kwargs.get("ReturnValues", "NONE")
+            if return_values == "ALL_NEW":
+                return {"Attributes": copy.deepcopy(self.items[key])}
+            if return_values == "ALL_OLD":
+                return {"Attributes": copy.deepcopy(existing)} if existing else {}
+            if return_values == "UPDATED_NEW":
+                new = self.items[key]
+                return {"Attributes": {name: copy.deepcopy(new[name]) for name in updated if name in new}}
+            return {}
+
+    def _apply(self, item: Dict[str, Any], expression: str, kwargs: Dict[str, Any]) -> List[str]:
+        """Apply an update expression; return the top-level attributes it touched."""
+        parser = _Parser(
+            expression,
+            kwargs.get("ExpressionAttributeNames", {}),
+            kwargs.get("ExpressionAttributeValues", {}),
+        )
+        # Evaluate every right-hand side against the item as it was before the update.
+        snapshot = copy.deepcopy(item)
+        actions = []
+        clause = None
+        while parser.peek() is not None:
+            token = parser.peek()
+            if token.upper() in ("SET", "ADD", "REMOVE"):
+                clause = parser.take().upper()
+                continue
+            if token == ",":
+                parser.take()
+                continue
+            path = parser.path()
+            if clause == "SET":
+                parser.take("=")
+                actions.append(("SET", path, parser.value()(snapshot)))
+            elif clause == "ADD":
+                actions.append(("ADD", path, parser.operand()(snapshot)))
+            elif clause == "REMOVE":
+                actions.append(("REMOVE", path, None))
+            else:
+                raise ValueError(f"Unsupported update expression: {expression!r}")
+
+        for action, path, value in actions:
+            if action == "SET":
+                _set(item, path, value)
+            elif action == "ADD":
+                current = _get(item, path)
+                _set(item, path, value if current is _MISSING else current + value)
+            else:
+                _remove(item, path)
+        return [path[0] for _, path, _ in actions]
@@ -0,0 +1,80 @@
+"""Local HTTP server that answers Telegram Bot API calls with canned results."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+GROUP_INVITE_LINK = "https://t.me/+benchmark"
+
+
+class FakeTelegramServer:
+    """Bot API stand-in bound to an ephemeral localhost port.
+
+    Every request sleeps for ``latency`` seconds before answering so the
+    benchmark can model a realistic round trip to api.telegram.org.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeTelegramServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeTelegramServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _record(self, method: str) -> None:
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                method = self.path.rsplit("/", 1)[-1]
+                server._record(method)
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if method == "exportChatInviteLink":
+                    result = GROUP_INVITE_LINK
+                else:
+                    result = {"message_id": 1, "date": int(time.time())}
+                payload = json.dumps({"ok": True, "result": result}).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        return Handler
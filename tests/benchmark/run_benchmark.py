@@ -0,0 +1,430 @@
+"""Offline end-to-end benchmark for the update pipeline.
+
+Synthetic quiz sessions built from the unit test fixtures are replayed
+through api_handler, an in-memory queue and quiz_worker. Telegram is served
+by a local HTTP server and DynamoDB by an in-memory table, both with
+injectable latency, so runs are repeatable and need no AWS account.
+
+Run with:
+
+    python -m tests.benchmark.run_benchmark --users 50 --telegram-latency 0.02
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+if __name__ == "__main__":
+    sys.path[:0] = [os.path.join(os.path.dirname(__file__), "..", "..", "src")]
+
+import config
+from services import quiz_bank as quiz_bank_module
+from services.quiz_sampling import QuestionSampler, attempt_seed
+from services.storage import DynamoDBStorage, InMemoryStorage, QuizStorage, SQLiteStorage
+from src.handlers import api_handler, quiz_worker
+from src.services import quiz_service as quiz_service_module
+from src.services.quiz_service import QuizService
+from tests.benchmark.fake_dynamodb import FakeTable
+from utils import SessionCallbackData, build_session_reply_markup, get_callback_secret
+from tests.benchmark.fake_telegram import FakeTelegramServer
+from tests.unit.fixtures.telegram_callback_query_body import telegram_callback_query_body
+from tests.unit.fixtures.telegram_text_body import telegram_text_body_start_command
+
+TOKEN = "benchmark-token"
+ADMIN_ID = 1
+QUEUE_URL = "https://sqs.ap-southeast-1.amazonaws.com/000000000000/benchmark-queue"
+# Matches BatchSize of the worker's SQS event source in template.yaml.
+BATCH_SIZE = 10
+
+
+class BenchmarkResult(NamedTuple):
+    storage: str
+    updates: int
+    redelivered: int
+    batches: int
+    elapsed: float
+    updates_per_second: float
+    api_p50_ms: float
+    api_p99_ms: float
+    worker_p50_ms: float
+    worker_p99_ms: float
+    failed_records: int
+    peak_kib_per_update: Optional[float]
+    retained_blocks_per_update: Optional[float]
+    telegram_calls: Dict[str, int]
+    dynamodb_calls: Dict[str, int]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+class FakeQueue:
+    """SQS client stand-in that turns sent messages into worker records."""
+
+    def __init__(self) -> None:
+        self.records: List[Dict[str, Any]] = []
+        self._next_id = 0
+
+    def send_message(self, QueueUrl: str, MessageBody: str, **kwargs: Any) -> Dict[str, Any]:
+        self._next_id += 1
+        message_id = f"msg-{self._next_id}"
+        attributes = {}
+        if "MessageGroupId" in kwargs:
+            attributes["MessageGroupId"] = kwargs["MessageGroupId"]
+        self.records.append({"messageId": message_id, "body": MessageBody, "attributes": attributes})
+        return {"MessageId": message_id}
+
+    def redeliver(self, ratio: float, rng: random.Random) -> int:
+        """Queue a second copy of a share of the records, as at-least-once SQS may."""
+        copies = [
+            dict(record, messageId=f"{record['messageId']}-again")
+            for record in self.records
+            if rng.random() < ratio
+        ]
+        self.records.extend(copies)
+        return len(copies)
+
+    def drain(self, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+        while self.records:
+            batch, self.records = self.records[:batch_size], self.records[batch_size:]
+            yield batch
+
+
+def build_updates(
+    users: int, correct_ratio: float = 0.8, seed: int = 0, first_update_id: int = 1
+) -> List[str]:
+    """Build webhook bodies for ``users`` full quiz sessions, interleaved by user.
+
+    Every user sends /start and then answers each question by pressing one of
+    the buttons the bot would have sent, so callback_data is exactly what
+    Telegram would echo back.
+    """
+    rng = random.Random(seed)
+    bank = quiz_bank_module.get_quiz_bank()
+    sampler = QuestionSampler.from_config(bank)
+    secret = get_callback_secret()
+    write_behind = config.get_config().write_behind
+    start_template = telegram_text_body_start_command.__wrapped__()
+    callback_template = telegram_callback_query_body.__wrapped__()
+
+    sessions = []
+    for user in range(users):
+        user_id = 100000 + user
+        start = copy.deepcopy(start_template)
+        start["message"]["from"]["id"] = user_id
+        start["message"]["chat"]["id"] = user_id
+        session = [start]
+        # The bot numbers the attempt by the /start message's date.
+        attempt = SessionCallbackData(
+            start["message"]["date"], 0, 0, sampler.version, write_behind=write_behind
+        )
+        seed = attempt_seed(user_id, attempt.attempt_id)
+        for position in range(sampler.length if secret else len(bank)):
+            if secret:
+                question = sampler.question(seed, position)
+                attempt = attempt._replace(position=position)
+                reply_markup = build_session_reply_markup(
+                    list(question.choices),
+                    attempt,
+                    user_id,
+                    secret,
+                    order=sampler.choice_order(seed, question),
+                )
+            else:
+                question = bank[position]
+                reply_markup = question.reply_markup
+            buttons = [b for row in reply_markup["inline_keyboard"] for b in row]
+            correct = [b for b in buttons if b["text"] == question.answer]
+            wrong = [b for b in buttons if b["text"] != question.answer]
+            if rng.random() < correct_ratio:
+                button = correct[0]
+            else:
+                button = rng.choice(wrong or buttons)
+            if write_behind and button["text"] == question.answer:
+                attempt = attempt._replace(correct_mask=attempt.correct_mask | 1 << position)
+            callback = copy.deepcopy(callback_template)
+            query = callback["callback_query"]
+            query["from"]["id"] = user_id
+            query["message"]["chat"]["id"] = user_id
+            query["message"]["text"] = question.text
+            query["message"]["reply_markup"] = reply_markup
+            query["data"] = button["callback_data"]
+            session.append(callback)
+        sessions.append(session)
+
+    # Round-robin so every worker batch mixes several users.
+    updates = []
+    for step in range(max((len(s) for s in sessions), default=0)):
+        for session in sessions:
+            if step < len(session):
+                updates.append(session[step])
+    for update_id, update in enumerate(updates, start=first_update_id):
+        update["update_id"] = update_id
+    return [json.dumps(update) for update in updates]
+
+
+@contextmanager
+def benchmark_environment(telegram_url: str, extra_env: Optional[Dict[str, str]] = None):
+    """Point the bot at the stand-ins and restore warm-container state afterwards."""
+    env = {
+        "TOKEN": TOKEN,
+        "TELEGRAM_ADMIN": str(ADMIN_ID),
+        "TELEGRAM_GROUP_ID": "-100",
+        "QUIZ_QUEUE_URL": QUEUE_URL,
+        "TELEGRAM_API_URL": telegram_url,
+        "LOG_LEVEL": "ERROR",
+        "METRICS_ENABLED": "false",
+        "AWS_DEFAULT_REGION": "ap-southeast-1",
+        # Pacing would measure Telegram's limits rather than the bot; see --rate-limit.
+        "TELEGRAM_RATE_LIMITER": "none",
+    }
+    env.update(extra_env or {})
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    _reset_state()
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        _reset_state()
+
+
+def _reset_state() -> None:
+    config.reset_config()
+    api_handler.reset_sqs_client()
+    quiz_worker.reset_quiz_service()
+    quiz_service_module.reset_group_link_cache()
+    quiz_bank_module.reset_quiz_bank()
+
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percentile / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def build_storage(backend: str, dynamodb_latency: float = 0.0) -> QuizStorage:
+    """Storage for one pass; "dynamodb" runs the real backend against FakeTable."""
+    if backend == "dynamodb":
+        return DynamoDBStorage(
+            FakeTable(latency=dynamodb_latency),
+            FakeTable(latency=dynamodb_latency, range_key_name="AttemptID"),
+            FakeTable(key_name="UpdateID", latency=dynamodb_latency),
+        )
+    if backend == "memory":
+        return InMemoryStorage()
+    if backend == "sqlite":
+        return SQLiteStorage(":memory:")
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def _replay(bodies: List[str], redeliver: float = 0.0, seed: int = 0):
+    """Push bodies through both handlers.
+
+    Returns per-stage latencies in seconds, the failed record count and how
+    many records were delivered twice.
+    """
+    queue = FakeQueue()
+    api_handler._sqs_client = queue
+
+    api_latencies, worker_latencies, failed = [], [], 0
+    for body in bodies:
+        event = {"queryStringParameters": {"token": TOKEN}, "body": body}
+        started = time.perf_counter()
+        response = api_handler.lambda_handler(event, None)
+        api_latencies.append(time.perf_counter() - started)
+        if response["statusCode"] != 200:
+            raise RuntimeError(f"api_handler returned {response}")
+
+    redelivered = queue.redeliver(redeliver, random.Random(seed)) if redeliver else 0
+    for batch in queue.drain(BATCH_SIZE):
+        started = time.perf_counter()
+        response = quiz_worker.lambda_handler({"Records": batch}, None)
+        worker_latencies.append(time.perf_counter() - started)
+        failed += len(response["batchItemFailures"])
+    return api_latencies, worker_latencies, failed, redelivered
+
+
+def run_benchmark(
+    users: int = 20,
+    telegram_latency: float = 0.0,
+    dynamodb_latency: float = 0.0,
+    correct_ratio: float = 0.8,
+    seed: int = 0,
+    trace_allocations: bool = True,
+    extra_env: Optional[Dict[str, str]] = None,
+    storage: str = "dynamodb",
+    redeliver: float = 0.0,
+) -> BenchmarkResult:
+    """Replay ``users`` quiz sessions and measure throughput, latency and allocations.
+
+    Both handlers are warm: container initialisation is not part of the run.
+    """
+    with FakeTelegramServer(latency=telegram_latency) as telegram:
+        with benchmark_environment(telegram.url, extra_env):
+            bodies = build_updates(users, correct_ratio, seed)
+            service = QuizService(storage=build_storage(storage, dynamodb_latency))
+            quiz_worker._quiz_service = service
+            backend = service.storage
+
+            started = time.perf_counter()
+            api_latencies, worker_latencies, failed, redelivered = _replay(
+                bodies, redeliver, seed
+            )
+            elapsed = time.perf_counter() - started
+            telegram_calls = dict(telegram.calls)
+            dynamodb_calls = _dynamodb_calls(backend)
+            service.telegram_service.close()
+
+            peak_kib = retained_blocks = None
+            if trace_allocations:
+                # A second, traced pass on its own service and tables: tracing
+                # slows execution too much to share the timed pass.
+                traced = QuizService(storage=build_storage(storage))
+                quiz_worker._quiz_service = traced
+                peak_kib, retained_blocks = _measure_allocations(
+                    build_updates(users, correct_ratio, seed + 1, len(bodies) + 1)
+                )
+                traced.telegram_service.close()
+
+            return BenchmarkResult(
+                storage=storage,
+                updates=len(bodies),
+                redelivered=redelivered,
+                batches=len(worker_latencies),
+                elapsed=elapsed,
+                updates_per_second=len(bodies) / elapsed if elapsed else 0.0,
+                api_p50_ms=_percentile(api_latencies, 50) * 1000,
+                api_p99_ms=_percentile(api_latencies, 99) * 1000,
+                worker_p50_ms=_percentile(worker_latencies, 50) * 1000,
+                worker_p99_ms=_percentile(worker_latencies, 99) * 1000,
+                failed_records=failed,
+                peak_kib_per_update=peak_kib,
+                retained_blocks_per_update=retained_blocks,
+                telegram_calls=telegram_calls,
+                dynamodb_calls=dynamodb_calls,
+            )
+
+
+def _dynamodb_calls(backend: QuizStorage) -> Dict[str, int]:
+    """Operation counts summed over every table."""
+    if not isinstance(backend, DynamoDBStorage):
+        return {}
+    calls: Dict[str, int] = {}
+    for table in (backend.table, backend.attempts_table, backend.updates_table):
+        for operation, count in table.calls.items():
+            calls[operation] = calls.get(operation, 0) + count
+    return calls
+
+
+def _measure_allocations(bodies: List[str]):
+    """Return (peak KiB, blocks still allocated afterwards) per update."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        _replay(bodies)
+        gc.collect()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    count = len(bodies) or 1
+    return peak / 1024 / count, retained / count
+
+
+def format_result(result: BenchmarkResult) -> str:
+    lines = [
+        f"storage            {result.storage}",
+        f"updates            {result.updates} ({result.redelivered} redelivered, {result.batches} worker batches, {result.failed_records} failed)",
+        f"throughput         {result.updates_per_second:.1f} updates/s",
+        f"api_handler        p50 {result.api_p50_ms:.2f} ms  p99 {result.api_p99_ms:.2f} ms",
+        f"quiz_worker batch  p50 {result.worker_p50_ms:.2f} ms  p99 {result.worker_p99_ms:.2f} ms",
+    ]
+    if result.peak_kib_per_update is not None:
+        lines.append(
+            f"allocations        peak {result.peak_kib_per_update:.1f} KiB/update, "
+            f"retained {result.retained_blocks_per_update:.1f} blocks/update"
+        )
+    lines.append(f"telegram calls     {json.dumps(result.telegram_calls, sort_keys=True)}")
+    if result.dynamodb_calls:
+        lines.append(f"dynamodb calls     {json.dumps(result.dynamodb_calls, sort_keys=True)}")
+    return "\n".join(lines)
+
+
+def _flag_env(args: argparse.Namespace) -> Dict[str, str]:
+    env = {}
+    if args.async_worker:
+        env["QUIZ_WORKER_ASYNC"] = "true"
+    if args.write_behind:
+        env["QUIZ_WRITE_BEHIND"] = "true"
+    if args.sample_size:
+        env["QUIZ_SAMPLE_SIZE"] = str(args.sample_size)
+    if args.no_idempotency:
+        env["QUIZ_IDEMPOTENCY"] = "false"
+    if args.rate_limit:
+        env["TELEGRAM_RATE_LIMITER"] = "local"
+    return env
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="quiz sessions to replay")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="seconds per Bot API call")
+    parser.add_argument("--dynamodb-latency", type=float, default=0.0, help="seconds per table call")
+    parser.add_argument(
+        "--storage", choices=("dynamodb", "memory", "sqlite"), default="dynamodb",
+        help="quiz storage backend; dynamodb runs against an in-memory table",
+    )
+    parser.add_argument("--correct-ratio", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--async-worker", action="store_true", help="set QUIZ_WORKER_ASYNC=true")
+    parser.add_argument("--write-behind", action="store_true", help="set QUIZ_WRITE_BEHIND=true")
+    parser.add_argument(
+        "--sample-size", type=int, default=0, help="set QUIZ_SAMPLE_SIZE (questions per attempt)"
+    )
+    parser.add_argument(
+        "--redeliver", type=float, default=0.0, help="share of records SQS delivers twice"
+    )
+    parser.add_argument(
+        "--no-idempotency", action="store_true", help="set QUIZ_IDEMPOTENCY=false"
+    )
+    parser.add_argument(
+        "--rate-limit", action="store_true", help="pace Telegram calls (TELEGRAM_RATE_LIMITER=local)"
+    )
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(
+        users=args.users,
+        telegram_latency=args.telegram_latency,
+        dynamodb_latency=args.dynamodb_latency,
+        correct_ratio=args.correct_ratio,
+        seed=args.seed,
+        trace_allocations=not args.no_allocations,
+        extra_env=_flag_env(args),
+        storage=args.storage,
+        redeliver=args.redeliver,
+    )
+    print(json.dumps(result.to_dict()) if args.json else format_result(result))
+    return 1 if result.failed_records else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
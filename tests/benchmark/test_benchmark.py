@@ -0,0 +1,132 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from tests.benchmark.fake_dynamodb import FakeTable
+from tests.benchmark.run_benchmark import build_updates, main, run_benchmark
+
+
+def test_benchmark_replays_every_update_end_to_end():
+    result = run_benchmark(users=3, correct_ratio=1.0)
+
+    assert result.updates == 3 * 5
+    assert result.failed_records == 0
+    assert result.updates_per_second > 0
+    assert result.api_p50_ms <= result.api_p99_ms
+    assert result.worker_p50_ms <= result.worker_p99_ms
+    assert result.peak_kib_per_update > 0
+    # Perfect scores earn the group link, generated once and then cached.
+    assert result.telegram_calls["exportChatInviteLink"] == 1
+    assert result.telegram_calls["editMessageText"] == 3 * 4
+
+
+def test_benchmark_async_worker_matches_sync_call_counts():
+    sync = run_benchmark(users=2, trace_allocations=False)
+    concurrent = run_benchmark(
+        users=2, trace_allocations=False, extra_env={"QUIZ_WORKER_ASYNC": "true"}
+    )
+
+    assert concurrent.failed_records == 0
+    assert concurrent.telegram_calls == sync.telegram_calls
+    assert concurrent.dynamodb_calls == sync.dynamodb_calls
+
+
+@pytest.mark.parametrize("storage", ["memory", "sqlite"])
+def test_benchmark_runs_on_local_storage_backends(storage):
+    result = run_benchmark(users=2, correct_ratio=1.0, trace_allocations=False, storage=storage)
+
+    assert result.failed_records == 0
+    assert result.dynamodb_calls == {}
+    assert result.telegram_calls["exportChatInviteLink"] == 1
+
+
+def test_benchmark_write_behind_saves_each_quiz_once():
+    # Nobody earns the group link, whose lease would add a write, and update
+    # claims are left out to count answer writes only.
+    no_claims = {"QUIZ_IDEMPOTENCY": "false"}
+    write_through = run_benchmark(
+        users=3, correct_ratio=0.0, trace_allocations=False, extra_env=no_claims
+    )
+    write_behind = run_benchmark(
+        users=3,
+        correct_ratio=0.0,
+        trace_allocations=False,
+        extra_env={**no_claims, "QUIZ_WRITE_BEHIND": "true"},
+    )
+
+    assert write_behind.failed_records == 0
+    # One registration upsert and one consolidated attempt write per user.
+    assert write_behind.dynamodb_calls["update_item"] == 3
+    assert write_behind.dynamodb_calls["put_item"] == 3
+    # Write-through also writes every answer to the attempt as it arrives.
+    assert write_through.dynamodb_calls["update_item"] == 3 * (1 + 4)
+
+
+def test_benchmark_redelivered_updates_have_no_side_effects():
+    once = run_benchmark(users=3, correct_ratio=1.0, trace_allocations=False)
+    twice = run_benchmark(users=3, correct_ratio=1.0, trace_allocations=False, redeliver=1.0)
+
+    assert twice.redelivered == once.updates
+    assert twice.failed_records == 0
+    assert twice.telegram_calls == once.telegram_calls
+    # Duplicates are dropped by the worker's LRU without a DynamoDB call.
+    assert twice.dynamodb_calls == once.dynamodb_calls
+
+
+def test_allocation_pass_does_not_count_towards_calls():
+    traced = run_benchmark(users=2, seed=1)
+    untraced = run_benchmark(users=2, seed=1, trace_allocations=False)
+
+    assert traced.dynamodb_calls == untraced.dynamodb_calls
+    assert traced.telegram_calls == untraced.telegram_calls
+
+
+def test_build_updates_interleaves_users():
+    bodies = [json.loads(body) for body in build_updates(users=2)]
+
+    assert [body["update_id"] for body in bodies] == list(range(1, 11))
+    assert bodies[0]["message"]["text"] == "/start"
+    assert bodies[0]["message"]["from"]["id"] != bodies[1]["message"]["from"]["id"]
+    assert "callback_query" in bodies[2]
+
+
+def test_fake_table_supports_range_keys_and_deletes():
+    table = FakeTable(range_key_name="AttemptID")
+    table.put_item(Item={"UserID": 1, "AttemptID": 1, "score": 1})
+    table.put_item(Item={"UserID": 1, "AttemptID": 2, "score": 2})
+
+    table.delete_item(Key={"UserID": 1, "AttemptID": 1})
+
+    assert table.get_item(Key={"UserID": 1, "AttemptID": 1}) == {}
+    assert table.get_item(Key={"UserID": 1, "AttemptID": 2})["Item"]["score"] == 2
+
+
+def test_fake_table_rejects_failed_conditions():
+    table = FakeTable()
+    table.put_item(Item={"UserID": 1, "correct_count": 0})
+
+    table.update_item(
+        Key={"UserID": 1},
+        UpdateExpression="ADD #c :one",
+        ConditionExpression="attribute_exists(#c)",
+        ExpressionAttributeNames={"#c": "correct_count"},
+        ExpressionAttributeValues={":one": 1},
+    )
+    assert table.get_item(Key={"UserID": 1})["Item"]["correct_count"] == 1
+
+    with pytest.raises(ClientError) as error:
+        table.update_item(
+            Key={"UserID": 2},
+            UpdateExpression="ADD #c :one",
+            ConditionExpression="attribute_exists(#c)",
+            ExpressionAttributeNames={"#c": "correct_count"},
+            ExpressionAttributeValues={":one": 1},
+        )
+    assert error.value.response["Error"]["Code"] == "ConditionalCheckFailedException"
+
+
+def test_main_prints_json(capsys):
+    assert main(["--users", "1", "--no-allocations", "--json"]) == 0
+
+    assert json.loads(capsys.readouterr().out.strip().splitlines()[-1])["updates"] == 5
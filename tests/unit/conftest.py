@@ -0,0 +1,36 @@
+import pytest
+
+from src.handlers import api_handler, quiz_worker, telegram_sender
+import src.config
+import src.services.quiz_bank
+import src.services.quiz_service
+import config
+import logger
+from services import quiz_bank, quiz_service
+
+# src modules import each other by bare name while tests also import them
+# under ``src.``, so both copies of a module with a cache can be loaded.
+_CONFIG_MODULES = (config, src.config)
+_QUIZ_BANK_MODULES = (quiz_bank, src.services.quiz_bank)
+_QUIZ_SERVICE_MODULES = (quiz_service, src.services.quiz_service)
+
+
+def _reset_caches():
+    for module in _CONFIG_MODULES:
+        module.reset_config()
+    api_handler.reset_sqs_client()
+    quiz_worker.reset_quiz_service()
+    telegram_sender.reset_telegram_sender()
+    for module in _QUIZ_SERVICE_MODULES:
+        module.reset_group_link_cache()
+    for module in _QUIZ_BANK_MODULES:
+        module.reset_quiz_bank()
+
+
+@pytest.fixture(autouse=True)
+def reset_warm_container_state():
+    """Start every test from a cold container."""
+    logger.start_event()
+    _reset_caches()
+    yield
+    _reset_caches()
@@ -0,0 +1,120 @@
+import asyncio
+from unittest.mock import Mock, patch
+
+import pytest
+
+import config
+from errors import EnvironmentException
+from services.admin_notifications import AdminNotifier, format_digest
+from services.storage import InMemoryStorage
+from src.handlers import admin_digest
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def telegram_service():
+    return Mock()
+
+
+def _digest_notifier(telegram_service, clock, storage=None, max_events=3):
+    return AdminNotifier(
+        storage or InMemoryStorage(),
+        telegram_service,
+        digest=True,
+        max_events=max_events,
+        interval=60,
+        clock=clock,
+    )
+
+
+def test_immediate_mode_sends_each_event(telegram_service):
+    notifier = AdminNotifier(InMemoryStorage(), telegram_service)
+
+    notifier.notify("A started the quiz")
+    notifier.notify("A finished the quiz", digest_only=True)
+
+    telegram_service.notify_admins.assert_called_once_with("A started the quiz")
+
+
+def test_digest_is_sent_once_enough_events_are_pending(telegram_service, clock):
+    notifier = _digest_notifier(telegram_service, clock)
+
+    notifier.notify("A started the quiz")
+    notifier.notify("A finished the quiz", digest_only=True)
+    telegram_service.notify_admins.assert_not_called()
+    notifier.notify("B started the quiz")
+
+    telegram_service.notify_admins.assert_called_once_with(
+        "Quiz activity: 3 events\n"
+        "- A started the quiz\n"
+        "- A finished the quiz\n"
+        "- B started the quiz"
+    )
+    assert notifier.flush() == 0
+
+
+def test_digest_is_sent_once_the_oldest_event_is_old_enough(telegram_service, clock):
+    notifier = _digest_notifier(telegram_service, clock)
+
+    notifier.notify("A started the quiz")
+    clock.now += 60
+    notifier.notify("B started the quiz")
+
+    telegram_service.notify_admins.assert_called_once_with(
+        "Quiz activity: 2 events\n- A started the quiz\n- B started the quiz"
+    )
+
+
+def test_digest_async_buffers_without_sending(clock):
+    telegram_service = Mock()
+    notifier = _digest_notifier(telegram_service, clock)
+
+    asyncio.run(notifier.notify_async("A started the quiz"))
+
+    telegram_service.notify_admins.assert_not_called()
+    assert notifier.storage.take_admin_events() == ["A started the quiz"]
+
+
+def test_long_digest_is_cut_to_fit_a_message():
+    events = [f"User {i} - user{i} started the quiz" for i in range(500)]
+
+    digest = format_digest(events)
+
+    assert len(digest) <= 4000
+    assert digest.startswith("Quiz activity: 500 events\n- User 0 - user0 started the quiz")
+    assert digest.splitlines()[-1].startswith("... and ")
+
+
+def test_unknown_mode_is_rejected(monkeypatch, telegram_service):
+    monkeypatch.setenv("ADMIN_NOTIFICATIONS", "weekly")
+
+    with pytest.raises(EnvironmentException):
+        AdminNotifier.from_config(InMemoryStorage(), telegram_service, config=config.reload_config())
+
+
+@patch("src.handlers.admin_digest.TelegramService")
+def test_scheduled_handler_flushes_pending_events(mock_telegram_service, monkeypatch):
+    monkeypatch.setenv("TOKEN", "12345")
+    monkeypatch.setenv("TELEGRAM_ADMIN", "12345")
+    monkeypatch.setenv("ADMIN_NOTIFICATIONS", "digest")
+    storage = InMemoryStorage()
+    storage.add_admin_event("A started the quiz", 100)
+
+    with patch("src.handlers.admin_digest.create_storage", return_value=storage):
+        assert admin_digest.lambda_handler({}, None) == {"events": 1}
+
+    mock_telegram_service.return_value.notify_admins.assert_called_once_with(
+        "Quiz activity: 1 event\n- A started the quiz"
+    )
@@ -216,3 +216,90 @@ def test_lambda_handler_token_invalid(monkeypatch, apigw_event_token_invalid):
     assert ret["statusCode"] == 401
     assert "error" in ret["body"]
     assert data["error"]["message"] == "UnauthorizedException: Invalid token provided"
+
+
+def telegram_body(text, chat_id=777, chat_type="private"):
+    return json.dumps(
+        {
+            "update_id": 42,
+            "message": {
+                "from": {"id": 777, "first_name": "John"},
+                "chat": {"id": chat_id, "type": chat_type},
+                "text": text,
+            },
+        }
+    )
+
+
+@patch("boto3.client")
+def test_lambda_handler_reuses_sqs_client(mock_boto_client, monkeypatch, apigw_event):
+    mock_setenv(monkeypatch)
+    apigw_event["body"] = telegram_body("/start")
+
+    app_lambda_handler(apigw_event, "")
+    app_lambda_handler(apigw_event, "")
+
+    mock_boto_client.assert_called_once_with("sqs")
+    assert mock_boto_client.return_value.send_message.call_count == 2
+
+
+@patch("boto3.client")
+def test_lambda_handler_fifo_groups_by_user(mock_boto_client, monkeypatch, apigw_event):
+    mock_setenv(monkeypatch)
+    monkeypatch.setenv("QUIZ_QUEUE_URL", "https://sqs/123/quiz.fifo")
+    apigw_event["body"] = telegram_body("/start")
+
+    ret = app_lambda_handler(apigw_event, "")
+
+    assert ret["statusCode"] == 200
+    kwargs = mock_boto_client.return_value.send_message.call_args.kwargs
+    assert kwargs["MessageGroupId"] == "user-777"
+    assert kwargs["MessageDeduplicationId"] == "42"
+
+
+@patch("boto3.client")
+def test_lambda_handler_standard_queue_has_no_group(mock_boto_client, monkeypatch, apigw_event):
+    mock_setenv(monkeypatch)
+    apigw_event["body"] = telegram_body("/start")
+
+    app_lambda_handler(apigw_event, "")
+
+    kwargs = mock_boto_client.return_value.send_message.call_args.kwargs
+    assert "MessageGroupId" not in kwargs
+
+
+@patch("boto3.client")
+def test_lambda_handler_drops_unsupported_updates(mock_boto_client, monkeypatch, apigw_event):
+    mock_setenv(monkeypatch)
+
+    ret = app_lambda_handler(apigw_event, "")
+
+    assert ret["statusCode"] == 200
+    mock_boto_client.return_value.send_message.assert_not_called()
+
+
+@patch("boto3.client")
+def test_lambda_handler_drops_disallowed_chats(mock_boto_client, monkeypatch, apigw_event):
+    mock_setenv(monkeypatch)
+    apigw_event["body"] = telegram_body("/start", chat_id=-999, chat_type="group")
+
+    ret = app_lambda_handler(apigw_event, "")
+
+    assert ret["statusCode"] == 200
+    mock_boto_client.return_value.send_message.assert_not_called()
+
+
+@patch("boto3.client")
+def test_lambda_handler_answers_text_inline(mock_boto_client, monkeypatch, apigw_event):
+    mock_setenv(monkeypatch)
+    apigw_event["body"] = telegram_body("hello")
+
+    ret = app_lambda_handler(apigw_event, "")
+
+    assert ret["statusCode"] == 200
+    assert json.loads(ret["body"]) == {
+        "method": "sendMessage",
+        "chat_id": 777,
+        "text": "Send /start to begin the quiz.",
+    }
+    mock_boto_client.return_value.send_message.assert_not_called()
@@ -0,0 +1,60 @@
+import pytest
+
+import config
+from src.utils import is_allowed_chat
+
+
+def test_get_config_is_cached_until_reload(monkeypatch):
+    monkeypatch.setenv("TELEGRAM_ADMIN", "1, 2")
+    first = config.get_config()
+
+    monkeypatch.setenv("TELEGRAM_ADMIN", "3")
+    assert config.get_config() is first
+    assert first.admin_ids == (1, 2)
+
+    assert config.reload_config().admin_ids == (3,)
+
+
+def test_parse_chat_ids_ignores_invalid_entries():
+    assert config.parse_chat_ids("-100, 5\n7 abc,,") == frozenset({-100, 5, 7})
+
+
+def test_allowed_chat_ids_are_merged_from_all_sources(monkeypatch, tmp_path):
+    ids_file = tmp_path / "allowed.txt"
+    ids_file.write_text("\n".join(str(i) for i in range(20000)))
+    monkeypatch.setenv("TELEGRAM_ALLOWED_CHAT_IDS", "-1001")
+    monkeypatch.setenv("TELEGRAM_ALLOWED_CHAT_IDS_FILE", str(ids_file))
+    monkeypatch.setenv("TELEGRAM_ALLOWED_CHAT_IDS_PARAMETER", "/bot/allowed")
+    monkeypatch.setattr(config, "parameter_loader", lambda name: "-2002,-3003")
+
+    allowed = config.get_config().allowed_chat_ids
+
+    assert len(allowed) == 20003
+    assert is_allowed_chat(-2002, "group") is True
+    assert is_allowed_chat(19999, "private") is True
+    assert is_allowed_chat(20000, "private") is False
+
+
+def test_telegram_settings_have_defaults():
+    settings = config.get_config()
+
+    assert settings.telegram_pool_size == 10
+    assert settings.telegram_connect_timeout == pytest.approx(3.05)
+    assert settings.group_link_ttl == 300
+
+
+def test_telegram_api_url_can_point_at_a_local_server(monkeypatch):
+    assert config.get_config().telegram_api_url == "https://api.telegram.org"
+
+    monkeypatch.setenv("TELEGRAM_API_URL", "http://127.0.0.1:8081/")
+    assert config.reload_config().telegram_api_url == "http://127.0.0.1:8081"
+
+
+def test_sample_settings(monkeypatch):
+    monkeypatch.setenv("QUIZ_SAMPLE_SIZE", "20")
+    monkeypatch.setenv("QUIZ_SAMPLE_STRATA", " Topic, difficulty ,")
+
+    settings = config.reload_config()
+
+    assert settings.sample_size == 20
+    assert settings.sample_strata == ("topic", "difficulty")
@@ -0,0 +1,82 @@
+"""Cold-start import profile of the Lambda handlers, from ``python -X importtime``."""
+import functools
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "..", "src")
+
+# Budgets in microseconds of cumulative import time, two to four times what a
+# warm laptop needs. The api_handler budget is blown as soon as it pulls in
+# boto3 or requests at import, the others' by boto3 or asyncio.
+BUDGETS = {
+    "handlers.api_handler": 100_000,
+    "handlers.quiz_worker": 400_000,
+    "handlers.telegram_sender": 400_000,
+    "handlers.admin_digest": 400_000,
+}
+
+# Modules each handler may only load once an invocation needs them.
+DEFERRED = {
+    "handlers.api_handler": ("boto3", "botocore", "requests", "services.quiz_service", "asyncio"),
+    "handlers.quiz_worker": ("boto3", "asyncio", "sqlite3"),
+    "handlers.telegram_sender": ("boto3", "services.quiz_service", "asyncio", "sqlite3"),
+    "handlers.admin_digest": ("boto3", "services.quiz_service", "asyncio", "sqlite3"),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _profile(module: str) -> Tuple[int, List[Tuple[str, int, int]]]:
+    """Import module in a fresh interpreter; return its cumulative time and every import.
+
+    The import is run twice and the second run measured, so compiling
+    bytecode and a cold disk cache do not count.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(SRC))
+    for _ in range(2):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    total = next(cumulative for name, _, cumulative in imports if name == module)
+    return total, imports
+
+
+def _report(imports: List[Tuple[str, int, int]]) -> str:
+    slowest = sorted(imports, key=lambda entry: entry[1], reverse=True)[:10]
+    return "\n".join(f"{self_us:>8} us  {name}" for name, self_us, _ in slowest)
+
+
+@pytest.mark.parametrize("module", sorted(BUDGETS))
+def test_handler_import_time_is_within_budget(module):
+    total, imports = _profile(module)
+
+    assert total <= BUDGETS[module], (
+        f"{module} took {total} us to import (budget {BUDGETS[module]} us). "
+        f"Slowest imports:\n{_report(imports)}"
+    )
+
+
+@pytest.mark.parametrize("module", sorted(DEFERRED))
+def test_handler_defers_heavy_modules(module):
+    _, imports = _profile(module)
+    loaded: Dict[str, int] = {name: self_us for name, self_us, _ in imports}
+
+    eager = [
+        name
+        for name in loaded
+        if any(name == heavy or name.startswith(heavy + ".") for heavy in DEFERRED[module])
+    ]
+    assert eager == [], f"{module} imports {eager} up front"
@@ -0,0 +1,72 @@
+import json
+from unittest.mock import Mock
+
+import logger
+
+
+def _records(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_logger_emits_json_with_level_filtering(monkeypatch, capsys):
+    monkeypatch.setenv("LOG_LEVEL", "INFO")
+    log = logger.get_logger("test")
+
+    log.debug("hidden")
+    log.info("shown", user_id=1)
+
+    records = _records(capsys)
+    assert len(records) == 1
+    assert records[0]["message"] == "shown"
+    assert records[0]["level"] == "INFO"
+    assert records[0]["user_id"] == 1
+
+
+def test_logger_formats_fields_lazily(monkeypatch, capsys):
+    monkeypatch.setenv("LOG_LEVEL", "INFO")
+    expensive = Mock(return_value={"big": "payload"})
+    log = logger.get_logger("test")
+
+    log.debug("skipped", payload=expensive)
+    expensive.assert_not_called()
+
+    log.info("emitted", payload=expensive)
+    assert _records(capsys)[0]["payload"] == {"big": "payload"}
+
+
+def test_failing_lazy_field_does_not_raise(monkeypatch, capsys):
+    monkeypatch.setenv("LOG_LEVEL", "DEBUG")
+    log = logger.get_logger("test")
+
+    log.debug("response", response_json=Mock(side_effect=ValueError("not JSON")))
+
+    (record,) = _records(capsys)
+    assert record["response_json"] == "<unavailable: ValueError('not JSON')>"
+
+
+def test_logger_redacts_tokens_and_names(capsys):
+    log = logger.get_logger("test")
+
+    log.info(
+        "request",
+        url="https://api.telegram.org/bot123456:ABC-def_ghi/sendMessage",
+        payload={"chat_id": 1, "from": {"first_name": "John", "username": "jd"}},
+        response_json={"result": {"chat": {"id": 1}, "text": "Hello John Doe"}},
+    )
+
+    record = _records(capsys)[0]
+    assert record["url"] == "https://api.telegram.org/bot***/sendMessage"
+    assert record["payload"]["from"] == {"first_name": "***", "username": "***"}
+    assert record["payload"]["chat_id"] == 1
+    assert record["response_json"]["result"] == {"chat": {"id": 1}, "text": "***"}
+
+
+def test_sampled_events_log_debug(monkeypatch, capsys):
+    monkeypatch.setenv("LOG_LEVEL", "WARNING")
+    monkeypatch.setenv("LOG_DEBUG_SAMPLE_RATE", "1")
+    log = logger.get_logger("test")
+
+    logger.start_event()
+    log.debug("sampled")
+
+    assert _records(capsys)[0]["message"] == "sampled"
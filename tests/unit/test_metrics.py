@@ -0,0 +1,87 @@
+import json
+
+import boto3
+from botocore.stub import Stubber
+
+import metrics
+
+
+def _emf_records(capsys):
+    return [
+        json.loads(line)
+        for line in capsys.readouterr().out.splitlines()
+        if line.startswith('{"_aws"')
+    ]
+
+
+def test_instrument_handler_emits_emf_with_cold_start_tag(monkeypatch, capsys):
+    monkeypatch.setattr(metrics, "_cold_start", True)
+
+    @metrics.instrument_handler("test_fn")
+    def handler(event, context):
+        with metrics.timed("work"):
+            pass
+        return "ok"
+
+    assert handler({}, None) == "ok"
+    assert handler({}, None) == "ok"
+
+    cold, warm = _emf_records(capsys)
+    assert cold["ColdStart"] == "true"
+    assert warm["ColdStart"] == "false"
+    assert "init" in cold and "init" not in warm
+
+    directive = warm["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Dimensions"] == [["Function", "ColdStart"]]
+    assert {m["Name"] for m in directive["Metrics"]} == {"handler", "work"}
+    assert warm["Function"] == "test_fn"
+    assert len(warm["work"]) == 1
+    assert warm["summary"]["work"]["Count"] == 1
+    assert [span["name"] for span in warm["spans"]] == ["work", "handler"]
+
+
+def test_metric_values_are_split_into_records_of_100(capsys):
+    metrics.start_invocation("test_fn")
+    for duration in range(150):
+        metrics.record_duration("work", 0.0, float(duration))
+    metrics.record_duration("once", 0.0, 2.5)
+    first = metrics.flush_metrics()
+
+    records = _emf_records(capsys)
+    assert records[0] == first
+    assert [record["work"] for record in records] == [
+        [float(d) for d in range(100)],
+        [float(d) for d in range(100, 150)],
+    ]
+    assert first["once"] == [2.5] and "once" not in records[1]
+    assert {m["Name"] for m in records[1]["_aws"]["CloudWatchMetrics"][0]["Metrics"]} == {"work"}
+    # The summary sits outside Metrics, so CloudWatch does not read it as a value.
+    assert first["summary"]["work"] == {"Min": 0.0, "Max": 149.0, "Count": 150, "Sum": 11175.0}
+    assert "summary" not in records[1]
+
+
+def test_timed_function_outside_invocation_is_a_no_op():
+    @metrics.timed_function("orphan")
+    def work():
+        return 42
+
+    assert work() == 42
+    assert metrics.flush_metrics() is None
+
+
+def test_instrument_boto3_client_times_each_operation():
+    client = boto3.client(
+        "dynamodb",
+        region_name="ap-southeast-1",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+    )
+    metrics.instrument_boto3_client(client, "dynamodb")
+
+    with Stubber(client) as stubber:
+        stubber.add_response("get_item", {})
+        metrics.start_invocation("test_fn")
+        client.get_item(TableName="table", Key={"UserID": {"N": "1"}})
+        record = metrics.flush_metrics()
+
+    assert record["summary"]["dynamodb.GetItem"]["Count"] == 1
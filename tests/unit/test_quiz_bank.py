@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from src.services.quiz_bank import compile_quiz_bank, get_quiz_bank
+from src.utils import decode_callback_data
+
+
+@pytest.fixture
+def quiz_bank():
+    return compile_quiz_bank(
+        [
+            {"question": "Q1?", "choices": ["A", "B"], "answer": "B"},
+            {"question": "Q2?", "choices": ["Long choice text", "C"], "answer": "C"},
+        ]
+    )
+
+
+def test_compile_quiz_bank_builds_questions(quiz_bank):
+    assert len(quiz_bank) == 2
+    question = quiz_bank[0]
+    assert question.text == "Q1?"
+    assert question.choices == ("A", "B")
+    assert question.answer_index == 1
+    assert question.choice_indexes["A"] == 0
+    assert question.is_correct("B") is True
+    assert question.is_correct("A") is False
+
+
+def test_compiled_reply_markup_is_preserialised(quiz_bank):
+    question = quiz_bank[1]
+    assert json.loads(question.reply_markup_json) == question.reply_markup
+    data = [btn["callback_data"] for row in question.reply_markup["inline_keyboard"] for btn in row]
+    decoded = [decode_callback_data(item) for item in data]
+    assert [(d.question_index, d.choice_index) for d in decoded] == [(1, 0), (1, 1)]
+    assert all(d.quiz_version == quiz_bank.version for d in decoded)
+
+
+def test_signed_quiz_bank_rejects_other_keys():
+    bank = compile_quiz_bank(
+        [{"question": "Q1?", "choices": ["A", "B"], "answer": "B"}], secret=b"k1"
+    )
+    data = bank[0].reply_markup["inline_keyboard"][0][0]["callback_data"]
+
+    assert decode_callback_data(data, b"k1").choice_index == 0
+    assert decode_callback_data(data, b"k2") is None
+
+
+def test_quiz_version_changes_with_content():
+    first = compile_quiz_bank([{"question": "Q?", "choices": ["A"], "answer": "A"}])
+    second = compile_quiz_bank([{"question": "Q!", "choices": ["A"], "answer": "A"}])
+    assert first.version != second.version
+
+
+def test_compiled_questions_are_read_only(quiz_bank):
+    with pytest.raises(AttributeError):
+        quiz_bank[0].text = "changed"
+    with pytest.raises(TypeError):
+        quiz_bank[0].choice_indexes["Z"] = 3
+
+
+def test_quiz_bank_get_out_of_range(quiz_bank):
+    assert quiz_bank.get(2) is None
+    assert quiz_bank.get(-1) is None
+
+
+def test_get_quiz_bank_is_compiled_once():
+    assert get_quiz_bank() is get_quiz_bank()
@@ -0,0 +1,113 @@
+from collections import Counter
+
+import pytest
+
+from errors import EnvironmentException
+from src.services.quiz_bank import compile_quiz_bank
+from src.services.quiz_sampling import Permutation, QuestionSampler, attempt_seed
+
+
+@pytest.fixture
+def large_bank():
+    return compile_quiz_bank(
+        [
+            {
+                "question": f"Q{i}?",
+                "choices": ["A", "B", "C", "D"],
+                "answer": "ABCD"[i % 4],
+                "topic": "basics" if i < 600 else "stdlib",
+                "difficulty": "easy" if i % 3 else "hard",
+            }
+            for i in range(1000)
+        ]
+    )
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 64, 1000, 1025])
+def test_permutation_is_a_bijection(size):
+    permutation = Permutation(size, key=42)
+
+    assert sorted(permutation(i) for i in range(size)) == list(range(size))
+
+
+def test_permutation_depends_on_key():
+    first = [Permutation(100, key=1)(i) for i in range(100)]
+    second = [Permutation(100, key=2)(i) for i in range(100)]
+
+    assert first != second
+    assert first == [Permutation(100, key=1)(i) for i in range(100)]
+
+
+def test_unsampled_attempts_ask_the_whole_bank_in_order(large_bank):
+    sampler = QuestionSampler(large_bank)
+
+    assert sampler.length == 1000
+    assert sampler.version == large_bank.version
+    assert sampler.question(attempt_seed(1, 2), 5) is large_bank[5]
+    assert sampler.choice_order(attempt_seed(1, 2), large_bank[5]) is None
+
+
+def test_sampled_attempt_is_deterministic_and_distinct(large_bank):
+    sampler = QuestionSampler(large_bank, size=20)
+    seed = attempt_seed(12345, 1700000000)
+
+    asked = [sampler.question(seed, position).index for position in range(20)]
+
+    assert len(set(asked)) == 20
+    assert asked == [sampler.question(seed, position).index for position in range(20)]
+    assert asked != [
+        sampler.question(attempt_seed(12345, 1700000001), position).index
+        for position in range(20)
+    ]
+    assert sampler.question(seed, 20) is None
+    assert sampler.version != large_bank.version
+
+
+def test_sample_is_capped_at_the_bank_size():
+    bank = compile_quiz_bank(
+        [{"question": f"Q{i}?", "choices": ["A"], "answer": "A"} for i in range(3)]
+    )
+    sampler = QuestionSampler(bank, size=10)
+    seed = attempt_seed(1, 1)
+
+    assert sampler.length == 3
+    assert sorted(sampler.question(seed, p).index for p in range(3)) == [0, 1, 2]
+
+
+def test_stratified_sample_matches_group_shares(large_bank):
+    sampler = QuestionSampler(large_bank, size=10, strata=("topic",))
+
+    for user_id in range(20):
+        seed = attempt_seed(user_id, 1)
+        topics = Counter(sampler.question(seed, p).topic for p in range(10))
+        assert topics == {"basics": 6, "stdlib": 4}
+
+
+def test_stratified_sample_by_several_attributes(large_bank):
+    sampler = QuestionSampler(large_bank, size=30, strata=("topic", "difficulty"))
+    seed = attempt_seed(7, 1)
+
+    questions = [sampler.question(seed, p) for p in range(30)]
+
+    assert len({q.index for q in questions}) == 30
+    groups = Counter((q.topic, q.difficulty) for q in questions)
+    assert sum(groups.values()) == 30
+    assert len(groups) == 4
+
+
+def test_unknown_stratum_is_rejected(large_bank):
+    with pytest.raises(EnvironmentException):
+        QuestionSampler(large_bank, size=10, strata=("colour",))
+
+
+def test_choice_order_is_a_deterministic_shuffle(large_bank):
+    sampler = QuestionSampler(large_bank, size=10)
+    question = large_bank[0]
+
+    orders = {tuple(sampler.choice_order(attempt_seed(u, 1), question)) for u in range(50)}
+
+    assert all(sorted(order) == [0, 1, 2, 3] for order in orders)
+    assert len(orders) > 1
+    assert sampler.choice_order(attempt_seed(3, 1), question) == sampler.choice_order(
+        attempt_seed(3, 1), question
+    )
@@ -0,0 +1,164 @@
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.handlers import quiz_worker
+
+
+def mock_setenv(monkeypatch):
+    monkeypatch.setenv("TOKEN", "12345")
+    monkeypatch.setenv("TELEGRAM_ADMIN", "12345")
+    monkeypatch.setenv("TELEGRAM_GROUP_ID", "-12345")
+
+
+@pytest.fixture()
+def sqs_event():
+    return {
+        "Records": [
+            {
+                "messageId": "m-1",
+                "body": json.dumps({"update_id": 1, "message": {"text": "hi"}}),
+            },
+        ]
+    }
+
+
+@patch("src.handlers.quiz_worker.QuizService")
+def test_lambda_handler_reuses_quiz_service(mock_quiz_service, monkeypatch, sqs_event):
+    mock_setenv(monkeypatch)
+
+    quiz_worker.lambda_handler(sqs_event, "")
+    quiz_worker.lambda_handler(sqs_event, "")
+
+    mock_quiz_service.assert_called_once()
+    assert mock_quiz_service.return_value.handle_telegram_update.call_count == 2
+
+
+@patch("src.handlers.quiz_worker.QuizService")
+def test_reset_quiz_service_builds_new_instance(mock_quiz_service, monkeypatch, sqs_event):
+    mock_setenv(monkeypatch)
+
+    quiz_worker.lambda_handler(sqs_event, "")
+    quiz_worker.reset_quiz_service()
+    quiz_worker.lambda_handler(sqs_event, "")
+
+    assert mock_quiz_service.call_count == 2
+
+
+def _record(message_id, user_id, text="hi"):
+    body = {
+        "message": {
+            "from": {"id": user_id, "first_name": "John"},
+            "chat": {"id": user_id, "type": "private"},
+            "text": text,
+        }
+    }
+    return {"messageId": message_id, "body": json.dumps(body)}
+
+
+@patch("src.handlers.quiz_worker.QuizService")
+def test_lambda_handler_reports_only_failed_records(mock_quiz_service, monkeypatch):
+    mock_setenv(monkeypatch)
+
+    def handle(body):
+        if body["message"]["from"]["id"] == 2:
+            raise RuntimeError("boom")
+
+    mock_quiz_service.return_value.handle_telegram_update.side_effect = handle
+    event = {"Records": [_record("a", 1), _record("b", 2), _record("c", 3)]}
+
+    ret = quiz_worker.lambda_handler(event, "")
+
+    assert ret == {"batchItemFailures": [{"itemIdentifier": "b"}]}
+    assert mock_quiz_service.return_value.handle_telegram_update.call_count == 3
+
+
+@patch("src.handlers.quiz_worker.QuizService")
+def test_lambda_handler_keeps_per_user_order_after_failure(mock_quiz_service, monkeypatch):
+    mock_setenv(monkeypatch)
+    seen = []
+
+    def handle(body):
+        seen.append(body["message"]["text"])
+        if body["message"]["text"] == "second":
+            raise RuntimeError("boom")
+
+    mock_quiz_service.return_value.handle_telegram_update.side_effect = handle
+    event = {
+        "Records": [
+            _record("a", 1, "first"),
+            _record("b", 1, "second"),
+            _record("c", 1, "third"),
+        ]
+    }
+
+    ret = quiz_worker.lambda_handler(event, "")
+
+    # "third" is held back so the retry replays b then c in order.
+    assert seen == ["first", "second"]
+    assert ret == {
+        "batchItemFailures": [{"itemIdentifier": "b"}, {"itemIdentifier": "c"}]
+    }
+
+
+@patch("src.handlers.quiz_worker.QuizService")
+def test_lambda_handler_uses_fifo_message_group(mock_quiz_service, monkeypatch):
+    mock_setenv(monkeypatch)
+    mock_quiz_service.return_value.handle_telegram_update.side_effect = RuntimeError("boom")
+    first = _record("a", 1)
+    second = _record("b", 2)
+    for record in (first, second):
+        record["attributes"] = {"MessageGroupId": "user-1"}
+
+    ret = quiz_worker.lambda_handler({"Records": [first, second]}, "")
+
+    # Same FIFO group, so the second record is held back behind the first.
+    assert mock_quiz_service.return_value.handle_telegram_update.call_count == 1
+    assert [f["itemIdentifier"] for f in ret["batchItemFailures"]] == ["a", "b"]
+
+
+@patch("src.handlers.quiz_worker.QuizService")
+def test_lambda_handler_skips_unhandled_update_types(mock_quiz_service, monkeypatch):
+    mock_setenv(monkeypatch)
+    member_update = {"messageId": "a", "body": json.dumps({"update_id": 1, "my_chat_member": {}})}
+
+    ret = quiz_worker.lambda_handler({"Records": [member_update]}, "")
+
+    assert ret == {"batchItemFailures": []}
+    mock_quiz_service.return_value.handle_telegram_update.assert_not_called()
+
+
+@patch("src.handlers.quiz_worker.QuizService")
+def test_lambda_handler_reports_undecodable_body(mock_quiz_service, monkeypatch):
+    mock_setenv(monkeypatch)
+    broken = {"messageId": "a", "body": '{"message": '}
+
+    ret = quiz_worker.lambda_handler({"Records": [broken]}, "")
+
+    assert ret == {"batchItemFailures": [{"itemIdentifier": "a"}]}
+
+
+def test_lambda_handler_retries_update_claimed_by_another_worker(monkeypatch):
+    from src.services.quiz_service import QuizService
+    from src.services.storage import InMemoryStorage
+
+    mock_setenv(monkeypatch)
+    storage = InMemoryStorage()
+    now = int(time.time())
+    storage.claim_update(7, now, now + 60, now + 3600)
+    quiz_worker._quiz_service = QuizService(storage=storage)
+    record = _record("a", 1)
+    record["body"] = json.dumps(dict(json.loads(record["body"]), update_id=7))
+
+    with patch.object(quiz_worker._quiz_service.telegram_service, "send_message") as mock_send:
+        # The other worker may still fail, so SQS must keep the message.
+        assert quiz_worker.lambda_handler({"Records": [record]}, "") == {
+            "batchItemFailures": [{"itemIdentifier": "a"}]
+        }
+        storage.complete_update(7, now + 3600)
+        # Once the claim is done the redelivery is dropped as a duplicate.
+        assert quiz_worker.lambda_handler({"Records": [record]}, "") == {"batchItemFailures": []}
+
+    mock_send.assert_not_called()
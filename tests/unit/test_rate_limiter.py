@@ -0,0 +1,168 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+import config
+from errors import EnvironmentException
+from rate_limiter import (
+    DynamoDBRateLimiter,
+    Limit,
+    LocalRateLimiter,
+    NoRateLimiter,
+    create_rate_limiter,
+)
+from src.telegram_service import TelegramService
+from tests.benchmark.fake_dynamodb import FakeTable
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def local_limiter(clock):
+    return LocalRateLimiter(
+        global_limit=Limit(30, 30),
+        chat_limit=Limit(1, 3),
+        group_limit=Limit(20 / 60, 3),
+        clock=clock,
+    )
+
+
+def test_chat_bucket_allows_a_burst_then_one_a_second(local_limiter):
+    delays = [local_limiter.reserve(1) for _ in range(5)]
+
+    assert delays == pytest.approx([0, 0, 0, 1, 2])
+
+
+def test_chat_bucket_refills_over_time(local_limiter, clock):
+    for _ in range(3):
+        local_limiter.reserve(1)
+
+    clock.now += 2
+
+    assert local_limiter.reserve(1) == 0
+    assert local_limiter.reserve(1) == 0
+    assert local_limiter.reserve(1) == pytest.approx(1)
+
+
+def test_chats_are_paced_independently(local_limiter):
+    for _ in range(3):
+        local_limiter.reserve(1)
+
+    assert local_limiter.reserve(2) == 0
+    assert local_limiter.reserve(None) == 0
+
+
+def test_groups_get_twenty_a_minute(local_limiter):
+    delays = [local_limiter.reserve(-100) for _ in range(4)]
+
+    assert delays == pytest.approx([0, 0, 0, 3])
+
+
+def test_global_bucket_spreads_a_burst_over_many_chats(local_limiter):
+    delays = [local_limiter.reserve(chat_id) for chat_id in range(40)]
+
+    assert delays[:30] == [0] * 30
+    assert delays[30:] == pytest.approx([(i + 1) / 30 for i in range(10)])
+
+
+def test_backoff_holds_a_chat_back(local_limiter, clock):
+    local_limiter.backoff(1, 5)
+
+    assert local_limiter.reserve(1) == pytest.approx(5)
+    assert local_limiter.reserve(2) == 0
+
+
+def test_dynamodb_limiter_counts_slots_per_window(clock):
+    table = FakeTable(key_name="LimitKey")
+    limiter = DynamoDBRateLimiter(
+        table, Limit(30, 30), Limit(1, 2), Limit(20 / 60, 3), clock=clock
+    )
+    clock.now = 1000.25
+
+    delays = [limiter.reserve(1) for _ in range(5)]
+
+    # A burst of 2 at 1/s is counted in two-second windows.
+    assert delays == pytest.approx([0, 0, 1.75, 1.75, 3.75])
+    # Another container sharing the table sees the same counters.
+    other = DynamoDBRateLimiter(
+        table, Limit(30, 30), Limit(1, 2), Limit(20 / 60, 3), clock=clock
+    )
+    assert other.reserve(1) == pytest.approx(3.75)
+
+
+def test_dynamodb_limiter_caps_the_wait(clock):
+    limiter = DynamoDBRateLimiter(
+        FakeTable(key_name="LimitKey"),
+        Limit(30, 30),
+        Limit(1, 1),
+        Limit(20 / 60, 3),
+        max_delay=2.0,
+        clock=clock,
+    )
+
+    delays = [limiter.reserve(1) for _ in range(5)]
+
+    assert delays == pytest.approx([0, 1, 2, 2, 2])
+
+
+def test_create_rate_limiter(monkeypatch):
+    assert isinstance(create_rate_limiter(), LocalRateLimiter)
+
+    monkeypatch.setenv("TELEGRAM_RATE_LIMITER", "none")
+    assert isinstance(create_rate_limiter(config.reload_config()), NoRateLimiter)
+
+    monkeypatch.setenv("TELEGRAM_RATE_LIMITER", "redis")
+    with pytest.raises(EnvironmentException):
+        create_rate_limiter(config.reload_config())
+
+
+def test_dynamodb_limiter_uses_the_thread_safe_client(monkeypatch):
+    monkeypatch.setenv("TELEGRAM_RATE_LIMITER", "dynamodb")
+    with patch("boto3.resource") as mock_resource:
+        limiter = create_rate_limiter(config.reload_config())
+
+    assert isinstance(limiter, DynamoDBRateLimiter)
+    mock_resource.return_value.Table.assert_not_called()
+    assert limiter.table.client is mock_resource.return_value.meta.client
+    assert limiter.table.name == "belajarpythonbot2023-rate-limits"
+
+
+@patch('src.telegram_service.time.sleep')
+def test_telegram_service_waits_for_its_slot(mock_sleep):
+    limiter = Mock()
+    limiter.reserve.return_value = 0.5
+    service = TelegramService(rate_limiter=limiter)
+
+    with patch.object(service.session, 'post') as mock_post:
+        mock_post.return_value.status_code = 200
+        service.send_message(42, "a")
+
+    limiter.reserve.assert_called_once_with(42)
+    mock_sleep.assert_called_once_with(0.5)
+    mock_post.assert_called_once()
+
+
+@patch('src.telegram_service.time.sleep')
+def test_telegram_service_backs_off_a_throttled_chat(mock_sleep):
+    throttled = Mock(status_code=429, headers={})
+    throttled.json.return_value = {"ok": False, "parameters": {"retry_after": 3}}
+    ok = Mock(status_code=200, headers={})
+    limiter = Mock()
+    limiter.reserve.return_value = 0.0
+    service = TelegramService(rate_limiter=limiter)
+
+    with patch.object(service.session, 'post', side_effect=[throttled, ok]):
+        service.send_message(42, "a")
+
+    limiter.backoff.assert_called_once_with(42, 3.0)
@@ -1,26 +1,29 @@
+import asyncio
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 
 from src.services.quiz_service import QuizService
+from src.services.storage import DynamoDBStorage
 from src.telegram_service import TelegramService
 
 
 @pytest.fixture
 def quiz_service():
-    with patch('src.services.quiz_service.boto3') as mock_boto3:
+    with patch('boto3.resource') as mock_resource:
         # Mock DynamoDB setup
         mock_dynamodb = MagicMock()
         mock_table = MagicMock()
         mock_dynamodb.Table.return_value = mock_table
-        mock_boto3.resource.return_value = mock_dynamodb
+        mock_resource.return_value = mock_dynamodb
         
-        with patch('src.telegram_service.os.getenv') as mock_getenv:
+        with patch('src.config.os.getenv') as mock_getenv:
             mock_getenv.side_effect = lambda key, default=None: {
                 'TOKEN': 'test_token',
                 'TELEGRAM_ADMIN': '12345,67890'
             }.get(key, default)
             
-            return QuizService()
+            # Every table is the same mock, as when boto3 built one per name.
+            return QuizService(storage=DynamoDBStorage(mock_table, mock_table, mock_table))
 
 
 @pytest.fixture
@@ -139,7 +142,7 @@ def test_build_reply_markup():
     assert "0#Option B" in data
 
 
-@patch('src.telegram_service.requests.post')
+@patch('src.telegram_service.requests.Session.post')
 def test_telegram_service_send_message(mock_post):
     mock_response = Mock()
     mock_response.json.return_value = {"ok": True}
@@ -147,7 +150,7 @@ def test_telegram_service_send_message(mock_post):
     
     service = TelegramService()
     
-    with patch('src.telegram_service.os.getenv') as mock_getenv:
+    with patch('src.config.os.getenv') as mock_getenv:
         mock_getenv.return_value = 'test_token'
         service.send_message(12345, "Hello")
     
@@ -156,6 +159,51 @@ def test_telegram_service_send_message(mock_post):
     assert "sendMessage" in args[0]
     assert kwargs["json"]["chat_id"] == 12345
     assert kwargs["json"]["text"] == "Hello"
+    assert kwargs["timeout"] == service.timeout
+
+
+def test_telegram_service_reuses_session():
+    service = TelegramService(pool_size=4)
+
+    adapter = service.session.get_adapter("https://api.telegram.org")
+    assert adapter._pool_maxsize == 4
+
+    with patch.object(service.session, 'post') as mock_post:
+        mock_post.return_value.status_code = 200
+        service.send_message(1, "a")
+        service.edit_message(1, 2, "b")
+
+    assert mock_post.call_count == 2
+
+
+@patch('src.telegram_service.time.sleep')
+def test_telegram_service_retries_with_retry_after(mock_sleep):
+    throttled = Mock(status_code=429, headers={})
+    throttled.json.return_value = {"ok": False, "parameters": {"retry_after": 2}}
+    ok = Mock(status_code=200, headers={})
+    ok.json.return_value = {"ok": True}
+
+    service = TelegramService(max_retries=3)
+    with patch.object(service.session, 'post', side_effect=[throttled, ok]) as mock_post:
+        response = service.send_message(1, "a")
+
+    assert response is ok
+    assert mock_post.call_count == 2
+    mock_sleep.assert_called_once_with(2.0)
+
+
+@patch('src.telegram_service.time.sleep')
+def test_telegram_service_gives_up_after_max_retries(mock_sleep):
+    failing = Mock(status_code=502, headers={})
+    failing.json.return_value = {"ok": False}
+
+    service = TelegramService(max_retries=2, backoff_factor=0.1)
+    with patch.object(service.session, 'post', return_value=failing) as mock_post:
+        response = service.send_message(1, "a")
+
+    assert response is failing
+    assert mock_post.call_count == 3
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [0.1, 0.2]
 
 
 def test_quiz_service_handle_start_command(quiz_service, telegram_update_start):
@@ -175,6 +223,8 @@ def test_quiz_service_handle_start_command(quiz_service, telegram_update_start):
 
 
 def test_quiz_service_handle_callback_query(quiz_service, telegram_update_callback):
+    # The fixture's "0#4" is an unsigned legacy callback.
+    quiz_service.legacy_callbacks = True
     with patch.object(quiz_service.telegram_service, 'send_message') as mock_send, \
          patch.object(quiz_service.telegram_service, 'edit_message') as mock_edit, \
          patch.object(quiz_service, '_save_quiz_result') as mock_save:
@@ -190,6 +240,21 @@ def test_quiz_service_handle_callback_query(quiz_service, telegram_update_callba
         assert save_args[1] == 0      # question_index
 
 
+def test_quiz_service_drops_legacy_callbacks_by_default(quiz_service, telegram_update_callback):
+    assert quiz_service.legacy_callbacks is False
+
+    with patch.object(quiz_service.telegram_service, 'send_message') as mock_send, \
+         patch.object(quiz_service.telegram_service, 'edit_message') as mock_edit, \
+         patch.object(quiz_service, '_save_quiz_result') as mock_save:
+        for index in range(len(quiz_service.quiz_bank)):
+            telegram_update_callback["callback_query"]["data"] = f"{index}#4"
+            quiz_service.handle_telegram_update(telegram_update_callback)
+
+    mock_save.assert_not_called()
+    mock_edit.assert_not_called()
+    mock_send.assert_not_called()
+
+
 def test_quiz_service_handle_text_message(quiz_service):
     text_update = {
         "message": {
@@ -232,4 +297,544 @@ def test_quiz_service_allows_channel_messages_by_default(quiz_service):
         quiz_service.handle_telegram_update(channel_update)
         mock_send.assert_called_once_with(
             chat_id=-1001234567890, text="Send /start to begin the quiz."
-        )
\ No newline at end of file
+        )
+
+def test_async_telegram_service_notify_admins_sends_to_each_admin():
+    from src.telegram_service import AsyncTelegramService
+
+    service = TelegramService()
+    service.admin_ids = [1, 2]
+    async_service = AsyncTelegramService(service)
+
+    with patch.object(service, 'send_message') as mock_send:
+        asyncio.run(async_service.notify_admins("hi"))
+
+    assert sorted(c.kwargs["chat_id"] for c in mock_send.call_args_list) == [1, 2]
+
+
+def test_quiz_service_async_handle_start_command(quiz_service, telegram_update_start):
+    with patch.object(quiz_service.telegram_service, 'send_message') as mock_send:
+        asyncio.run(quiz_service.handle_telegram_update_async(telegram_update_start))
+
+    texts = [c.kwargs["text"] for c in mock_send.call_args_list]
+    user_texts = [text for text in texts if "started the quiz" not in text]
+    assert any("started the quiz" in text for text in texts)
+    # Greeting must still arrive before the first question.
+    assert user_texts[0].startswith("Hello")
+    assert user_texts[1] == quiz_service.quiz_bank[0].text
+
+
+def test_quiz_service_async_handle_callback_query(quiz_service, telegram_update_callback):
+    # The fixture's "0#4" is an unsigned legacy callback.
+    quiz_service.legacy_callbacks = True
+    with patch.object(quiz_service.telegram_service, 'send_message') as mock_send, \
+         patch.object(quiz_service.telegram_service, 'edit_message') as mock_edit, \
+         patch.object(quiz_service, '_save_quiz_result') as mock_save:
+
+        asyncio.run(quiz_service.handle_telegram_update_async(telegram_update_callback))
+
+    mock_save.assert_called_once_with(12345, 0, False)
+    mock_edit.assert_called_once()
+    assert mock_send.call_args.kwargs["text"] == quiz_service.quiz_bank[1].text
+
+
+def test_add_or_get_user_returns_existing_user_with_one_read(quiz_service):
+    quiz_service.storage.table.get_item.return_value = {"Item": {"UserID": 1, "first_name": "A"}}
+
+    user = quiz_service._add_or_get_user(1, "A", "a")
+
+    assert user == {"UserID": 1, "first_name": "A"}
+    quiz_service.storage.table.update_item.assert_not_called()
+    quiz_service.storage.table.put_item.assert_not_called()
+
+
+def test_add_or_get_user_creates_user_with_conditional_upsert(quiz_service):
+    quiz_service.storage.table.get_item.return_value = {}
+    quiz_service.storage.table.update_item.return_value = {
+        "Attributes": {"UserID": 1, "first_name": "A", "username": "a", "question": {}}
+    }
+
+    user = quiz_service._add_or_get_user(1, "A", "a")
+
+    assert user["first_name"] == "A"
+    assert quiz_service.storage.table.get_item.call_count == 1
+    kwargs = quiz_service.storage.table.update_item.call_args.kwargs
+    assert "if_not_exists(#question, :question)" in kwargs["UpdateExpression"]
+    assert kwargs["ReturnValues"] == "ALL_NEW"
+    quiz_service.storage.table.put_item.assert_not_called()
+
+
+def _conditional_check_failed():
+    from botocore.exceptions import ClientError
+
+    return ClientError(
+        {"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem"
+    )
+
+
+def test_save_quiz_result_increments_counter_for_correct_answer(quiz_service):
+    quiz_service.storage.table.update_item.return_value = {
+        "Attributes": {"question": {"Q0": "correct"}, "correct_count": 3}
+    }
+
+    assert quiz_service._save_quiz_result(1, 0, True) == 3
+
+    kwargs = quiz_service.storage.table.update_item.call_args.kwargs
+    assert "ADD #correct_count :delta" in kwargs["UpdateExpression"]
+    assert kwargs["ExpressionAttributeValues"][":delta"] == 1
+    assert kwargs["ReturnValues"] == "ALL_NEW"
+    quiz_service.storage.table.get_item.assert_not_called()
+
+
+def test_save_quiz_result_decrements_when_correct_answer_becomes_wrong(quiz_service):
+    quiz_service.storage.table.update_item.side_effect = [
+        _conditional_check_failed(),
+        {"Attributes": {"question": {"Q0": "wrong"}, "correct_count": 1}},
+    ]
+
+    assert quiz_service._save_quiz_result(1, 0, False) == 1
+
+    first, second = quiz_service.storage.table.update_item.call_args_list
+    assert "ADD" not in first.kwargs["UpdateExpression"]
+    assert second.kwargs["ExpressionAttributeValues"][":delta"] == -1
+
+
+def test_save_quiz_result_backfills_counter_for_legacy_user(quiz_service):
+    quiz_service.storage.table.update_item.side_effect = [
+        _conditional_check_failed(),
+        {"Attributes": {"question": {"Q0": "correct", "Q1": "correct"}}},
+        {},
+    ]
+
+    assert quiz_service._save_quiz_result(1, 1, True) == 2
+
+    backfill = quiz_service.storage.table.update_item.call_args_list[-1]
+    assert backfill.kwargs["ExpressionAttributeValues"] == {":count": 2}
+
+
+def test_get_group_link_serves_from_container_cache(quiz_service):
+    from datetime import datetime
+
+    now = round(datetime.now().timestamp())
+    quiz_service.storage.table.get_item.return_value = {
+        "Item": {"UserID": -9999, "expiry": now, "group_link": "https://t.me/+abc"}
+    }
+
+    assert quiz_service._get_group_link() == "https://t.me/+abc"
+    assert quiz_service._get_group_link() == "https://t.me/+abc"
+
+    quiz_service.storage.table.get_item.assert_called_once()
+
+
+def test_get_group_link_regenerates_when_lease_acquired(quiz_service, monkeypatch):
+    monkeypatch.setenv("GROUP_LINK_TTL_SECONDS", "60")
+    quiz_service.storage.table.get_item.return_value = {
+        "Item": {"UserID": -9999, "expiry": 0, "group_link": "https://t.me/+old"}
+    }
+
+    with patch.object(
+        quiz_service.telegram_service, 'get_new_group_link', return_value="https://t.me/+new"
+    ):
+        assert quiz_service._get_group_link() == "https://t.me/+new"
+
+    lease = quiz_service.storage.table.update_item.call_args.kwargs
+    assert "lease_until" in lease["ExpressionAttributeNames"].values()
+    assert quiz_service.storage.table.put_item.call_args.kwargs["Item"]["group_link"] == "https://t.me/+new"
+
+
+def test_get_group_link_serves_old_link_while_another_worker_regenerates(quiz_service):
+    quiz_service.storage.table.get_item.return_value = {
+        "Item": {"UserID": -9999, "expiry": 0, "group_link": "https://t.me/+old"}
+    }
+    quiz_service.storage.table.update_item.side_effect = _conditional_check_failed()
+
+    with patch.object(quiz_service.telegram_service, 'get_new_group_link') as mock_new:
+        assert quiz_service._get_group_link() == "https://t.me/+old"
+
+    mock_new.assert_not_called()
+    quiz_service.storage.table.put_item.assert_not_called()
+
+
+def test_encode_decode_callback_data_roundtrip():
+    from src.utils import decode_callback_data, encode_callback_data
+
+    data = encode_callback_data(3, 2, 0xBEEF, secret=b"secret")
+
+    assert len(data) == 16
+    assert "#" not in data
+    assert tuple(decode_callback_data(data, b"secret")) == (3, 2, 0xBEEF)
+    assert decode_callback_data(data[:-1] + ("A" if data[-1] != "A" else "B"), b"secret") is None
+    assert decode_callback_data("0#Option A", b"secret") is None
+
+
+def _compact_callback_update(quiz_service, question_index, choice_index, quiz_version=None):
+    from src.utils import encode_callback_data
+
+    return {
+        "callback_query": {
+            "id": "1",
+            "from": {"id": 12345, "first_name": "John"},
+            "message": {"message_id": 1, "text": "Q", "chat": {"id": 12345, "type": "private"}},
+            "data": encode_callback_data(
+                question_index,
+                choice_index,
+                quiz_service.quiz_bank.version if quiz_version is None else quiz_version,
+                quiz_service.callback_secret,
+            ),
+        }
+    }
+
+
+def test_quiz_service_accepts_compact_callback(quiz_service):
+    question = quiz_service.quiz_bank[0]
+    update = _compact_callback_update(quiz_service, 0, question.answer_index)
+
+    with patch.object(quiz_service.telegram_service, 'send_message'), \
+         patch.object(quiz_service.telegram_service, 'edit_message'), \
+         patch.object(quiz_service, '_save_quiz_result') as mock_save:
+        quiz_service.handle_telegram_update(update)
+
+    mock_save.assert_called_once_with(12345, 0, True)
+
+
+def test_quiz_service_rejects_stale_or_forged_callback(quiz_service):
+    stale = _compact_callback_update(quiz_service, 0, 0, (quiz_service.quiz_bank.version + 1) & 0xFFFF)
+    forged = _compact_callback_update(quiz_service, 0, 0)
+    forged["callback_query"]["data"] = forged["callback_query"]["data"][:8] + "AAAAAAAA"
+
+    with patch.object(quiz_service.telegram_service, 'send_message') as mock_send, \
+         patch.object(quiz_service, '_save_quiz_result') as mock_save:
+        quiz_service.handle_telegram_update(stale)
+        quiz_service.handle_telegram_update(forged)
+
+    mock_save.assert_not_called()
+    mock_send.assert_not_called()
+
+
+def _press(reply_markup, choice_index, user_id=12345):
+    import json
+
+    buttons = [button for row in json.loads(reply_markup)["inline_keyboard"] for button in row]
+    return {
+        "callback_query": {
+            "id": "1",
+            "from": {"id": user_id, "first_name": "John"},
+            "message": {"message_id": 1, "text": "Q", "chat": {"id": user_id, "type": "private"}},
+            "data": buttons[choice_index]["callback_data"],
+        }
+    }
+
+
+@pytest.fixture
+def attempt_service(monkeypatch):
+    from src.services.storage import InMemoryStorage
+
+    monkeypatch.setenv("TOKEN", "test_token")
+    return QuizService(storage=InMemoryStorage())
+
+
+@pytest.fixture
+def write_behind_service(monkeypatch):
+    from src.services.storage import InMemoryStorage
+
+    monkeypatch.setenv("TOKEN", "test_token")
+    monkeypatch.setenv("QUIZ_WRITE_BEHIND", "true")
+    return QuizService(storage=InMemoryStorage())
+
+
+def _play(service, start_update, choose):
+    """Run /start and answer every question with choose(question)."""
+    with patch.object(service.telegram_service, 'send_message') as mock_send, \
+         patch.object(service.telegram_service, 'edit_message'), \
+         patch.object(service.telegram_service, 'notify_admins'), \
+         patch.object(service.telegram_service, 'get_new_group_link', return_value="https://t.me/+x"):
+        service.handle_telegram_update(start_update)
+        for question in service.quiz_bank:
+            reply_markup = mock_send.call_args_list[-1].kwargs["reply_markup"]
+            assert reply_markup != question.reply_markup_json
+            service.handle_telegram_update(_press(reply_markup, choose(question)))
+    return [call.kwargs["text"] for call in mock_send.call_args_list]
+
+
+def _wrong(question):
+    return (question.answer_index + 1) % len(question.choices)
+
+
+def test_each_start_scores_a_separate_attempt(attempt_service, telegram_update_start):
+    import copy
+
+    service = attempt_service
+    bank = service.quiz_bank
+    retry = copy.deepcopy(telegram_update_start)
+    retry["message"]["date"] += 60
+
+    _play(service, telegram_update_start, lambda question: question.answer_index)
+    texts = _play(service, retry, _wrong)
+
+    first = service.storage.get_attempt(12345, telegram_update_start["message"]["date"])
+    second = service.storage.get_attempt(12345, retry["message"]["date"])
+    assert first.score == len(bank)
+    assert second.score == 0
+    assert second.answers == {question.index: False for question in bank}
+    assert "You have answered 0 questions correctly" in texts
+    # Answers no longer accumulate on the user item.
+    assert service.storage.get_correct_count(12345) == 0
+
+
+def test_attempt_answers_are_saved_as_they_arrive(attempt_service, telegram_update_start):
+    service = attempt_service
+
+    with patch.object(service.storage, 'save_attempt_answer', wraps=service.storage.save_attempt_answer) as mock_save, \
+         patch.object(service.storage, 'save_answer') as mock_legacy_save:
+        _play(service, telegram_update_start, lambda question: question.answer_index)
+
+    assert mock_save.call_count == len(service.quiz_bank)
+    mock_legacy_save.assert_not_called()
+
+
+def test_write_behind_quiz_is_saved_in_one_write(write_behind_service, telegram_update_start):
+    service = write_behind_service
+    bank = service.quiz_bank
+    assert service.write_behind is True
+
+    # The last question is answered wrongly.
+    def choose(question):
+        return question.answer_index if question.index < len(bank) - 1 else _wrong(question)
+
+    with patch.object(service.storage, 'save_attempt_answer') as mock_save_answer, \
+         patch.object(service.storage, 'save_attempt', wraps=service.storage.save_attempt) as mock_save_attempt:
+        texts = _play(service, telegram_update_start, choose)
+
+    mock_save_answer.assert_not_called()
+    mock_save_attempt.assert_called_once()
+    attempt = service.storage.get_attempt(12345, telegram_update_start["message"]["date"])
+    assert attempt.score == len(bank) - 1
+    assert attempt.answers[len(bank) - 1] is False
+    assert f"You have answered {len(bank) - 1} questions correctly" in texts
+
+
+def test_write_behind_async_matches_sync(write_behind_service, telegram_update_start):
+    service = write_behind_service
+
+    with patch.object(service.telegram_service, 'send_message') as mock_send, \
+         patch.object(service.telegram_service, 'edit_message'), \
+         patch.object(service.telegram_service, 'notify_admins'), \
+         patch.object(service.telegram_service, 'get_new_group_link', return_value="https://t.me/+x"):
+        asyncio.run(service.handle_telegram_update_async(telegram_update_start))
+        for question in service.quiz_bank:
+            reply_markup = mock_send.call_args_list[-1].kwargs["reply_markup"]
+            asyncio.run(
+                service.handle_telegram_update_async(_press(reply_markup, question.answer_index))
+            )
+
+    attempt = service.storage.get_attempt(12345, telegram_update_start["message"]["date"])
+    assert attempt.score == len(service.quiz_bank)
+
+
+def test_attempt_keyboard_only_works_for_its_user(attempt_service, telegram_update_start):
+    service = attempt_service
+
+    with patch.object(service.telegram_service, 'send_message') as mock_send, \
+         patch.object(service.telegram_service, 'notify_admins'):
+        service.handle_telegram_update(telegram_update_start)
+        reply_markup = mock_send.call_args_list[-1].kwargs["reply_markup"]
+        mock_send.reset_mock()
+
+        service.handle_telegram_update(_press(reply_markup, 0, user_id=999))
+
+    mock_send.assert_not_called()
+
+
+def test_write_behind_needs_a_signing_key(monkeypatch):
+    from src.services.storage import InMemoryStorage
+
+    monkeypatch.setenv("QUIZ_WRITE_BEHIND", "true")
+
+    assert QuizService(storage=InMemoryStorage()).write_behind is False
+
+
+@pytest.mark.parametrize("write_behind", ["false", "true"])
+def test_sampled_attempt_asks_its_own_questions(monkeypatch, telegram_update_start, write_behind):
+    import json
+    from src.services.storage import InMemoryStorage
+
+    monkeypatch.setenv("TOKEN", "test_token")
+    monkeypatch.setenv("QUIZ_SAMPLE_SIZE", "2")
+    monkeypatch.setenv("QUIZ_WRITE_BEHIND", write_behind)
+    service = QuizService(storage=InMemoryStorage())
+    by_text = {question.text: question for question in service.quiz_bank}
+
+    with patch.object(service.telegram_service, 'send_message') as mock_send, \
+         patch.object(service.telegram_service, 'edit_message'), \
+         patch.object(service.telegram_service, 'notify_admins'), \
+         patch.object(service.telegram_service, 'get_new_group_link', return_value="https://t.me/+x"):
+        service.handle_telegram_update(telegram_update_start)
+        asked = []
+        for _ in range(2):
+            sent = mock_send.call_args_list[-1].kwargs
+            question = by_text[sent["text"]]
+            asked.append(question.index)
+            buttons = [b for row in json.loads(sent["reply_markup"])["inline_keyboard"] for b in row]
+            assert sorted(b["text"] for b in buttons) == sorted(question.choices)
+            texts = [b["text"] for b in buttons]
+            service.handle_telegram_update(
+                _press(sent["reply_markup"], texts.index(question.answer))
+            )
+
+    texts = [call.kwargs["text"] for call in mock_send.call_args_list]
+    assert len(set(asked)) == 2
+    assert "You have answered 2 questions correctly" in texts
+    assert any(text.startswith("Congratulations") for text in texts)
+    attempt = service.storage.get_attempt(12345, telegram_update_start["message"]["date"])
+    assert attempt.answers == {index: True for index in asked}
+
+
+def test_redelivered_update_is_handled_once(attempt_service, telegram_update_start):
+    from src.services.quiz_service import QuizService as OtherContainer
+
+    telegram_update_start["update_id"] = 1001
+    other = OtherContainer(storage=attempt_service.storage)
+
+    with patch.object(attempt_service.telegram_service, 'send_message') as mock_send, \
+         patch.object(attempt_service.telegram_service, 'notify_admins') as mock_notify, \
+         patch.object(attempt_service.storage, 'claim_update', wraps=attempt_service.storage.claim_update) as mock_claim, \
+         patch.object(other.telegram_service, 'send_message') as other_send:
+        attempt_service.handle_telegram_update(telegram_update_start)
+        # Same container: dropped by the LRU without a storage call.
+        attempt_service.handle_telegram_update(telegram_update_start)
+        # Another container: dropped by the claim in storage.
+        other.handle_telegram_update(telegram_update_start)
+
+    assert mock_send.call_count == 2
+    mock_notify.assert_called_once()
+    assert mock_claim.call_count == 2
+    other_send.assert_not_called()
+
+
+def test_failed_update_can_be_retried(attempt_service, telegram_update_start):
+    telegram_update_start["update_id"] = 1002
+
+    with patch.object(attempt_service.telegram_service, 'send_message', side_effect=[RuntimeError("boom"), None, None]) as mock_send, \
+         patch.object(attempt_service.telegram_service, 'notify_admins'):
+        with pytest.raises(RuntimeError):
+            attempt_service.handle_telegram_update(telegram_update_start)
+        attempt_service.handle_telegram_update(telegram_update_start)
+
+    assert mock_send.call_count == 3
+
+
+def test_claim_bookkeeping_errors_do_not_fail_the_update(attempt_service, telegram_update_start):
+    storage = attempt_service.storage
+    telegram_update_start["update_id"] = 1004
+
+    with patch.object(attempt_service.telegram_service, 'send_message'), \
+         patch.object(attempt_service.telegram_service, 'notify_admins'), \
+         patch.object(storage, 'complete_update', side_effect=RuntimeError("throttled")):
+        # Handled; a redelivery is still dropped by this container.
+        attempt_service.handle_telegram_update(telegram_update_start)
+        assert attempt_service.deduplicator._seen(1004)
+
+    telegram_update_start["update_id"] = 1005
+    with patch.object(attempt_service.telegram_service, 'send_message', side_effect=ValueError("boom")), \
+         patch.object(storage, 'release_update', side_effect=RuntimeError("throttled")):
+        # The handler's error surfaces, not the failed release.
+        with pytest.raises(ValueError):
+            attempt_service.handle_telegram_update(telegram_update_start)
+
+
+def test_idempotency_can_be_disabled(monkeypatch, telegram_update_start):
+    from src.services.storage import InMemoryStorage
+
+    monkeypatch.setenv("QUIZ_IDEMPOTENCY", "false")
+    service = QuizService(storage=InMemoryStorage())
+    telegram_update_start["update_id"] = 1003
+
+    with patch.object(service.telegram_service, 'send_message') as mock_send, \
+         patch.object(service.telegram_service, 'notify_admins'):
+        service.handle_telegram_update(telegram_update_start)
+        service.handle_telegram_update(telegram_update_start)
+
+    assert service.deduplicator is None
+    assert mock_send.call_count == 4
+
+
+def test_session_callback_data_roundtrip():
+    from src.utils import (
+        SessionCallbackData,
+        decode_session_callback_data,
+        encode_session_callback_data,
+    )
+
+    payload = SessionCallbackData(1700000000, 3, 1, 0xBEEF, 0b101, True)
+    data = encode_session_callback_data(payload, user_id=7, secret=b"secret")
+
+    assert len(data) <= 64
+    assert decode_session_callback_data(data, 7, b"secret") == payload
+    assert decode_session_callback_data(data, 8, b"secret") is None
+    assert decode_session_callback_data(data, 7, b"other") is None
+    assert decode_session_callback_data(data, 7, None) is None
+
+
+def test_may_need_handling_prefilters_raw_bodies():
+    from src.telegram_update import may_need_handling
+
+    assert may_need_handling('{"update_id":1,"message":{"text":"hi"}}') is True
+    assert may_need_handling('{"update_id":1,"callback_query":{}}') is True
+    assert may_need_handling('{"update_id":1,"edited_message":{"text":"hi"}}') is False
+    assert may_need_handling('{"update_id":1,"chat_member":{}}') is False
+
+
+def test_classify_update_returns_lazy_views(telegram_update_callback):
+    from src.utils import classify_update
+
+    kind, callback_query = classify_update(telegram_update_callback)
+
+    assert kind == "callback"
+    assert callback_query.data == "0#4"
+    assert callback_query["chat_id"] == 12345
+    assert callback_query.get("message_text") == "What is 2+2?"
+    assert callback_query.get("unknown") is None
+
+
+def test_admin_digest_gathers_starts_and_completions(monkeypatch, telegram_update_start):
+    from src.services.storage import InMemoryStorage
+
+    monkeypatch.setenv("TOKEN", "test_token")
+    monkeypatch.setenv("ADMIN_NOTIFICATIONS", "digest")
+    service = QuizService(storage=InMemoryStorage())
+
+    with patch.object(service.telegram_service, 'notify_admins') as mock_notify:
+        _play(service, telegram_update_start, lambda question: question.answer_index)
+        mock_notify.assert_not_called()
+        assert service.admin_notifier.flush() == 2
+
+    total = len(service.quiz_bank)
+    mock_notify.assert_called_once_with(
+        "Quiz activity: 2 events\n"
+        "- John Doe - JohnDoe started the quiz\n"
+        f"- John finished the quiz with {total}/{total} correct"
+    )
+
+
+def test_session_keyboard_is_signed_once_and_accepts_v2_buttons():
+    import base64
+    import json
+    from src import utils
+
+    session = utils.SessionCallbackData(1700000000, 2, 0, 7, 0b11, True)
+    choices = ("print()", "echo", "x", "printf")
+
+    with patch.object(utils, '_session_mac', wraps=utils._session_mac) as mock_mac:
+        markup = utils.build_session_reply_markup_json(choices, session, 5, b"secret", order=[2, 0, 3, 1])
+    mock_mac.assert_called_once()
+
+    buttons = [button for row in json.loads(markup)["inline_keyboard"] for button in row]
+    assert [button["text"] for button in buttons] == ["x", "print()", "printf", "echo"]
+    decoded = [utils.decode_session_callback_data(b["callback_data"], 5, b"secret") for b in buttons]
+    assert [d.choice_index for d in decoded] == [2, 0, 3, 1]
+    assert all(d._replace(choice_index=0) == session for d in decoded)
+
+    # Keyboards sent before v3 were signed per button.
+    packed = utils._SESSION_STRUCT.pack(2, 1, 1700000000, 2, 3, 7, 0b11)
+    legacy = base64.urlsafe_b64encode(packed + utils._session_mac(packed, 5, b"secret")).decode()
+    assert utils.decode_session_callback_data(legacy, 5, b"secret") == session._replace(choice_index=3)
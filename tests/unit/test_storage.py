@@ -0,0 +1,200 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+import config
+from errors import EnvironmentException, UpdateInProgressException
+from services.storage import (
+    Attempt,
+    GROUP_LINK_USER_ID,
+    DynamoDBStorage,
+    GroupLink,
+    InMemoryStorage,
+    SQLiteStorage,
+    create_storage,
+)
+from tests.benchmark.fake_dynamodb import FakeTable
+
+
+@pytest.fixture(params=["memory", "sqlite", "dynamodb"])
+def storage(request, tmp_path):
+    if request.param == "memory":
+        yield InMemoryStorage()
+        return
+    if request.param == "dynamodb":
+        # The benchmark's in-memory table evaluates the real update expressions.
+        yield DynamoDBStorage(
+            FakeTable(),
+            FakeTable(range_key_name="AttemptID"),
+            FakeTable(key_name="UpdateID"),
+        )
+        return
+    backend = SQLiteStorage(str(tmp_path / "quiz.sqlite3"))
+    yield backend
+    backend.close()
+
+
+def test_add_or_get_user_keeps_the_first_registration(storage):
+    user = storage.add_or_get_user(1, "A", "a")
+    assert user["first_name"] == "A"
+    assert user["correct_count"] == 0
+
+    storage.save_answer(1, 0, True)
+    again = storage.add_or_get_user(1, "B", "b")
+
+    assert again["first_name"] == "A"
+    assert again["question"] == {"Q0": "correct"}
+
+
+def test_save_answer_only_counts_flips_between_correct_and_wrong(storage):
+    storage.add_or_get_user(1, "A")
+
+    assert storage.save_answer(1, 0, True) == 1
+    assert storage.save_answer(1, 0, True) == 1
+    assert storage.save_answer(1, 1, True) == 2
+    assert storage.save_answer(1, 0, False) == 1
+    assert storage.save_answer(1, 0, False) == 1
+    assert storage.get_correct_count(1) == 1
+    assert storage.get_correct_count(2) == 0
+
+
+def test_attempt_score_only_counts_flips_between_correct_and_wrong(storage):
+    expires_at = int(time.time()) + 60
+
+    assert storage.save_attempt_answer(1, 100, 0, True, expires_at) == 1
+    assert storage.save_attempt_answer(1, 100, 0, True, expires_at) == 1
+    assert storage.save_attempt_answer(1, 100, 1, False, expires_at) == 1
+    assert storage.save_attempt_answer(1, 100, 0, False, expires_at) == 0
+    # Another attempt starts from scratch.
+    assert storage.save_attempt_answer(1, 200, 0, True, expires_at) == 1
+
+    attempt = storage.get_attempt(1, 100)
+    assert attempt == Attempt(100, 100, {0: False, 1: False}, 0, expires_at)
+
+
+def test_save_attempt_writes_the_whole_attempt(storage):
+    expires_at = int(time.time()) + 60
+
+    assert storage.save_attempt(1, 100, {0: True, 1: False, 2: True}, expires_at) == 2
+    assert storage.save_attempt(1, 100, {0: True, 1: False, 2: True}, expires_at) == 2
+
+    assert storage.get_attempt(1, 100).answers == {0: True, 1: False, 2: True}
+    assert storage.get_attempt(1, 101) is None
+
+
+def test_expired_attempts_are_not_returned(storage):
+    storage.save_attempt(1, 100, {0: True}, int(time.time()) - 1)
+
+    assert storage.get_attempt(1, 100) is None
+
+
+def test_update_claims(storage):
+    now = int(time.time())
+
+    assert storage.claim_update(1, now, now + 60, now + 3600) is True
+    # Claimed by a worker still inside its lease: retried later, not dropped.
+    with pytest.raises(UpdateInProgressException):
+        storage.claim_update(1, now, now + 60, now + 3600)
+    storage.complete_update(1, now + 3600)
+    # Done, even after the lease.
+    assert storage.claim_update(1, now + 120, now + 180, now + 3600) is False
+
+    assert storage.claim_update(2, now, now + 60, now + 3600) is True
+    storage.release_update(2)
+    assert storage.claim_update(2, now, now + 60, now + 3600) is True
+
+
+def test_update_claim_of_a_crashed_worker_lapses(storage):
+    now = int(time.time())
+    storage.claim_update(1, now, now + 60, now + 3600)
+
+    assert storage.claim_update(1, now + 61, now + 121, now + 3600) is True
+
+
+def test_save_answer_is_exact_under_concurrency(storage):
+    storage.add_or_get_user(1, "A")
+    threads = [
+        threading.Thread(target=storage.save_answer, args=(1, question, True))
+        for question in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert storage.get_correct_count(1) == 20
+
+
+def test_group_link_lease_is_granted_once_until_saved(storage):
+    assert storage.get_group_link() is None
+
+    assert storage.acquire_group_link_lease(now=100, lease_until=110) is True
+    assert storage.acquire_group_link_lease(now=105, lease_until=115) is False
+    assert storage.acquire_group_link_lease(now=111, lease_until=121) is True
+
+    storage.save_group_link("https://t.me/+abc", 112)
+
+    assert storage.get_group_link() == GroupLink("https://t.me/+abc", 112)
+    assert storage.acquire_group_link_lease(now=113, lease_until=123) is True
+
+
+def test_sqlite_storage_persists_across_connections(tmp_path):
+    path = str(tmp_path / "quiz.sqlite3")
+    first = SQLiteStorage(path)
+    first.add_or_get_user(1, "A")
+    first.save_answer(1, 0, True)
+    first.close()
+
+    assert SQLiteStorage(path).get_correct_count(1) == 1
+
+
+def test_create_storage_is_selected_by_config(monkeypatch, tmp_path):
+    monkeypatch.setenv("QUIZ_STORAGE", "memory")
+    assert isinstance(create_storage(config.reload_config()), InMemoryStorage)
+
+    monkeypatch.setenv("QUIZ_STORAGE", "SQLite")
+    monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "quiz.sqlite3"))
+    assert isinstance(create_storage(config.reload_config()), SQLiteStorage)
+
+    monkeypatch.setenv("QUIZ_STORAGE", "redis")
+    with pytest.raises(EnvironmentException):
+        create_storage(config.reload_config())
+
+
+def test_dynamodb_storage_uses_configured_table(monkeypatch):
+    monkeypatch.setenv("DYNAMODB_TABLE", "quiz-dev")
+    with patch("boto3.resource") as mock_resource:
+        storage = create_storage(config.reload_config())
+
+    assert isinstance(storage, DynamoDBStorage)
+    mock_resource.assert_called_once_with("dynamodb", region_name="ap-southeast-1")
+    assert storage.table.name == "quiz-dev"
+    assert storage.attempts_table.name == "belajarpythonbot2023-attempts"
+
+
+def test_dynamodb_tables_share_the_thread_safe_client():
+    with patch("boto3.resource") as mock_resource:
+        storage = create_storage(config.reload_config())
+    client = mock_resource.return_value.meta.client
+
+    storage.get_group_link()
+
+    # Resource objects are not thread-safe, so none are built per table.
+    mock_resource.return_value.Table.assert_not_called()
+    assert {storage.table.client, storage.attempts_table.client, storage.updates_table.client} == {client}
+    client.get_item.assert_called_once_with(
+        TableName="belajarpythonbot2023", Key={"UserID": GROUP_LINK_USER_ID}
+    )
+
+
+def test_admin_events_are_buffered_until_taken(storage):
+    assert storage.take_admin_events() == []
+
+    assert storage.add_admin_event("A started the quiz", 100) == (1, 100)
+    assert storage.add_admin_event("B started the quiz", 105) == (2, 100)
+
+    assert storage.take_admin_events() == ["A started the quiz", "B started the quiz"]
+    assert storage.take_admin_events() == []
+    assert storage.add_admin_event("C started the quiz", 110) == (1, 110)
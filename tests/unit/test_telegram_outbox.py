@@ -0,0 +1,184 @@
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+import config
+from errors import EnvironmentException
+from services.storage import InMemoryStorage
+from src.handlers import telegram_sender
+from src.services.quiz_service import QuizService
+from telegram_outbox import InMemoryOutbox, QueuedTelegramService, create_outbox
+
+
+@pytest.fixture
+def outbox():
+    return InMemoryOutbox()
+
+
+@pytest.fixture
+def queued_service(monkeypatch, outbox):
+    monkeypatch.setenv("TELEGRAM_ADMIN", "1")
+    with patch("telegram_outbox.create_outbox", return_value=outbox):
+        service = QuizService(storage=InMemoryStorage())
+    assert isinstance(service.telegram_service, QueuedTelegramService)
+    return service
+
+
+def _start_update(update_id=1):
+    return {
+        "update_id": update_id,
+        "message": {
+            "from": {"id": 42, "first_name": "John", "username": "john"},
+            "chat": {"id": 42, "type": "private"},
+            "date": 1687615926,
+            "text": "/start",
+        },
+    }
+
+
+def test_update_messages_are_queued_together(queued_service, outbox):
+    with patch.object(queued_service.telegram_service.session, 'post') as mock_post:
+        queued_service.handle_telegram_update(_start_update())
+
+    mock_post.assert_not_called()
+    assert len(outbox.messages) == 1
+    intents = outbox.messages[0]
+    assert [(i["method"], i["payload"]["chat_id"]) for i in intents] == [
+        ("sendMessage", 42),
+        ("sendMessage", 42),
+        ("sendMessage", 1),
+    ]
+    assert intents[0]["payload"]["text"].startswith("Hello John")
+    assert "reply_markup" in intents[1]["payload"]
+
+
+def test_async_update_messages_are_queued_together(queued_service, outbox):
+    import asyncio
+
+    asyncio.run(queued_service.handle_telegram_update_async(_start_update()))
+
+    assert len(outbox.messages) == 1
+    assert len(outbox.messages[0]) == 3
+
+
+def test_failed_update_queues_nothing(queued_service, outbox):
+    with patch.object(queued_service.storage, 'add_or_get_user', side_effect=RuntimeError):
+        with pytest.raises(RuntimeError):
+            queued_service.handle_telegram_update(_start_update())
+
+    assert outbox.messages == []
+
+
+def test_messages_outside_a_batch_are_queued_alone(outbox):
+    service = QueuedTelegramService(outbox)
+
+    service.send_message(42, "a")
+    service.edit_message(42, 7, "b")
+
+    assert [len(intents) for intents in outbox.messages] == [1, 1]
+    assert outbox.messages[1][0] == {
+        "method": "editMessageText",
+        "payload": {"chat_id": 42, "message_id": 7, "text": "b"},
+    }
+
+
+def test_create_outbox(monkeypatch):
+    assert create_outbox() is None
+
+    monkeypatch.setenv("TELEGRAM_OUTBOX", "sqs")
+    with pytest.raises(EnvironmentException):
+        create_outbox(config.reload_config())
+
+    monkeypatch.setenv("TELEGRAM_OUTBOX", "kafka")
+    with pytest.raises(EnvironmentException):
+        create_outbox(config.reload_config())
+
+
+def _record(message_id, *texts, chat_id=42):
+    intents = [
+        {"method": "sendMessage", "payload": {"chat_id": chat_id, "text": text}}
+        for text in texts
+    ]
+    return {"messageId": message_id, "body": json.dumps({"intents": intents})}
+
+
+def _response(status_code):
+    return Mock(status_code=status_code, ok=status_code < 400)
+
+
+@pytest.fixture
+def sender(monkeypatch, outbox):
+    monkeypatch.setenv("TOKEN", "12345")
+    service = Mock()
+    with patch.object(telegram_sender, "get_telegram_service", return_value=service), \
+         patch.object(telegram_sender, "get_outbox", return_value=outbox):
+        yield service
+
+
+def test_sender_sends_each_chat_in_order(sender):
+    sender.call.return_value = _response(200)
+    event = {"Records": [_record("m-1", "a", "b"), _record("m-2", "c", chat_id=7)]}
+
+    assert telegram_sender.lambda_handler(event, None) == {"batchItemFailures": []}
+
+    texts = [call.args[1]["text"] for call in sender.call.call_args_list]
+    assert sorted(texts) == ["a", "b", "c"]
+    assert texts.index("a") < texts.index("b")
+
+
+def test_sender_retries_a_record_that_sent_nothing(sender, outbox):
+    sender.call.return_value = _response(429)
+    event = {"Records": [_record("m-1", "a"), _record("m-2", "b")]}
+
+    result = telegram_sender.lambda_handler(event, None)
+
+    # The chat's later record waits for the retry so order is kept.
+    assert result == {
+        "batchItemFailures": [{"itemIdentifier": "m-1"}, {"itemIdentifier": "m-2"}]
+    }
+    assert sender.call.call_count == 1
+    assert outbox.messages == []
+
+
+def test_sender_requeues_what_is_left_after_a_partial_send(sender, outbox):
+    sender.call.side_effect = [_response(200), _response(502)]
+
+    result = telegram_sender.lambda_handler({"Records": [_record("m-1", "a", "b", "c")]}, None)
+
+    assert result == {"batchItemFailures": []}
+    assert [i["payload"]["text"] for i in outbox.messages[0]] == ["b", "c"]
+
+
+def test_sender_does_not_resend_when_requeueing_fails(sender, outbox):
+    sender.call.side_effect = [_response(200), _response(502)]
+
+    with patch.object(outbox, "put", side_effect=RuntimeError("throttled")):
+        result = telegram_sender.lambda_handler({"Records": [_record("m-1", "a", "b")]}, None)
+
+    # A retry would send "a" again, so the unsent rest is dropped instead.
+    assert result == {"batchItemFailures": []}
+    assert sender.call.call_count == 2
+
+
+def test_sender_skips_messages_telegram_rejects(sender):
+    sender.call.side_effect = [_response(403), _response(200)]
+
+    result = telegram_sender.lambda_handler({"Records": [_record("m-1", "a", "b")]}, None)
+
+    assert result == {"batchItemFailures": []}
+    assert sender.call.call_count == 2
+
+
+def test_sender_drops_malformed_records_and_intents(sender):
+    sender.call.return_value = _response(200)
+    good = {"method": "sendMessage", "payload": {"chat_id": 42, "text": "a"}}
+    event = {
+        "Records": [
+            {"messageId": "m-1", "body": "not json"},
+            {"messageId": "m-2", "body": json.dumps({"intents": [{"method": "sendMessage"}, good]})},
+        ]
+    }
+
+    assert telegram_sender.lambda_handler(event, None) == {"batchItemFailures": []}
+    sender.call.assert_called_once_with("sendMessage", good["payload"])